@@ -0,0 +1,470 @@
+"""
+Бенчмарк горячего пути разбора карточек и записи наблюдений в базу.
+
+Синтетические карточки заказов (поддельные WebElement) прогоняются через парсер
+и слой базы данных на досках разного размера. Для каждого размера измеряются
+задержка цикла опроса (разбор и запись), количество SQL-запросов за цикл
+и пропускная способность в строках в секунду. Результаты сохраняются в JSON,
+чтобы сравнивать версии между собой:
+
+    python -m benchmarks.bench_ingest --sizes 10 100 1000 5000 --output bench.json
+    python -m benchmarks.bench_ingest --compare bench.json
+
+По умолчанию вместо PostgreSQL используется заглушка в памяти, которая исполняет те же
+запросы `save_courier_batch` и считает их. Для замеров на настоящем сервере задайте
+BENCH_DBNAME — отдельную одноразовую базу (таблицы в ней очищаются!); остальные параметры
+подключения берутся из тех же переменных, что и у приложения (USER_NAME, PASSWORD, HOST, PORT).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from psycopg2 import extensions
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from src import db
+from src.metrics import DB_STATEMENTS
+from src.parser import STATUS_CLASS, extract_order_data, extract_orders, parse_card_texts
+from src.pool import ConnectionPool
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+
+
+class FakeStatusElement:
+    """Блок статуса карточки с текстом, как у `WebElement`."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeWebElement:
+    """
+    Карточка заказа с интерфейсом `WebElement`, достаточным для `parse_order`.
+
+    Args:
+        text (str | None): Текст блока статуса; `None` — блок не найден.
+        stale (bool): Элемент устарел — `find_element` выбрасывает `StaleElementReferenceException`.
+    """
+
+    def __init__(self, text, stale=False):
+        self._text = text
+        self._stale = stale
+
+    def find_element(self, by, value):
+        if self._stale:
+            raise StaleElementReferenceException("stale element")
+        if by != By.CLASS_NAME or value != STATUS_CLASS or self._text is None:
+            raise NoSuchElementException(value)
+        return FakeStatusElement(self._text)
+
+
+class SyntheticBoard:
+    """
+    Доска из `size` курьеров, состояние которой меняется от цикла к циклу примерно
+    как на настоящем дашборде: у части курьеров время растёт (обновление заказа),
+    у немногих сбрасывается (новый заказ), остальные без изменений или в другом статусе.
+
+    Args:
+        size (int): Количество курьеров.
+        seed (int): Начальное значение генератора случайных чисел.
+        change_rate (float): Доля курьеров, у которых время меняется за цикл.
+        reset_rate (float): Доля курьеров, у которых начинается новый заказ за цикл.
+        other_status_rate (float): Доля карточек без времени (другой статус).
+        stale_rate (float): Доля устаревших элементов.
+    """
+
+    def __init__(self, size, seed=0, change_rate=0.3, reset_rate=0.05, other_status_rate=0.1, stale_rate=0.001):
+        self.random = random.Random(seed)
+        self.change_rate = change_rate
+        self.reset_rate = reset_rate
+        self.other_status_rate = other_status_rate
+        self.stale_rate = stale_rate
+        self.names = [f"Курьер {index:05d}" for index in range(size)]
+        self.minutes = [self.random.randint(0, 30) for _ in range(size)]
+
+    def advance(self):
+        """Переводит доску в следующий цикл опроса."""
+        for index, minutes in enumerate(self.minutes):
+            roll = self.random.random()
+            if roll < self.reset_rate:
+                self.minutes[index] = self.random.randint(0, max(minutes - 1, 0))
+            elif roll < self.change_rate:
+                self.minutes[index] = minutes + 1
+
+    def texts(self):
+        """Тексты блоков статуса всех карточек."""
+        texts = []
+        for name, minutes in zip(self.names, self.minutes):
+            if self.random.random() < self.other_status_rate:
+                texts.append(f"В пути\n{name}\nЗаказ")
+            else:
+                texts.append(f"Пора выходить {minutes} мин\n{name}\nЗаказ")
+        return texts
+
+    def elements(self, texts):
+        """Карточки `FakeWebElement` по текстам блоков статуса."""
+        return [FakeWebElement(text, stale=self.random.random() < self.stale_rate) for text in texts]
+
+
+def statement_count():
+    """
+    Количество SQL-запросов, отправленных в базу с начала процесса: метрика `DB_STATEMENTS`,
+    которую ведут курсоры `src.db` (и курсор заглушки).
+    """
+    return DB_STATEMENTS.value
+
+
+class StandInDatabase:
+    """
+    Заглушка PostgreSQL в памяти: хранит курьеров, заказы и courier_latest и отвечает
+    на запросы `save_courier_batch` так же, как сервер. Скорость базы не моделируется —
+    замеряется только работа на стороне Python и количество запросов.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.couriers = {}
+        self.orders = {}
+        self.latest = {}
+        self.next_order_id = 1
+
+    def execute(self, query, params, rows):
+        """
+        Выполняет запрос и возвращает строки результата.
+
+        Args:
+            query (str): Текст запроса.
+            params (tuple): Параметры запроса.
+            rows (list): Строки VALUES, собранные `execute_values` через `mogrify`.
+        """
+        if "WITH input AS" in query:
+            names, warehouse = params[0], params[1]
+            result = []
+            for courier_name in names:
+                courier_id = self.couriers.setdefault((warehouse, courier_name), len(self.couriers) + 1)
+                result.append((courier_id, courier_name))
+            return result
+        if "FROM courier_latest" in query:
+            wanted = set(params[0])
+            return [(courier_id, *latest) for courier_id, latest in self.latest.items() if courier_id in wanted]
+        if "nextval" in query:
+            first = self.next_order_id
+            self.next_order_id += params[0]
+            return [(order_id,) for order_id in range(first, self.next_order_id)]
+        if "INSERT INTO orders" in query:
+            for order_id, courier_id, time_taken, cur_time, status in rows:
+                self.orders[order_id] = (courier_id, time_taken, cur_time, status)
+            return []
+        if "UPDATE orders" in query:
+            for order_id, _, time_taken, cur_time, status in rows:
+                courier_id = self.orders[order_id][0]
+                self.orders[order_id] = (courier_id, time_taken, cur_time, status)
+            return []
+        if "INSERT INTO courier_latest" in query:
+            for courier_id, order_id, time_taken, cur_time, status in rows:
+                self.latest[courier_id] = (order_id, time_taken, cur_time, status)
+            return []
+        if "TRUNCATE" in query:
+            self.reset()
+        return []
+
+
+class StandInCursor:
+    """Курсор заглушки с интерфейсом, который используют `save_courier_batch` и `execute_values`."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._rows = []
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mogrify(self, template, args):
+        # Значения строки VALUES сохраняются как есть, а в текст запроса попадает заполнитель
+        self._rows.append(tuple(args))
+        return b"(?)"
+
+    def execute(self, query, params=None):
+        DB_STATEMENTS.inc()
+        if isinstance(query, bytes):
+            query = query.decode()
+        rows, self._rows = self._rows, []
+        self._result = self.connection.database.execute(query, params or (), rows)
+
+    def fetchall(self):
+        result, self._result = self._result, []
+        return result
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    """Соединение заглушки с интерфейсом, который используют пул и `pooled_connection`."""
+
+    encoding = "UTF8"
+
+    def __init__(self, database):
+        self.database = database
+        self.closed = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+def use_postgres(dbname):
+    """
+    Направляет слой базы данных в отдельную базу `dbname` и создаёт в ней схему.
+
+    Returns:
+        str: Описание бэкенда для отчёта.
+    """
+    os.environ["DBNAME"] = dbname
+    # Соединения `get_connection` используют курсор `CountingCursor`, который ведёт `DB_STATEMENTS`
+    db.set_pool(ConnectionPool(db.get_connection, minconn=1, maxconn=2))
+    db.init_db()
+    return f"postgres:{dbname}"
+
+
+def use_stand_in():
+    """
+    Направляет слой базы данных в заглушку в памяти.
+
+    Returns:
+        str: Описание бэкенда для отчёта.
+    """
+    database = StandInDatabase()
+    db.set_pool(ConnectionPool(lambda: StandInConnection(database), minconn=1, maxconn=2))
+    return "stand-in"
+
+
+def _timings(values):
+    """Среднее, медиана, p95 и максимум в миллисекундах."""
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "p50": round(statistics.median(ordered) * 1000, 3),
+        "p95": round(p95 * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+def bench_batch(size, cycles, seed=0):
+    """
+    Замеряет пакетный путь: `extract_orders` по карточкам и `save_courier_batch` за цикл.
+    Первый цикл (создание всех курьеров) учитывается отдельно.
+
+    Returns:
+        dict: Результаты для одного размера доски.
+    """
+    board = SyntheticBoard(size, seed)
+    parse_times, save_times, statement_counts = [], [], []
+    observations_total = written_total = 0
+    first_cycle = None
+
+    for cycle in range(cycles + 1):
+        elements = board.elements(board.texts())
+        statements_before = statement_count()
+
+        started = time.perf_counter()
+        observations = extract_orders(elements)
+        parsed = time.perf_counter()
+        result = db.save_courier_batch(observations)
+        saved = time.perf_counter()
+
+        cycle_statements = statement_count() - statements_before
+
+        if cycle == 0:
+            first_cycle = {"ms": round((saved - started) * 1000, 3), "statements": cycle_statements}
+        else:
+            parse_times.append(parsed - started)
+            save_times.append(saved - parsed)
+            statement_counts.append(cycle_statements)
+            observations_total += len(observations)
+            written_total += result["inserted"] + result["updated"]
+        board.advance()
+
+    elapsed = sum(parse_times) + sum(save_times)
+    return {
+        "couriers": size,
+        "mode": "batch",
+        "cycles": cycles,
+        "first_cycle": first_cycle,
+        "parse_ms": _timings(parse_times),
+        "save_ms": _timings(save_times),
+        "cycle_ms": _timings([p + s for p, s in zip(parse_times, save_times)]),
+        "statements_per_cycle": round(statistics.fmean(statement_counts), 2),
+        "observations_per_sec": round(observations_total / elapsed, 1),
+        "written_rows_per_sec": round(written_total / elapsed, 1),
+    }
+
+
+def bench_texts(size, cycles, seed=0):
+    """
+    Замеряет разбор текстов карточек `parse_card_texts` (путь `fetch_order_texts`) без записи в базу.
+
+    Returns:
+        dict: Результаты для одного размера доски.
+    """
+    board = SyntheticBoard(size, seed)
+    parse_times = []
+    observations_total = 0
+    for _ in range(cycles):
+        texts = board.texts()
+        started = time.perf_counter()
+        observations_total += len(parse_card_texts(texts))
+        parse_times.append(time.perf_counter() - started)
+        board.advance()
+
+    return {
+        "couriers": size,
+        "mode": "texts",
+        "cycles": cycles,
+        "parse_ms": _timings(parse_times),
+        "observations_per_sec": round(observations_total / sum(parse_times), 1),
+    }
+
+
+def bench_per_card(size, cycles, seed=0):
+    """
+    Замеряет прежний путь: `extract_order_data` по каждой карточке, одна транзакция на наблюдение.
+
+    Returns:
+        dict: Результаты для одного размера доски.
+    """
+    board = SyntheticBoard(size, seed)
+    cycle_times, statement_counts = [], []
+    observations_total = 0
+    for cycle in range(cycles + 1):
+        elements = board.elements(board.texts())
+        statements_before = statement_count()
+        started = time.perf_counter()
+        for element in elements:
+            extract_order_data(element)
+        if cycle:
+            cycle_times.append(time.perf_counter() - started)
+            statement_counts.append(statement_count() - statements_before)
+            observations_total += len(elements)
+        board.advance()
+
+    return {
+        "couriers": size,
+        "mode": "per_card",
+        "cycles": cycles,
+        "cycle_ms": _timings(cycle_times),
+        "statements_per_cycle": round(statistics.fmean(statement_counts), 2),
+        "observations_per_sec": round(observations_total / sum(cycle_times), 1),
+    }
+
+
+MODES = {"batch": bench_batch, "texts": bench_texts, "per_card": bench_per_card}
+
+
+def _version():
+    """Текущий коммит git или `None`, если он недоступен."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """
+    Печатает изменение медианы цикла и количества запросов относительно прошлого прогона.
+
+    Prints:
+        str: Строка сравнения для каждого размера и режима, присутствующих в обоих прогонах.
+    """
+    before = {(r["mode"], r["couriers"]): r for r in previous["results"]}
+    print(f"Сравнение с {previous.get('version')} ({previous.get('backend')}):")
+    for result in current["results"]:
+        old = before.get((result["mode"], result["couriers"]))
+        if old is None:
+            continue
+        key = "cycle_ms" if "cycle_ms" in result else "parse_ms"
+        ratio = result[key]["p50"] / old[key]["p50"] if old[key]["p50"] else float("inf")
+        line = (f"  {result['mode']:>8} {result['couriers']:>5}: p50 {old[key]['p50']} -> "
+                f"{result[key]['p50']} мс (x{ratio:.2f})")
+        if "statements_per_cycle" in result:
+            line += f", запросов {old['statements_per_cycle']} -> {result['statements_per_cycle']}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора карточек и записи наблюдений.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Размеры доски (курьеров)")
+    parser.add_argument("--cycles", type=int, default=20, help="Циклов опроса на размер")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=["batch", "texts"], help="Замеряемые пути")
+    parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+    parser.add_argument("--output", help="Файл JSON для результатов")
+    parser.add_argument("--compare", help="Файл JSON прошлого прогона для сравнения")
+    args = parser.parse_args(argv)
+
+    dbname = os.getenv("BENCH_DBNAME")
+    backend = use_postgres(dbname) if dbname else use_stand_in()
+
+    report = {
+        "version": _version(),
+        "backend": backend,
+        "python": platform.python_version(),
+        "started_at": db.get_local_time().isoformat(),
+        "results": [],
+    }
+    try:
+        for size in args.sizes:
+            for mode in args.modes:
+                db.clear_tables()
+                result = MODES[mode](size, args.cycles, args.seed)
+                report["results"].append(result)
+                summary = result.get("cycle_ms") or result["parse_ms"]
+                print(f"{mode:>8} {size:>5} курьеров: p50 {summary['p50']} мс, p95 {summary['p95']} мс, "
+                      f"запросов за цикл {result.get('statements_per_cycle', 0)}, "
+                      f"{result['observations_per_sec']} строк/с")
+    finally:
+        db.close_pool()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}.")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import logging
+import math
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.metrics import DROPPED_CARDS, PARSE_SECONDS
+from src.parser import STATUS_UNKNOWN, OrderSnapshot, classify_status
+from src.session import build_headers, default_user_agent, load_cookies
+
+logger = logging.getLogger(__name__)
+
+# Ключи, под которыми в ответе API может лежать список курьеров
+LIST_KEYS = ("couriers", "items", "data", "result")
+# Ключи с именем курьера
+NAME_KEYS = ("name", "courierName", "courier_name", "fullName")
+# Ключи с текстом статуса ("Пора выходить N мин")
+STATUS_KEYS = ("status", "statusText", "status_text")
+# Ключи с временем в минутах
+MINUTES_KEYS = ("minutes", "time_taken", "timeToLeave")
+
+
+def create_session(retries=3, backoff_factor=0.5):
+    """
+    Создаёт сессию `requests` с keep-alive и повторами запросов с экспоненциальной задержкой.
+
+    Args:
+        retries (int): Количество повторов при ошибках соединения и ответах 429/5xx.
+        backoff_factor (float): Множитель задержки между повторами, сек.
+
+    Returns:
+        requests.Session: Сессия для запросов к API.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# Функция запроса к API
+def fetch_warehouse_summary(session, headers, cookies, timeout=None, url=None):
+    """
+    Отправляет GET-запрос к API для получения сводной информации о складе.
+
+    Args:
+        session (requests.Session): Сессия, созданная `create_session`.
+        headers (dict): Заголовки для авторизации в запросе.
+        cookies (dict): Куки для авторизации в запросе.
+        timeout (float, optional): Таймаут запроса, сек. По умолчанию из переменной API_TIMEOUT или 10.
+        url (str, optional): Адрес сводки по складу. По умолчанию из переменной COOKER.
+
+    Returns:
+        tuple: Код состояния HTTP-ответа и разобранный JSON (или `None`, если запрос неуспешен).
+    """
+    url = url or os.getenv("COOKER")
+    timeout = timeout if timeout is not None else float(os.getenv("API_TIMEOUT", "10"))
+    response = session.get(url, headers=headers, cookies=cookies, timeout=timeout)
+    if response.status_code != 200:
+        return response.status_code, None
+    return response.status_code, response.json()
+
+
+# Быстрый запуск по сохранённой сессии
+def warm_start(session, cookies_file=None, url=None, referer=None):
+    """
+    Проверяет сохранённые куки запросом к API, не запуская браузер.
+
+    Args:
+        session (requests.Session): Сессия для запросов к API.
+        cookies_file (str, optional): Файл сохранённых куков. По умолчанию из COOKIES_FILE.
+        url (str, optional): Адрес сводки по складу. По умолчанию из COOKER.
+        referer (str, optional): Адрес дашборда для заголовка Referer. По умолчанию из DASHBOARD_URL.
+
+    Returns:
+        tuple | None: Сохранённые данные сессии, заголовки, куки и первая сводка по складу
+        или `None`, если сохранённой сессии нет или она недействительна.
+    """
+    saved = load_cookies(cookies_file)
+    if saved is None:
+        return None
+
+    cookie_dict = {cookie['name']: cookie['value'] for cookie in saved["cookies"]}
+    try:
+        headers = build_headers(cookie_dict, saved.get("user_agent") or default_user_agent(), referer)
+        status_code, summary = fetch_warehouse_summary(session, headers, cookie_dict, url=url)
+    except Exception as e:
+        logger.warning("Не удалось проверить сохранённую сессию: %s", e)
+        return None
+
+    if status_code != 200:
+        logger.info("Сохранённая сессия недействительна (код %s), потребуется заново войти в систему.", status_code)
+        return None
+    return saved, headers, cookie_dict, summary
+
+
+def _first(item, keys):
+    """Возвращает значение первого из ключей, присутствующего в словаре."""
+    for key in keys:
+        if item.get(key) is not None:
+            return item[key]
+    return None
+
+
+def _find_couriers(payload):
+    """Находит список записей о курьерах в ответе API; `None`, если списка нет ни под одним из ключей."""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in LIST_KEYS:
+            value = payload.get(key)
+            if isinstance(value, list):
+                return value
+            if isinstance(value, dict):
+                return _find_couriers(value)
+    return None
+
+
+def _to_minutes(value):
+    """
+    Приводит время из ответа API к числу минут.
+
+    Returns:
+        int | float | None: Целое число, если значение целое, иначе дробное;
+        `None`, если значение не является конечным числом.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        minutes = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(minutes):
+        return None
+    return int(minutes) if minutes.is_integer() else minutes
+
+
+def map_summary(payload):
+    """
+    Преобразует ответ API со сводкой по складу в снимки `OrderSnapshot`,
+    такие же, как при разборе карточек заказов со страницы.
+
+    Статус определяется по тексту статуса той же таблицей `STATUS_TABLE`, что и для карточек.
+    Время берётся из числового поля с минутами, а если его нет — из текста статуса
+    вида "Пора выходить N мин" и приводится к числу (API может вернуть строку "5").
+    Записи без имени курьера и записи с нечисловым временем пропускаются и учитываются в метрике
+    `DROPPED_CARDS`. Если ответ не пуст, но в нём нет списка курьеров или ни в одной записи
+    не нашлось имени, схема ответа считается неизвестной: пишется предупреждение в журнал,
+    а в `DROPPED_CARDS` учитывается причина "unknown_schema".
+
+    Args:
+        payload (dict | list): Разобранный JSON-ответ `fetch_warehouse_summary`.
+
+    Returns:
+        list: Снимки (courier_name, time_taken, status) для передачи в `save_courier_batch`.
+    """
+    observations = []
+    with PARSE_SECONDS.labels("api").time():
+        items = _find_couriers(payload)
+        if items is None:
+            if payload:
+                _unknown_schema("нет списка курьеров под ключами %s" % ", ".join(LIST_KEYS))
+            return observations
+
+        unnamed = 0
+        for item in items:
+            source = item.get("courier") if isinstance(item, dict) and isinstance(item.get("courier"), dict) else item
+            name = _first(source, NAME_KEYS) if isinstance(source, dict) else None
+            if not name:
+                unnamed += 1
+                continue
+
+            status_text = _first(item, STATUS_KEYS)
+            status, status_minutes = (
+                classify_status(status_text) if isinstance(status_text, str) else (STATUS_UNKNOWN, None)
+            )
+            raw_minutes = _first(item, MINUTES_KEYS)
+            if raw_minutes is None:
+                time_taken = status_minutes
+            else:
+                time_taken = _to_minutes(raw_minutes)
+                if time_taken is None:
+                    DROPPED_CARDS.labels("bad_minutes").inc()
+                    continue
+            observations.append(OrderSnapshot(str(name).strip(), time_taken, status))
+
+        if unnamed:
+            DROPPED_CARDS.labels("no_name").inc(unnamed)
+            if unnamed == len(items):
+                _unknown_schema("ни в одной из %s записей нет имени курьера под ключами %s"
+                                % (unnamed, ", ".join(NAME_KEYS)))
+    return observations
+
+
+def _unknown_schema(reason):
+    """Учитывает ответ API неизвестной схемы в метрике и журнале."""
+    DROPPED_CARDS.labels("unknown_schema").inc()
+    logger.warning("Неизвестная схема ответа API: %s.", reason)
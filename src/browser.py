@@ -0,0 +1,135 @@
+import logging
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from src.login import login
+from src.session import build_headers, get_auth_token, save_cookies
+
+logger = logging.getLogger(__name__)
+
+
+def create_driver():
+    """
+    Создаёт и конфигурирует объект WebDriver для работы с браузером.
+
+    Returns:
+        selenium.webdriver.Chrome: Объект WebDriver для браузера Chrome.
+    """
+    chrome_options = Options()
+    # Настройка пользовательского агента и отключение автоматизации
+    # chrome_options.add_argument("--headless")  # Безголовый режим
+    chrome_options.add_argument("--disable-gpu")  # Отключаем GPU
+    chrome_options.add_argument(os.getenv("USER_AGENT"))
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Отключаем индикатор автоматизации
+
+    driver = webdriver.Chrome(options=chrome_options)
+    return driver
+
+
+# Функция получения заголовков и куков
+def get_headers_and_cookies(driver, referer=None):
+    """
+    Извлекает куки и заголовки для авторизации в API из браузера.
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для работы с браузером.
+        referer (str, optional): Адрес дашборда для заголовка Referer. По умолчанию из DASHBOARD_URL.
+
+    Returns:
+        tuple: Заголовки (headers) и куки (cookie_dict) для использования в запросах API.
+
+    Raises:
+        Exception: Если отсутствует cookie авторизации (auth_token или spid), выбрасывается исключение.
+    """
+    cookies = driver.get_cookies()
+    cookie_dict = {cookie['name']: cookie['value'] for cookie in cookies}
+    headers = build_headers(cookie_dict, driver.execute_script("return navigator.userAgent;"), referer)
+    return headers, cookie_dict
+
+
+class BrowserSession:
+    """
+    Браузер, который запускается лениво — только когда он действительно нужен
+    (для чтения страницы или повторной авторизации).
+
+    Args:
+        dashboard_url (str): Адрес дашборда.
+        username (str): Имя пользователя для входа.
+        password (str): Пароль для входа.
+        cookies_file (str, optional): Файл для сохранения куков. По умолчанию из COOKIES_FILE.
+    """
+
+    def __init__(self, dashboard_url, username, password, cookies_file=None):
+        self.dashboard_url = dashboard_url
+        self.username = username
+        self.password = password
+        self.cookies_file = cookies_file
+        self._driver = None
+
+    @property
+    def started(self):
+        """`True`, если браузер уже запущен."""
+        return self._driver is not None
+
+    @property
+    def driver(self):
+        """Объект WebDriver; при первом обращении запускает браузер."""
+        if self._driver is None:
+            logger.info("Запускаем браузер...")
+            self._driver = create_driver()
+        return self._driver
+
+    def authenticate(self, saved=None):
+        """
+        Открывает дашборд и авторизуется: подставляет сохранённые куки, а если их нет
+        или они не дали авторизации — выполняет вход по логину и паролю.
+        Полученные куки сохраняются в файл.
+
+        Args:
+            saved (dict, optional): Результат `load_cookies` с заведомо действительными куками.
+
+        Returns:
+            tuple: Заголовки (headers) и куки (cookie_dict) для использования в запросах API.
+        """
+        driver = self.driver
+        driver.get(self.dashboard_url)
+
+        if saved:
+            for cookie in saved["cookies"]:
+                try:
+                    driver.add_cookie(cookie)
+                except Exception as e:
+                    logger.warning("Ошибка при загрузке куки %s: %s", cookie.get('name'), e)
+            driver.get(self.dashboard_url)
+
+        cookie_dict = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+        if not saved or not get_auth_token(cookie_dict):
+            login(driver, self.username, self.password)
+
+        self.save_cookies()
+        return get_headers_and_cookies(driver, self.dashboard_url)
+
+    def headers_and_cookies(self):
+        """Возвращает актуальные заголовки и куки из запущенного браузера."""
+        return get_headers_and_cookies(self.driver, self.dashboard_url)
+
+    def save_cookies(self):
+        """Сохраняет куки запущенного браузера в файл."""
+        if self._driver is not None:
+            save_cookies(
+                self._driver.get_cookies(), self._driver.execute_script("return navigator.userAgent;"),
+                self.cookies_file,
+            )
+
+    def close(self):
+        """Сохраняет куки и закрывает браузер, если он был запущен."""
+        if self._driver is None:
+            return
+        try:
+            self.save_cookies()
+        finally:
+            self._driver.quit()
+            self._driver = None
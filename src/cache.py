@@ -0,0 +1,242 @@
+import threading
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+class CourierState(NamedTuple):
+    """
+    Последнее известное состояние курьера в базе данных.
+
+    Attributes:
+        courier_id (int): ID курьера в таблице couriers.
+        order_id (int | None): ID последнего заказа курьера или `None`, если заказов нет.
+        time_taken (float | None): time_taken последнего заказа.
+        cur_time (datetime | None): cur_time последнего заказа (ключ секции таблицы orders).
+        status (str | None): Последний статус курьера из `STATUS_TABLE` или `None`, если он не известен.
+    """
+    courier_id: int
+    order_id: Optional[int]
+    time_taken: Optional[float]
+    cur_time: Optional[datetime] = None
+    status: Optional[str] = None
+
+
+def latest_observations(observations, warehouse=None):
+    """
+    Последнее наблюдение каждого курьера пакета.
+
+    Args:
+        observations (iterable): Пары (courier_name, time_taken) или снимки `OrderSnapshot` со статусом;
+            у пар статус `None` — он не меняет записанный.
+        warehouse (str, optional): Склад; если указан, ключ — пара (warehouse, courier_name).
+
+    Returns:
+        dict: {courier_name или (warehouse, courier_name): (time_taken, status)}.
+    """
+    latest = {}
+    for courier_name, time_taken, *rest in observations:
+        if courier_name:
+            key = courier_name if warehouse is None else (warehouse, courier_name)
+            latest[key] = (time_taken, rest[0] if rest else None)
+    return latest
+
+
+def is_unchanged(time_taken, status, last_time, last_status):
+    """Наблюдение не меняет заказ: time_taken и статус не указаны или совпадают с записанными."""
+    return time_taken in (None, last_time) and status in (None, last_status)
+
+
+class OrderPlan:
+    """
+    Правило записи заказов, общее для всех хранилищ: пакеты наблюдений применяются по порядку
+    в памяти, а хранилище записывает только итоговые строки.
+
+    Для каждого наблюдения курьера: первый заказ курьера добавляется с time_taken 0; если time_taken
+    и статус не указаны или совпадают с записанными, наблюдение пропускается; уменьшение time_taken —
+    новый заказ; иначе обновляется последний заказ, а если изменился только статус — только его статус
+    (time_taken и cur_time остаются прежними). Статус `None` не меняет записанный.
+
+    Args:
+        courier_ids (dict): {ключ курьера: courier_id} всех курьеров пакетов.
+        last_orders (dict): {courier_id: CourierState} последних записанных заказов.
+
+    Attributes:
+        new_orders (list): Новые заказы [courier_id, time_taken, cur_time, status] в порядке появления;
+            после `assign_order_ids` — [order_id, courier_id, time_taken, cur_time, status].
+        updated_orders (dict): {order_id: (prev_time, CourierState)} — cur_time записанной строки
+            (для поиска по первичному ключу) и итоговое состояние обновлённого заказа.
+        unchanged (int): Количество наблюдений без изменений.
+        samples (list): Версии заказов (courier_id, time_taken, observed_at) для агрегатов: новый заказ
+            или изменение time_taken заказа. Повторные наблюдения без изменений, смена только статуса
+            и первый заказ курьера (time_taken 0 — не измеренное значение) в агрегаты не попадают.
+    """
+
+    def __init__(self, courier_ids, last_orders):
+        self.courier_ids = courier_ids
+        self.last_orders = last_orders
+        self.new_orders = []
+        self.updated_orders = {}
+        self.unchanged = 0
+        self.samples = []
+        # Текущий заказ курьера: CourierState записанного заказа или список нового заказа
+        self._current = {courier_id: last_orders.get(courier_id) for courier_id in courier_ids.values()}
+
+    def apply(self, observed_at, latest):
+        """
+        Применяет правило к одному пакету.
+
+        Args:
+            observed_at (datetime): Время получения пакета; становится cur_time новых и обновлённых заказов.
+            latest (dict): {ключ курьера: (time_taken, status)}, как у `latest_observations`.
+        """
+        for key, (time_taken, status) in latest.items():
+            courier_id = self.courier_ids[key]
+            order = self._current[courier_id]
+            if order is None:
+                self._add(courier_id, 0, observed_at, status)
+                continue
+            if isinstance(order, list):
+                last_time, last_status = order[1], order[3]
+            else:
+                last_time, last_status = order.time_taken, order.status
+            if is_unchanged(time_taken, status, last_time, last_status):
+                self.unchanged += 1
+            elif time_taken is not None and time_taken < last_time:
+                self._add(courier_id, time_taken, observed_at, status)
+                self.samples.append((courier_id, time_taken, observed_at))
+            elif isinstance(order, list):
+                if time_taken not in (None, last_time):
+                    order[1], order[2] = time_taken, observed_at
+                    self.samples.append((courier_id, time_taken, observed_at))
+                order[3] = status or last_status
+            else:
+                if time_taken in (None, last_time):
+                    state = order._replace(status=status)
+                else:
+                    state = order._replace(time_taken=time_taken, cur_time=observed_at, status=status or last_status)
+                    self.samples.append((courier_id, time_taken, observed_at))
+                prev_time = self.updated_orders.get(order.order_id, (order.cur_time,))[0]
+                self.updated_orders[order.order_id] = (prev_time, state)
+                self._current[courier_id] = state
+
+    def _add(self, courier_id, time_taken, observed_at, status):
+        self._current[courier_id] = [courier_id, time_taken, observed_at, status]
+        self.new_orders.append(self._current[courier_id])
+
+    @property
+    def has_writes(self):
+        """`True`, если есть новые или обновлённые заказы."""
+        return bool(self.new_orders or self.updated_orders)
+
+    def assign_order_ids(self, order_ids):
+        """Присваивает новым заказам ID, выделенные хранилищем, в порядке `new_orders`."""
+        for order, order_id in zip(self.new_orders, order_ids):
+            order.insert(0, order_id)
+
+    def states(self):
+        """
+        Returns:
+            dict: {ключ курьера: CourierState} последнего заказа каждого курьера (после `assign_order_ids`).
+        """
+        states = {}
+        for key, courier_id in self.courier_ids.items():
+            order = self._current[courier_id]
+            if isinstance(order, list):
+                order = CourierState(order[1], order[0], order[2], order[3], order[4])
+            if order is not None:
+                states[key] = order
+        return states
+
+    def written(self, states):
+        """Состояния курьеров, последний заказ которых изменился: строки для courier_latest и кэша."""
+        return {key: state for key, state in states.items() if self.last_orders.get(state.courier_id) != state}
+
+    def changes(self):
+        """
+        Записанные заказы для результата записи: все новые заказы (в том числе промежуточные)
+        и итог каждого обновлённого заказа, по времени.
+
+        Returns:
+            list: Словари с полями warehouse, courier_name, courier_id, order_id, time_taken, cur_time,
+            status и kind ("new" или "updated"); ключ курьера — пара (warehouse, courier_name).
+        """
+        keys_by_id = {courier_id: key for key, courier_id in self.courier_ids.items()}
+        written = [(order, "new") for order in self.new_orders]
+        written += [
+            ([order_id, state.courier_id, state.time_taken, state.cur_time, state.status], "updated")
+            for order_id, (_, state) in self.updated_orders.items()
+        ]
+        changes = [
+            {
+                "warehouse": keys_by_id[courier_id][0],
+                "courier_name": keys_by_id[courier_id][1],
+                "courier_id": courier_id,
+                "order_id": order_id,
+                "time_taken": time_taken,
+                "cur_time": cur_time,
+                "status": status,
+                "kind": kind,
+            }
+            for (order_id, courier_id, time_taken, cur_time, status), kind in written
+        ]
+        return sorted(changes, key=lambda change: change["cur_time"])
+
+
+def plan_orders(batches, courier_ids, last_orders):
+    """
+    Применяет правило записи `OrderPlan` к пакетам по порядку.
+
+    Args:
+        batches (list): Пары (observed_at, {ключ курьера: (time_taken, status)}) в порядке получения.
+        courier_ids (dict): {ключ курьера: courier_id} всех курьеров пакетов.
+        last_orders (dict): {courier_id: CourierState} последних записанных заказов.
+
+    Returns:
+        OrderPlan: Новые и обновлённые заказы.
+    """
+    plan = OrderPlan(courier_ids, last_orders)
+    for observed_at, latest in batches:
+        plan.apply(observed_at, latest)
+    return plan
+
+
+class CourierStateCache:
+    """
+    Потокобезопасный кэш состояния курьеров в памяти процесса, ключ — пара (склад, имя курьера).
+
+    Кэш заполняется при запуске и обновляется после каждой успешной записи в базу (write-through),
+    поэтому он корректен, пока этот процесс — единственный писатель в таблицы couriers и orders.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+
+    def get(self, key):
+        """Возвращает `CourierState` курьера по ключу (warehouse, courier_name) или `None`, если его нет в кэше."""
+        with self._lock:
+            return self._states.get(key)
+
+    def update(self, states):
+        """Записывает в кэш состояния из словаря {(warehouse, courier_name): CourierState}."""
+        with self._lock:
+            self._states.update(states)
+
+    def replace(self, states):
+        """Полностью заменяет содержимое кэша."""
+        with self._lock:
+            self._states = dict(states)
+
+    def items(self):
+        """Возвращает копию содержимого кэша: список пар ((warehouse, courier_name), CourierState)."""
+        with self._lock:
+            return list(self._states.items())
+
+    def invalidate(self):
+        """Очищает кэш; следующие обращения снова прочитают состояние из базы."""
+        with self._lock:
+            self._states.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
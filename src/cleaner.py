@@ -1,57 +1,169 @@
-from src.db import clear_tables, get_local_time, get_all_couriers
+import logging
+import threading
+from datetime import timedelta
 
-def is_within_time_range(start_hour, start_minute, end_hour, end_minute):
-    """
-    Проверяет, находится ли текущее время в заданном диапазоне.
+from src.config import get_local_time
+from src.storage import get_storage
+
+logger = logging.getLogger(__name__)
 
-    Функция сравнивает текущее время с заданным диапазоном времени (начало и конец)
-    и возвращает `True`, если текущее время находится внутри диапазона, и `False`, если нет.
+
+class Job:
+    """
+    Задача, которая выполняется один раз в ежедневном окне времени.
 
     Args:
-        start_hour (int): Час начала диапазона времени.
-        start_minute (int): Минута начала диапазона времени.
-        end_hour (int): Час конца диапазона времени.
-        end_minute (int): Минута конца диапазона времени.
+        name (str): Уникальное имя задачи (ключ в таблице scheduler_runs).
+        start (tuple): Начало окна (час, минута).
+        end (tuple): Конец окна (час, минута).
+        func (callable): Функция задачи.
+    """
 
-    Returns:
-        bool: `True`, если текущее время внутри указанного диапазона, `False` — если за пределами.
+    def __init__(self, name, start, end, func):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.func = func
+        self.last_run = None
+
+    def window(self, now):
+        """
+        Возвращает окно запуска на день `now`.
+
+        Returns:
+            tuple: Начало и конец окна (datetime).
+        """
+        start = now.replace(hour=self.start[0], minute=self.start[1], second=0, microsecond=0)
+        end = now.replace(hour=self.end[0], minute=self.end[1], second=0, microsecond=0)
+        return start, end
+
+    def next_run(self, now):
+        """
+        Вычисляет время следующего запуска: сейчас, если текущее окно открыто и задача
+        в нём ещё не запускалась, иначе начало ближайшего следующего окна.
+
+        Args:
+            now (datetime): Текущее время.
+
+        Returns:
+            datetime: Время следующего запуска.
+        """
+        start, end = self.window(now)
+        ran_in_window = self.last_run is not None and self.last_run >= start
+        if now < start:
+            return start
+        if now <= end and not ran_in_window:
+            return now
+        return start + timedelta(days=1)
+
+
+def apply_retention():
+    """Удаляет заказы старше срока хранения: в PostgreSQL — ротация секций, в SQLite — удаление строк."""
+    return get_storage().apply_retention()
 
+
+# Задачи обслуживания базы данных
+JOBS = [
+    # Срок хранения заказов: в PostgreSQL — создание секций на ближайшие дни и удаление старых
+    Job("rotate_partitions", (3, 30), (6, 0), apply_retention),
+]
+
+
+class Scheduler:
     """
-    now = get_local_time()
-    start_time = now.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
-    end_time = now.replace(hour=end_hour, minute=end_minute, second=0, microsecond=0)
-    return start_time <= now <= end_time
+    Планировщик задач в фоновом потоке. Для каждой задачи вычисляется время следующего
+    запуска, и поток спит до ближайшего из них, не обращаясь к базе между запусками.
 
+    Перед выполнением запуск задачи атомарно отмечается в таблице scheduler_runs, поэтому
+    задача выполняется ровно один раз в окне, даже после перезапуска процесса.
+    Если задача завершилась с ошибкой, отметка снимается и запуск повторяется через `retry_delay`.
 
-def scheduled_clear_tables():
+    Args:
+        jobs (list): Задачи `Job`.
+        retry_delay (float): Пауза перед повторной попыткой после ошибки, сек.
     """
-    Проверяет, нужно ли очищать таблицы на основе времени и наличия данных.
 
-    Функция проверяет, находится ли текущее время в диапазоне с 3:30 до 6:00 утра и
-    если таблица курьеров не пуста, то запускает очистку данных из таблиц с помощью функции `clear_tables`.
+    def __init__(self, jobs, retry_delay=300.0):
+        self.jobs = jobs
+        self.retry_delay = retry_delay
+        self._stop = threading.Event()
+        self._thread = None
+        self._retry_at = {}
 
-    Если текущее время не попадает в заданный диапазон или таблицы пусты, очистка не выполняется.
+    def start(self):
+        """Загружает время последних запусков задач и запускает фоновый поток."""
+        for job in self.jobs:
+            try:
+                job.last_run = get_storage().get_job_last_run(job.name)
+            except Exception as e:
+                logger.error("Не удалось получить время последнего запуска задачи %s: %s", job.name, e)
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
 
-    Prints:
-        str: Информация о начале или пропуске очистки выводится в консоль.
+    def stop(self, timeout=5.0):
+        """Останавливает фоновый поток."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
 
-    Returns:
-        None
-    """
-    if is_within_time_range(3, 30, 6, 0) and get_all_couriers() != []:
-        print(f"Очистка начата в {get_local_time()}...")
-        clear_tables()
-    else:
-        print(f"Очистка пропущена в {get_local_time()}: вне диапазона или таблицы пусты.")
+    def _next_run(self, job, now):
+        """Время следующего запуска с учётом паузы после ошибки."""
+        retry_at = self._retry_at.get(job.name)
+        next_run = job.next_run(now)
+        return max(next_run, retry_at) if retry_at else next_run
 
+    def _loop(self):
+        while not self._stop.is_set():
+            now = get_local_time()
+            due = [job for job in self.jobs if self._next_run(job, now) <= now]
+            for job in due:
+                self.run_job(job, now)
 
-def run_scheduler():
+            now = get_local_time()
+            wake_at = min(self._next_run(job, now) for job in self.jobs)
+            self._stop.wait(max((wake_at - now).total_seconds(), 1.0))
+
+    def run_job(self, job, now):
+        """
+        Выполняет задачу, если её запуск в текущем окне удалось отметить в базе.
+        """
+        window_start, _ = job.window(now)
+        try:
+            if not get_storage().claim_job_run(job.name, window_start, now):
+                logger.info("Задача %s уже выполнялась в текущем окне, пропуск.", job.name)
+                job.last_run = now
+                return
+        except Exception as e:
+            logger.error("Не удалось отметить запуск задачи %s: %s", job.name, e)
+            self._retry_at[job.name] = now + timedelta(seconds=self.retry_delay)
+            return
+
+        logger.info("Задача %s начата в %s...", job.name, now)
+        try:
+            job.func()
+        except Exception as e:
+            logger.error("Ошибка при выполнении задачи %s: %s", job.name, e)
+            self._retry_at[job.name] = now + timedelta(seconds=self.retry_delay)
+            try:
+                get_storage().release_job_run(job.name)
+            except Exception as release_error:
+                logger.error("Не удалось снять отметку запуска задачи %s: %s", job.name, release_error)
+            return
+
+        self._retry_at.pop(job.name, None)
+        job.last_run = now
+
+
+def start_scheduler(jobs=None):
     """
-    Запускает планировщик для выполнения функции очистки таблиц.
+    Запускает планировщик задач обслуживания в фоновом потоке.
 
-    Функция вызывает `scheduled_clear_tables`, чтобы выполнить проверку и очистку таблиц, если это необходимо.
+    Args:
+        jobs (list, optional): Задачи `Job`. По умолчанию `JOBS`.
 
     Returns:
-        None
+        Scheduler: Запущенный планировщик; для остановки вызовите `stop()`.
     """
-    scheduled_clear_tables()
+    scheduler = Scheduler(JOBS if jobs is None else jobs)
+    scheduler.start()
+    return scheduler
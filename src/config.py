@@ -0,0 +1,26 @@
+import os
+from datetime import datetime
+
+import pytz
+from dotenv import load_dotenv
+
+# Настройки процесса, общие для всех хранилищ; модуль не зависит от драйвера PostgreSQL,
+# поэтому его можно импортировать и при STORAGE_BACKEND=sqlite
+
+# Установите временную зону
+local_tz = pytz.timezone('Europe/Moscow')  # Укажите ваш часовой пояс
+load_dotenv()
+
+# Склад, к которому относятся наблюдения, если он не указан явно (один дашборд на процесс)
+DEFAULT_WAREHOUSE = os.getenv("WAREHOUSE", "default")
+
+
+# Получение текущего времени в вашем часовом поясе
+def get_local_time():
+    """
+    Возвращает текущее время в часовом поясе 'Europe/Moscow'.
+
+    Returns:
+        datetime: Текущее время в указанном часовом поясе.
+    """
+    return datetime.now(local_tz)
@@ -1,23 +1,46 @@
+import csv
+import io
+import logging
 import os
+import threading
+import uuid
+from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor, execute_values
 from datetime import datetime, timedelta
-import pytz
-from dotenv import load_dotenv
+from src.config import DEFAULT_WAREHOUSE, get_local_time
+from src.cache import CourierState, CourierStateCache, latest_observations, plan_orders
+from src.metrics import DB_STATEMENTS, DB_TRANSACTION_SECONDS, OBSERVATIONS, ORDERS_WRITTEN, Gauge
+from src.pool import ConnectionPool
+from src.rollups import GRANULARITIES, RollupAccumulator, histogram_quantile, merge_histograms
 
-# Установите временную зону
-local_tz = pytz.timezone('Europe/Moscow')  # Укажите ваш часовой пояс
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Получение текущего времени в вашем часовом поясе
-def get_local_time():
-    """
-    Возвращает текущее время в часовом поясе 'Europe/Moscow'.
 
-    Returns:
-        datetime: Текущее время в указанном часовом поясе.
-    """
-    return datetime.now(local_tz)
+class _StatementCountingMixin:
+    """Учитывает каждый отправленный в базу запрос в метрике `DB_STATEMENTS`."""
+
+    def execute(self, query, vars=None):
+        DB_STATEMENTS.inc()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        DB_STATEMENTS.inc(len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        DB_STATEMENTS.inc()
+        return super().copy_expert(sql, file, size)
+
+
+class CountingCursor(_StatementCountingMixin, extensions.cursor):
+    """Курсор по умолчанию для соединений приложения."""
+
+
+class CountingDictCursor(_StatementCountingMixin, RealDictCursor):
+    """Курсор, возвращающий строки словарями."""
 
 
 # Подключение к базе данных PostgreSQL
@@ -37,45 +60,482 @@ def get_connection():
             user=os.getenv("USER_NAME"),  # Имя пользователя, которое вы создали
             password=os.getenv("PASSWORD"),  # Замените на ваш реальный пароль
             host=os.getenv("HOST"),  # Локально
-            port=os.getenv("PORT")
+            port=os.getenv("PORT"),
+            cursor_factory=CountingCursor,
         )
-        print("Подключение к базе данных успешно!")  # Сообщение о успешном подключении
+        logger.debug("Подключение к базе данных успешно!")
         return conn
     except Exception as e:
-        print(f"Ошибка при подключении к базе данных: {e}")
+        logger.error("Ошибка при подключении к базе данных: %s", e)
         raise  # Повторно выбрасываем исключение, если подключение не удалось
 
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Кэш состояния курьеров: процесс — единственный писатель, поэтому неизменившиеся
+# курьеры не требуют обращений к базе
+courier_cache = CourierStateCache()
+
+# Агрегаты time_taken по курьерам, ещё не записанные в таблицу courier_rollups
+rollup_accumulator = RollupAccumulator(float(os.getenv("ROLLUP_FLUSH_INTERVAL", "60")))
+
+
+# Общий пул соединений процесса
+def get_pool():
+    """
+    Возвращает общий для процесса пул соединений, создавая его при первом обращении.
+
+    Размер пула и проверки задаются переменными окружения:
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_HEALTH_CHECK (сек.), DB_POOL_TIMEOUT (сек.).
+
+    Returns:
+        ConnectionPool: Пул соединений с базой данных.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_connection,
+                    minconn=int(os.getenv("DB_POOL_MIN", "1")),
+                    maxconn=int(os.getenv("DB_POOL_MAX", "5")),
+                    health_check_interval=float(os.getenv("DB_POOL_HEALTH_CHECK", "30")),
+                    wait_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+                )
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Берёт соединение из пула на время блока `with` и выполняет блок в одной транзакции:
+    при успешном завершении изменения фиксируются, при исключении откатываются.
+
+    Yields:
+        psycopg2.connection: Соединение с базой данных.
+    """
+    with get_pool().connection() as conn:
+        with conn:
+            yield conn
+
+
+def close_pool():
+    """
+    Закрывает пул соединений. Следующее обращение к базе создаст новый пул.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def set_pool(pool):
+    """
+    Устанавливает общий пул соединений процесса вместо создаваемого по переменным окружения
+    (например, пул к отдельной базе для бенчмарков). Предыдущий пул закрывается.
+
+    Args:
+        pool (ConnectionPool): Новый пул соединений.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool is not pool:
+            _pool.closeall()
+        _pool = pool
+
+
+def get_pool_stats():
+    """
+    Возвращает статистику пула соединений (занятые, ожидания, время подключения).
+
+    Returns:
+        dict: Статистика пула или пустой словарь, если пул ещё не создан.
+    """
+    return _pool.stats() if _pool is not None else {}
+
+
+def _pool_connections():
+    """Занятые и свободные соединения пула для метрики `POOL_CONNECTIONS`."""
+    stats = get_pool_stats()
+    return {(state,): stats[state] for state in ("in_use", "idle") if state in stats}
+
+
+POOL_CONNECTIONS = Gauge("pars_db_pool_connections", "Соединения пула: занятые и свободные.", ["state"],
+                         function=_pool_connections)
+
+
+def _migration_base_tables(cur):
+    """
+    Создаёт таблицы couriers и orders. Таблица orders секционирована по диапазону cur_time
+    (одна секция на день). Таблица orders прежних версий (без секционирования) переносится в новую.
+    """
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS couriers (
+        courier_id SERIAL PRIMARY KEY,
+        courier_name TEXT UNIQUE NOT NULL,
+        last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Таблица orders прежних версий была обычной таблицей — переименовываем её для переноса
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('orders')")
+    row = cur.fetchone()
+    legacy = row is not None and row[0] == "r"
+    if legacy:
+        cur.execute("ALTER TABLE orders RENAME TO orders_legacy")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id SERIAL,
+            courier_id INTEGER REFERENCES couriers(courier_id) ON DELETE CASCADE,
+            time_taken FLOAT,
+            cur_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (order_id, cur_time)
+        ) PARTITION BY RANGE (cur_time);
+    """)
+    cur.execute("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT")
+    _create_partitions(cur, get_local_time().date() - timedelta(days=1), _partitions_ahead())
+
+    if legacy:
+        _migrate_legacy_orders(cur)
+
+
+def _migration_courier_latest(cur):
+    """
+    Создаёт таблицу courier_latest с последним заказом каждого курьера и заполняет её
+    по существующим заказам. Таблица обновляется в той же транзакции, что и запись заказа,
+    поэтому поиск последнего заказа — это выборка по первичному ключу.
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS courier_latest (
+            courier_id INTEGER PRIMARY KEY REFERENCES couriers(courier_id) ON DELETE CASCADE,
+            order_id INTEGER NOT NULL,
+            time_taken FLOAT,
+            cur_time TIMESTAMP NOT NULL
+        );
+    """)
+    cur.execute("""
+        INSERT INTO courier_latest (courier_id, order_id, time_taken, cur_time)
+        SELECT DISTINCT ON (courier_id) courier_id, order_id, time_taken, cur_time
+        FROM orders
+        WHERE courier_id IS NOT NULL
+        ORDER BY courier_id, cur_time DESC
+        ON CONFLICT (courier_id) DO NOTHING
+    """)
+
+
+# Версионированные миграции схемы: (версия, описание, SQL или функция от курсора).
+# Новые миграции добавляются в конец списка; применённые миграции не изменяются.
+MIGRATIONS = [
+    (1, "Таблицы couriers и orders (секционирование по дням)", _migration_base_tables),
+    (2, "Индекс orders (courier_id, cur_time DESC)",
+     "CREATE INDEX IF NOT EXISTS orders_courier_time_idx ON orders (courier_id, cur_time DESC)"),
+    (3, "Таблица courier_latest", _migration_courier_latest),
+    (4, "Таблица scheduler_runs", """
+        CREATE TABLE IF NOT EXISTS scheduler_runs (
+            job_name TEXT PRIMARY KEY,
+            last_run_at TIMESTAMPTZ NOT NULL
+        )
+    """),
+    (5, "Таблица courier_rollups", """
+        CREATE TABLE IF NOT EXISTS courier_rollups (
+            granularity TEXT NOT NULL,
+            courier_id INTEGER NOT NULL REFERENCES couriers(courier_id) ON DELETE CASCADE,
+            bucket_start TIMESTAMPTZ NOT NULL,
+            samples INTEGER NOT NULL,
+            total FLOAT NOT NULL,
+            min_value FLOAT NOT NULL,
+            max_value FLOAT NOT NULL,
+            histogram INTEGER[] NOT NULL,
+            PRIMARY KEY (granularity, courier_id, bucket_start)
+        );
+        CREATE INDEX IF NOT EXISTS courier_rollups_bucket_idx ON courier_rollups (granularity, bucket_start);
+    """),
+    (6, "Таблица spool_checkpoints", """
+        CREATE TABLE IF NOT EXISTS spool_checkpoints (
+            spool_id TEXT PRIMARY KEY,
+            segment BIGINT NOT NULL,
+            byte_offset BIGINT NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """),
+    (7, "Столбец couriers.warehouse, уникальность (warehouse, courier_name)", """
+        ALTER TABLE couriers ADD COLUMN IF NOT EXISTS warehouse TEXT NOT NULL DEFAULT 'default';
+        ALTER TABLE couriers DROP CONSTRAINT IF EXISTS couriers_courier_name_key;
+        ALTER TABLE couriers ADD CONSTRAINT couriers_warehouse_courier_name_key UNIQUE (warehouse, courier_name);
+    """),
+    (8, "Столбец status в orders и courier_latest", """
+        ALTER TABLE orders ADD COLUMN IF NOT EXISTS status TEXT;
+        ALTER TABLE courier_latest ADD COLUMN IF NOT EXISTS status TEXT;
+    """),
+]
+
+# Ключ advisory-блокировки, чтобы миграции не применялись параллельно несколькими процессами
+MIGRATIONS_LOCK_ID = 7340211
+
+
 # Создание таблиц с добавлением столбца deliveries
 def init_db():
     """
-    Инициализирует базу данных, создавая таблицы для курьеров и заказов,
-    если они еще не существуют.
+    Инициализирует базу данных: применяет ещё не применённые миграции из `MIGRATIONS`
+    и создаёт секции таблицы заказов на ближайшие дни.
+
+    Применённые версии хранятся в таблице schema_migrations. Все миграции выполняются
+    в одной транзакции под advisory-блокировкой.
 
     Creates:
+        - schema_migrations: Таблица применённых миграций.
         - couriers: Таблица курьеров с полями courier_id, courier_name и last_update.
-        - orders: Таблица заказов с полями order_id, courier_id, time_taken, cur_time.
+        - orders: Таблица заказов с полями order_id, courier_id, time_taken, cur_time, status,
+          секционированная по дням (orders_pYYYYMMDD и orders_default).
+        - courier_latest: Последний заказ каждого курьера.
+
+    Returns:
+        list: Версии миграций, применённых при этом вызове.
     """
-    with get_connection() as conn:
+    applied_now = []
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_ID,))
             cur.execute("""
-            CREATE TABLE IF NOT EXISTS couriers (
-                courier_id SERIAL PRIMARY KEY,
-                courier_name TEXT UNIQUE NOT NULL,
-                last_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
             """)
+            cur.execute("SELECT version FROM schema_migrations")
+            applied = {version for version, in cur.fetchall()}
+
+            for version, name, migration in MIGRATIONS:
+                if version in applied:
+                    continue
+                if callable(migration):
+                    migration(cur)
+                else:
+                    cur.execute(migration)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                applied_now.append(version)
+                logger.info("Применена миграция %s: %s", version, name)
+
+            _create_partitions(cur, get_local_time().date() - timedelta(days=1), _partitions_ahead())
+    return applied_now
+
+
+def _partitions_ahead():
+    """Количество дней, на которые секции создаются заранее (ORDERS_PARTITIONS_AHEAD)."""
+    return int(os.getenv("ORDERS_PARTITIONS_AHEAD", "2"))
+
+
+def _partition_name(day):
+    """Имя дневной секции таблицы orders."""
+    return f"orders_p{day:%Y%m%d}"
+
+
+def _create_partitions(cur, start_day, days_ahead):
+    """
+    Создаёт дневные секции таблицы orders с `start_day` по сегодняшний день плюс `days_ahead` дней.
+
+    Если секция не была создана вовремя (например, ночная задача пропустила несколько запусков),
+    заказы за этот день уже лежат в orders_default, и `CREATE TABLE ... PARTITION OF` для него
+    невозможен. Тогда секция создаётся отдельной таблицей, заказы переносятся в неё из orders_default
+    и она присоединяется к orders — всё в той же транзакции.
+
+    Args:
+        cur (psycopg2.cursor): Курсор открытой транзакции.
+        start_day (date): Первый день, для которого нужна секция.
+        days_ahead (int): Сколько дней после сегодняшнего покрыть секциями.
+
+    Returns:
+        int: Количество заказов, перенесённых из orders_default.
+    """
+    last_day = get_local_time().date() + timedelta(days=days_ahead)
+    cur.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'orders'::regclass")
+    existing = {name for name, in cur.fetchall()}
+    has_default = "orders_default" in existing
+
+    moved = 0
+    day = start_day
+    while day <= last_day:
+        name = _partition_name(day)
+        bounds = (day, day + timedelta(days=1))
+        day += timedelta(days=1)
+        if name in existing:
+            continue
+
+        stranded = False
+        if has_default:
+            cur.execute("SELECT 1 FROM orders_default WHERE cur_time >= %s AND cur_time < %s LIMIT 1", bounds)
+            stranded = cur.fetchone() is not None
+        if not stranded:
+            cur.execute(f"""
+                CREATE TABLE {name} PARTITION OF orders
+                FOR VALUES FROM (%s) TO (%s)
+            """, bounds)
+            continue
+
+        cur.execute(f"CREATE TABLE {name} (LIKE orders INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cur.execute(f"""
+            WITH stranded AS (
+                DELETE FROM orders_default
+                WHERE cur_time >= %s AND cur_time < %s
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM stranded
+        """, bounds)
+        moved += cur.rowcount
+        cur.execute(f"ALTER TABLE orders ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", bounds)
+    if moved:
+        logger.warning("Перенесено заказов из секции orders_default: %s.", moved)
+    return moved
+
+
+def _migrate_legacy_orders(cur):
+    """Переносит заказы из несекционированной таблицы orders_legacy в секционированную orders."""
+    cur.execute("SELECT min(cur_time), count(*) FROM orders_legacy")
+    first_time, count = cur.fetchone()
+    if first_time is not None:
+        _create_partitions(cur, first_time.date(), _partitions_ahead())
+        cur.execute("""
+            INSERT INTO orders (order_id, courier_id, time_taken, cur_time)
+            SELECT order_id, courier_id, time_taken, COALESCE(cur_time, CURRENT_TIMESTAMP)
+            FROM orders_legacy
+        """)
+        cur.execute("""
+            SELECT setval(pg_get_serial_sequence('orders', 'order_id'), max(order_id))
+            FROM orders
+        """)
+    cur.execute("DROP TABLE orders_legacy")
+    logger.info("Перенесено заказов из прежней таблицы orders: %s.", count)
+
+
+# Ротация секций таблицы заказов
+def rotate_partitions(retention_days=None, detach_only=None):
+    """
+    Создаёт секции таблицы orders на ближайшие дни и убирает секции старше срока хранения.
+
+    Старые секции отсоединяются от orders (`DETACH PARTITION`) и, если не включён режим
+    только отсоединения, удаляются. Обе операции затрагивают только метаданные,
+    в отличие от `TRUNCATE` всей таблицы. Таблица курьеров не очищается.
+
+    Args:
+        retention_days (int, optional): Сколько дней хранить заказы.
+            По умолчанию из ORDERS_RETENTION_DAYS или 30.
+        detach_only (bool, optional): Только отсоединять старые секции, сохраняя их как
+            отдельные таблицы для аналитики. По умолчанию `True`, если ORDERS_RETENTION_MODE=detach.
+
+    Returns:
+        list: Имена отсоединённых или удалённых секций.
+    """
+    if retention_days is None:
+        retention_days = int(os.getenv("ORDERS_RETENTION_DAYS", "30"))
+    if detach_only is None:
+        detach_only = os.getenv("ORDERS_RETENTION_MODE", "drop") == "detach"
+    oldest_kept = get_local_time().date() - timedelta(days=retention_days)
+
+    removed = []
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            _create_partitions(cur, get_local_time().date(), _partitions_ahead())
+
+            cur.execute("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                        "WHERE i.inhparent = 'orders'::regclass")
+            for name, in cur.fetchall():
+                try:
+                    day = datetime.strptime(name, "orders_p%Y%m%d").date()
+                except ValueError:
+                    continue  # Секция по умолчанию
+                if day >= oldest_kept:
+                    continue
+                cur.execute(f"ALTER TABLE orders DETACH PARTITION {name}")
+                if not detach_only:
+                    cur.execute(f"DROP TABLE {name}")
+                removed.append(name)
+
+            if removed:
+                cur.execute("DELETE FROM courier_latest WHERE cur_time < %s", (oldest_kept,))
+
+    if removed:
+        # Последние заказы части курьеров могли быть удалены вместе с секциями
+        courier_cache.invalidate()
+        action = "отсоединены" if detach_only else "удалены"
+        logger.info("Секции заказов %s: %s", action, ", ".join(sorted(removed)))
+    return removed
+
+
+# Загрузка состояния курьеров в кэш
+def load_courier_state():
+    """
+    Загружает в кэш `courier_cache` ID каждого курьера всех складов и его последний заказ одним запросом.
+    Вызывается при запуске, чтобы первые циклы опроса не читали состояние из базы.
+
+    Returns:
+        int: Количество загруженных курьеров.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
             cur.execute("""
-                CREATE TABLE IF NOT EXISTS orders (
-                    order_id SERIAL PRIMARY KEY,
-                    courier_id INTEGER REFERENCES couriers(courier_id) ON DELETE CASCADE,
-                    time_taken FLOAT,
-                    cur_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP  
-                );
+                SELECT c.warehouse, c.courier_name, c.courier_id, l.order_id, l.time_taken, l.cur_time, l.status
+                FROM couriers c
+                LEFT JOIN courier_latest l USING (courier_id)
             """)
-            conn.commit()
+            rows = cur.fetchall()
+
+    courier_cache.replace({
+        (warehouse, courier_name): CourierState(courier_id, order_id, time_taken, cur_time, status)
+        for warehouse, courier_name, courier_id, order_id, time_taken, cur_time, status in rows
+    })
+    logger.info("Состояние %s курьеров загружено в кэш.", len(rows))
+    return len(rows)
+
+
+def _resolve_couriers(cur, warehouse, names):
+    """
+    Находит или создаёт курьеров одним запросом `INSERT ... ON CONFLICT ... RETURNING`
+    и читает их последние заказы одним запросом по первичному ключу courier_latest.
+
+    Args:
+        cur (psycopg2.cursor): Курсор открытой транзакции.
+        warehouse (str): Склад.
+        names (list): Имена курьеров, отсортированные по возрастанию.
+
+    Returns:
+        tuple: {courier_name: courier_id} и {courier_id: CourierState} последних заказов.
+    """
+    cur.execute("""
+        WITH input AS (
+            SELECT unnest(%s::text[]) AS courier_name
+        ), inserted AS (
+            INSERT INTO couriers (warehouse, courier_name)
+            SELECT %s, courier_name FROM input
+            ON CONFLICT (warehouse, courier_name) DO NOTHING
+            RETURNING courier_id, courier_name
+        )
+        SELECT courier_id, courier_name FROM inserted
+        UNION ALL
+        SELECT c.courier_id, c.courier_name
+        FROM couriers c JOIN input USING (courier_name)
+        WHERE c.warehouse = %s
+    """, (names, warehouse, warehouse))
+    courier_ids = {courier_name: courier_id for courier_id, courier_name in cur.fetchall()}
+
+    cur.execute("""
+        SELECT courier_id, order_id, time_taken, cur_time, status
+        FROM courier_latest
+        WHERE courier_id = ANY(%s)
+    """, (list(courier_ids.values()),))
+    last_orders = {
+        courier_id: CourierState(courier_id, order_id, last_time, cur_time, status)
+        for courier_id, order_id, last_time, cur_time, status in cur.fetchall()
+    }
+    return courier_ids, last_orders
+
 
 # Сохранение или обновление данных курьера и заказа
-def save_courier_data(courier_name, time_taken):
+def save_courier_data(courier_name, time_taken, warehouse=DEFAULT_WAREHOUSE):
     """
     Сохраняет или обновляет данные курьера и его последнего заказа в базе данных.
     Если курьер уже существует, обновляется информация о последнем заказе.
@@ -84,87 +544,442 @@ def save_courier_data(courier_name, time_taken):
     Args:
         courier_name (str): Имя курьера.
         time_taken (float): Время, затраченное на заказ.
+        warehouse (str): Склад курьера.
+
+    Returns:
+        dict: Результат `save_courier_batch` для одного наблюдения.
+    """
+    return save_courier_batch([(courier_name, time_taken)], warehouse)
+
+
+# Пакетное сохранение всех наблюдений одного цикла опроса
+def save_courier_batch(observations, warehouse=DEFAULT_WAREHOUSE):
+    """
+    Сохраняет все наблюдения одного цикла опроса в одной транзакции.
+
+    Состояние курьеров берётся из кэша `courier_cache`: если ни один курьер не изменился,
+    запрос в базу не отправляется. Неизвестные кэшу курьеры находятся или создаются одним
+    запросом `INSERT ... ON CONFLICT ... RETURNING`, а их последние заказы читаются одним
+    запросом по первичному ключу таблицы courier_latest.
+    Затем применяется правило записи `OrderPlan` (src.cache), общее для всех хранилищ: если
+    time_taken уменьшился, добавляется новый заказ, иначе обновляется последний; если изменился
+    только статус, у последнего заказа обновляется только статус. Если курьер встречается
+    в пакете несколько раз, учитывается последнее наблюдение. courier_latest обновляется
+    в той же транзакции, а кэш — после её фиксации.
+
+    В агрегатах `rollup_accumulator`, которые периодически сливаются в courier_rollups,
+    учитываются версии заказов (`OrderPlan.samples`): новый заказ или изменение time_taken,
+    а не каждое наблюдение опроса, поэтому все режимы записи дают одинаковые агрегаты.
+
+    Args:
+        observations (iterable): Пары (courier_name, time_taken) или снимки `OrderSnapshot`
+            со статусом, который записывается в столбец status.
+        warehouse (str): Склад, к которому относятся наблюдения.
+
+    Returns:
+        dict: Количество добавленных (`inserted`), обновлённых (`updated`)
+        и пропущенных без изменений (`unchanged`) наблюдений, а также список
+        записанных заказов (`changes`) с полями warehouse, courier_name, courier_id, order_id,
+        time_taken, cur_time, status и kind ("new" или "updated").
+    """
+    latest = latest_observations(observations, warehouse)
+    # Сортировка имён даёт одинаковый порядок блокировок строк и ID новых заказов у параллельных писателей
+    result = _apply_batches([(get_local_time(), {key: latest[key] for key in sorted(latest)})])
+    logger.debug("Сохранено наблюдений: %s, новых заказов: %s, обновлено: %s, без изменений: %s.",
+                 len(latest), result["inserted"], result["updated"], result["unchanged"])
+    return result
+
+
+# Применение журнала наблюдений из локальной очереди (spool)
+def apply_observation_log(entries, spool_id=None, position=None):
+    """
+    Применяет упорядоченный журнал наблюдений одной транзакцией с сохранением порядка:
+    правило записи применяется к каждому пакету по очереди, со временем его получения,
+    как если бы пакеты сохранялись `save_courier_batch` по одному.
+
+    Последовательность вычисляется в памяти (`OrderPlan`), а в базу уходят только итоговые строки:
+    ID новых заказов выделяются из последовательности одним запросом, заказы загружаются
+    через `COPY`, обновления и courier_latest — пакетами `execute_values`. Поэтому накопленный
+    за время недоступности базы журнал применяется со скоростью массовой загрузки.
+
+    Если указаны `spool_id` и `position`, позиция журнала сохраняется в таблице
+    spool_checkpoints в той же транзакции: каждый пакет применяется ровно один раз.
+
+    Args:
+        entries (list): Тройки (observed_at, warehouse, observations) в порядке получения;
+            observations — пары (courier_name, time_taken) или снимки `OrderSnapshot`.
+        spool_id (str, optional): Идентификатор локальной очереди.
+        position (tuple, optional): (segment, byte_offset) после последнего пакета.
+
+    Returns:
+        dict: Как у `save_courier_batch`: inserted, updated, unchanged и changes.
+    """
+    batches = [
+        (observed_at, latest_observations(observations, warehouse))
+        for observed_at, warehouse, observations in entries
+    ]
+    return _apply_batches(batches, spool_id, position, bulk=True)
+
+
+def _apply_batches(batches, spool_id=None, position=None, bulk=False):
+    """
+    Записывает пакеты {(warehouse, courier_name): (time_taken, status)} с временем получения
+    одной транзакцией по правилу `OrderPlan`.
+
+    Args:
+        batches (list): Пары (observed_at, наблюдения) в порядке получения.
+        spool_id (str, optional): Идентификатор локальной очереди для сохранения позиции.
+        position (tuple, optional): (segment, byte_offset) после последнего пакета.
+        bulk (bool): Загружать новые заказы через `COPY` (журнал очереди), а не `INSERT`.
 
-    Prints:
-        str: Сообщения о выполненных действиях (добавление нового заказа, обновление и т. д.).
+    Returns:
+        dict: inserted, updated, unchanged и changes.
     """
-    with get_connection() as conn:
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "changes": []}
+    keys = sorted({key for _, latest in batches for key in latest})
+    courier_ids = {}
+    last_orders = {}
+    unknown = {}
+    for key in keys:
+        state = courier_cache.get(key)
+        if state is None:
+            unknown.setdefault(key[0], []).append(key[1])
+            continue
+        courier_ids[key] = state.courier_id
+        if state.order_id is not None:
+            last_orders[state.courier_id] = state
+
+    plan = None
+    if not unknown and spool_id is None:
+        # Все курьеры известны кэшу: если изменений нет, транзакция не нужна
+        plan = plan_orders(batches, courier_ids, last_orders)
+        if not plan.has_writes:
+            OBSERVATIONS.inc(sum(len(latest) for _, latest in batches))
+            _record_samples(plan.samples)
+            result["unchanged"] = plan.unchanged
+            return result
+
+    with DB_TRANSACTION_SECONDS.time(), pooled_connection() as conn:
         with conn.cursor() as cur:
-            # Находим ID курьера или создаем новую запись
-            cur.execute("SELECT courier_id FROM couriers WHERE courier_name = %s", (courier_name,))
-            courier = cur.fetchone()
+            for warehouse, names in unknown.items():
+                # Находим или создаём всех неизвестных курьеров и читаем их последние заказы
+                resolved, resolved_orders = _resolve_couriers(cur, warehouse, names)
+                courier_ids.update({(warehouse, name): courier_id for name, courier_id in resolved.items()})
+                last_orders.update(resolved_orders)
+            if plan is None:
+                plan = plan_orders(batches, courier_ids, last_orders)
+
+            if plan.new_orders:
+                _insert_orders(cur, plan, bulk)
+            if plan.updated_orders:
+                # Условие по cur_time — это полный первичный ключ: обновление затрагивает одну секцию
+                execute_values(cur, """
+                    UPDATE orders AS o
+                    SET time_taken = v.time_taken, cur_time = v.cur_time, status = v.status
+                    FROM (VALUES %s) AS v(order_id, prev_time, time_taken, cur_time, status)
+                    WHERE o.order_id = v.order_id AND o.cur_time = v.prev_time
+                """, [
+                    (order_id, prev_time, state.time_taken, state.cur_time, state.status)
+                    for order_id, (prev_time, state) in plan.updated_orders.items()
+                ], template="(%s, %s::timestamp, %s::float, %s, %s::text)", page_size=1000)
+
+            # Последний заказ каждого записанного курьера — в той же транзакции
+            states = plan.states()
+            written = plan.written(states)
+            if written:
+                execute_values(cur, """
+                    INSERT INTO courier_latest (courier_id, order_id, time_taken, cur_time, status)
+                    VALUES %s
+                    ON CONFLICT (courier_id) DO UPDATE
+                    SET order_id = EXCLUDED.order_id, time_taken = EXCLUDED.time_taken,
+                        cur_time = EXCLUDED.cur_time, status = EXCLUDED.status
+                """, [
+                    (state.courier_id, state.order_id, state.time_taken, state.cur_time, state.status)
+                    for state in written.values()
+                ], page_size=1000)
 
-            if not courier:
+            if spool_id is not None and position is not None:
                 cur.execute("""
-                    INSERT INTO couriers (courier_name)
-                    VALUES (%s)
-                    RETURNING courier_id
-                """, (courier_name,))
-                courier_id = cur.fetchone()[0]
-            else:
-                courier_id = courier[0]
-
-            # Получаем последний заказ курьера с его time_taken
+                    INSERT INTO spool_checkpoints (spool_id, segment, byte_offset, updated_at)
+                    VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (spool_id) DO UPDATE
+                    SET segment = EXCLUDED.segment, byte_offset = EXCLUDED.byte_offset,
+                        updated_at = EXCLUDED.updated_at
+                """, (spool_id, *position))
+
+    # Транзакция зафиксирована — обновляем кэш и агрегаты
+    courier_cache.update(states)
+    _record_samples(plan.samples)
+
+    result["inserted"] = len(plan.new_orders)
+    result["updated"] = len(plan.updated_orders)
+    result["unchanged"] = plan.unchanged
+    OBSERVATIONS.inc(sum(len(latest) for _, latest in batches))
+    ORDERS_WRITTEN.labels("new").inc(result["inserted"])
+    ORDERS_WRITTEN.labels("updated").inc(result["updated"])
+    result["changes"] = plan.changes()
+    return result
+
+
+def _insert_orders(cur, plan, bulk):
+    """
+    Выделяет ID новым заказам плана одним запросом к последовательности и записывает заказы:
+    через `COPY` во временную таблицу (`bulk`) или одним `INSERT ... VALUES`.
+    """
+    cur.execute(
+        "SELECT nextval(pg_get_serial_sequence('orders', 'order_id')) FROM generate_series(1, %s)",
+        (len(plan.new_orders),),
+    )
+    plan.assign_order_ids(order_id for order_id, in cur.fetchall())
+    if not bulk:
+        execute_values(cur, """
+            INSERT INTO orders (order_id, courier_id, time_taken, cur_time, status)
+            VALUES %s
+        """, plan.new_orders, page_size=1000)
+        return
+
+    # COPY во временную таблицу с timestamptz, чтобы время приводилось так же, как при INSERT
+    cur.execute("""
+        CREATE TEMP TABLE spool_orders (
+            order_id INTEGER, courier_id INTEGER, time_taken FLOAT, cur_time TIMESTAMPTZ, status TEXT
+        ) ON COMMIT DROP
+    """)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (order_id, courier_id, time_taken, cur_time.isoformat(), status)
+        for order_id, courier_id, time_taken, cur_time, status in plan.new_orders
+    )
+    buffer.seek(0)
+    cur.copy_expert("COPY spool_orders FROM STDIN WITH (FORMAT csv)", buffer)
+    cur.execute("""
+        INSERT INTO orders (order_id, courier_id, time_taken, cur_time, status)
+        SELECT order_id, courier_id, time_taken, cur_time, status FROM spool_orders
+    """)
+
+
+def get_spool_checkpoint(spool_id):
+    """
+    Возвращает позицию, до которой журнал локальной очереди уже применён к базе.
+
+    Args:
+        spool_id (str): Идентификатор локальной очереди.
+
+    Returns:
+        tuple | None: (segment, byte_offset) или `None`, если журнал ещё не применялся.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT segment, byte_offset FROM spool_checkpoints WHERE spool_id = %s", (spool_id,))
+            row = cur.fetchone()
+    return tuple(row) if row else None
+
+
+def _record_samples(samples):
+    """
+    Учитывает версии заказов (courier_id, time_taken, observed_at) в агрегатах и сливает их в базу,
+    если подошёл срок.
+    """
+    for courier_id, time_taken, observed_at in samples:
+        rollup_accumulator.add(courier_id, time_taken, observed_at)
+    if rollup_accumulator.due():
+        try:
+            flush_rollups()
+        except Exception as e:
+            logger.error("Ошибка при сохранении агрегатов: %s", e)
+
+
+# Запись агрегатов time_taken
+def flush_rollups():
+    """
+    Записывает накопленные в памяти агрегаты в таблицу courier_rollups одним запросом.
+    Обновляются только «грязные» интервалы: значения складываются с уже сохранёнными.
+    Если запись не удалась, агрегаты возвращаются в накопитель.
+
+    Returns:
+        int: Количество записанных интервалов.
+    """
+    rows = rollup_accumulator.take()
+    if not rows:
+        return 0
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO courier_rollups AS r
+                        (granularity, courier_id, bucket_start, samples, total, min_value, max_value, histogram)
+                    VALUES %s
+                    ON CONFLICT (granularity, courier_id, bucket_start) DO UPDATE
+                    SET samples = r.samples + EXCLUDED.samples,
+                        total = r.total + EXCLUDED.total,
+                        min_value = LEAST(r.min_value, EXCLUDED.min_value),
+                        max_value = GREATEST(r.max_value, EXCLUDED.max_value),
+                        histogram = ARRAY(
+                            SELECT a + b
+                            FROM unnest(r.histogram, EXCLUDED.histogram) WITH ORDINALITY AS h(a, b, i)
+                            ORDER BY i
+                        )
+                """, sorted(rows, key=lambda row: row[:3]), template="(%s, %s, %s, %s, %s, %s, %s, %s::integer[])")
+    except Exception:
+        rollup_accumulator.restore(rows)
+        raise
+    return len(rows)
+
+
+def _rollup_stats(samples, total, minimum, maximum, histogram):
+    """Итоговые показатели интервала: количество, среднее, минимум, максимум, p50 и p90."""
+    return {
+        "samples": samples,
+        "mean": total / samples if samples else None,
+        "min": minimum,
+        "max": maximum,
+        "p50": histogram_quantile(histogram, 0.5),
+        "p90": histogram_quantile(histogram, 0.9),
+    }
+
+
+# Чтение агрегатов по курьеру
+def get_courier_rollups(courier_id, start, end=None, granularity="5m"):
+    """
+    Возвращает агрегаты time_taken курьера по интервалам вместо чтения сырых заказов.
+
+    Args:
+        courier_id (int): ID курьера.
+        start (datetime): Начало диапазона (включительно).
+        end (datetime, optional): Конец диапазона (не включительно). По умолчанию — текущее время.
+        granularity (str): Интервал агрегации: "5m" или "1h".
+
+    Returns:
+        list: Словари с bucket_start, samples, mean, min, max, p50 и p90.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Неизвестный интервал агрегации: {granularity}")
+    end = end or get_local_time()
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
             cur.execute("""
-                SELECT order_id, time_taken 
-                FROM orders 
-                WHERE courier_id = %s 
-                ORDER BY cur_time DESC LIMIT 1
-            """, (courier_id,))
-            last_order = cur.fetchone()
-
-            # Логируем, что происходит с последним заказом
-            if last_order:
-                print(f"У курьера {courier_name} последний заказ с time_taken {last_order[1]}.")
-
-                # Если time_taken нового заказа меньше предыдущего, то это новый заказ
-                if time_taken is not None and time_taken < last_order[1]:
-                    print(f"Для курьера {courier_name} добавлен новый заказ с time_taken {time_taken}.")
-                    # Добавляем новый заказ
-                    cur.execute("""
-                        INSERT INTO orders (courier_id, time_taken, cur_time)
-                        VALUES (%s, %s, %s)
-                    """, (courier_id, time_taken, get_local_time()))
-                    print("Новый заказ добавлен в базу данных.")
-                else:
-                    print(f"У курьера {courier_name} нет нового заказа. Текущее время: {time_taken}, последнее время: {last_order[1]}.")
-                    # Если time_taken больше или равно предыдущему, обновляем время
-                    if time_taken is not None:
-                        print(
-                            f"У курьера {courier_name} нет нового заказа. Обновляем время с {last_order[1]} на {time_taken}.")
-                        cur.execute("""
-                                                UPDATE orders
-                                                SET time_taken = %s, cur_time = %s
-                                                WHERE order_id = %s
-                                            """, (time_taken, get_local_time(), last_order[0]))
-                        print(f"Время для последнего заказа курьера {courier_name} обновлено.")
-            else:
-                # Если заказов еще нет, добавляем первый
-                print(f"У курьера {courier_name} еще нет заказов. Добавляем первый заказ с time_taken 0.")
-                cur.execute("""
-                    INSERT INTO orders (courier_id, time_taken, cur_time)
-                    VALUES (%s, %s, %s)
-                """, (courier_id, 0, get_local_time()))
-                print("Первый заказ добавлен в базу данных.")
+                SELECT bucket_start, samples, total, min_value, max_value, histogram
+                FROM courier_rollups
+                WHERE granularity = %s AND courier_id = %s AND bucket_start >= %s AND bucket_start < %s
+                ORDER BY bucket_start
+            """, (granularity, courier_id, start, end))
+            rows = cur.fetchall()
+    return [{"bucket_start": row[0], **_rollup_stats(*row[1:])} for row in rows]
+
+
+# Сводка агрегатов по всем курьерам
+def get_rollup_summary(start, end=None, granularity="1h", warehouse=None):
+    """
+    Возвращает показатели time_taken каждого курьера за период, объединяя агрегаты интервалов.
+
+    Args:
+        start (datetime): Начало диапазона (включительно).
+        end (datetime, optional): Конец диапазона (не включительно). По умолчанию — текущее время.
+        granularity (str): Интервал агрегации, по которому строится сводка: "5m" или "1h".
+        warehouse (str, optional): Только курьеры этого склада. По умолчанию — все склады.
+
+    Returns:
+        list: Словари с courier_id, warehouse, courier_name, samples, mean, min, max, p50 и p90.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Неизвестный интервал агрегации: {granularity}")
+    end = end or get_local_time()
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT r.courier_id, c.warehouse, c.courier_name, sum(r.samples), sum(r.total),
+                       min(r.min_value), max(r.max_value), array_agg(r.histogram)
+                FROM courier_rollups r
+                JOIN couriers c USING (courier_id)
+                WHERE r.granularity = %s AND r.bucket_start >= %s AND r.bucket_start < %s
+                  AND (%s::text IS NULL OR c.warehouse = %s)
+                GROUP BY r.courier_id, c.warehouse, c.courier_name
+                ORDER BY c.warehouse, c.courier_name
+            """, (granularity, start, end, warehouse, warehouse))
+            rows = cur.fetchall()
+    # array_agg по массивам даёт двумерный массив, psycopg2 возвращает его списком гистограмм
+    return [
+        {
+            "courier_id": courier_id,
+            "warehouse": courier_warehouse,
+            "courier_name": courier_name,
+            **_rollup_stats(samples, total, minimum, maximum, merge_histograms(histograms)),
+        }
+        for courier_id, courier_warehouse, courier_name, samples, total, minimum, maximum, histograms in rows
+    ]
+
+
+# Учёт запусков задач планировщика
+def get_job_last_run(job_name):
+    """
+    Возвращает время последнего запуска задачи планировщика.
+
+    Args:
+        job_name (str): Имя задачи.
+
+    Returns:
+        datetime | None: Время последнего запуска или `None`, если задача не запускалась.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT last_run_at FROM scheduler_runs WHERE job_name = %s", (job_name,))
+            row = cur.fetchone()
+    return row[0] if row else None
+
+
+def claim_job_run(job_name, window_start, run_at):
+    """
+    Атомарно отмечает запуск задачи в текущем окне. Если задача уже запускалась
+    в этом окне (в том числе другим процессом или до перезапуска), отметка не ставится.
+
+    Args:
+        job_name (str): Имя задачи.
+        window_start (datetime): Начало текущего окна запуска.
+        run_at (datetime): Время запуска.
+
+    Returns:
+        bool: `True`, если запуск отмечен и задачу нужно выполнить.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO scheduler_runs (job_name, last_run_at)
+                VALUES (%s, %s)
+                ON CONFLICT (job_name) DO UPDATE
+                SET last_run_at = EXCLUDED.last_run_at
+                WHERE scheduler_runs.last_run_at < %s
+                RETURNING job_name
+            """, (job_name, run_at, window_start))
+            return cur.fetchone() is not None
+
+
+def release_job_run(job_name):
+    """
+    Снимает отметку о запуске задачи (например, если она завершилась с ошибкой),
+    чтобы задача могла повторно запуститься в том же окне.
+
+    Args:
+        job_name (str): Имя задачи.
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE scheduler_runs SET last_run_at = to_timestamp(0) WHERE job_name = %s", (job_name,))
 
-            # Завершаем транзакцию
-            conn.commit()
-            print("Транзакция завершена, данные сохранены.")
 
 # Получение данных курьера
-def get_courier_data(courier_name):
+def get_courier_data(courier_name, warehouse=DEFAULT_WAREHOUSE):
     """
     Получает данные курьера по имени.
 
     Args:
         courier_name (str): Имя курьера.
+        warehouse (str): Склад курьера.
 
     Returns:
         dict: Данные курьера в виде словаря, если курьер найден, иначе None.
     """
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM couriers WHERE courier_name = %s", (courier_name,))
+    with pooled_connection() as conn:
+        with conn.cursor(cursor_factory=CountingDictCursor) as cur:
+            cur.execute("SELECT * FROM couriers WHERE warehouse = %s AND courier_name = %s", (warehouse, courier_name))
             return cur.fetchone()
 
 # Получение всех курьеров
@@ -175,8 +990,8 @@ def get_all_couriers():
     Returns:
         list: Список словарей с данными всех курьеров.
     """
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+    with pooled_connection() as conn:
+        with conn.cursor(cursor_factory=CountingDictCursor) as cur:
             cur.execute("SELECT * FROM couriers")
             return cur.fetchall()
 
@@ -188,21 +1003,90 @@ def get_all_orders():
     Returns:
         list: Список словарей с данными всех заказов.
     """
-    with get_connection() as conn:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+    with pooled_connection() as conn:
+        with conn.cursor(cursor_factory=CountingDictCursor) as cur:
             cur.execute("SELECT * FROM orders")
             return cur.fetchall()
 
+
+def _stream_rows(query, params, batch_size):
+    """
+    Выполняет запрос через именованный (серверный) курсор и отдаёт строки по одной,
+    подгружая их с сервера пачками по `batch_size`.
+
+    Соединение занято, пока генератор не исчерпан или не закрыт.
+    """
+    batch_size = batch_size or int(os.getenv("DB_STREAM_BATCH_SIZE", "2000"))
+    with pooled_connection() as conn:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=CountingDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            for row in cur:
+                yield row
+
+
+# Потоковое чтение заказов
+def iter_orders(start=None, end=None, courier_id=None, batch_size=None, ordered=False):
+    """
+    Потоково читает заказы через серверный курсор: память не зависит от размера таблицы,
+    а обработку строк можно начинать до завершения запроса.
+
+    Условие по cur_time позволяет PostgreSQL читать только нужные секции таблицы orders.
+
+    Args:
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+        courier_id (int, optional): ID курьера.
+        batch_size (int, optional): Сколько строк получать с сервера за раз.
+            По умолчанию из DB_STREAM_BATCH_SIZE или 2000.
+        ordered (bool): Упорядочить по cur_time. Без сортировки первые строки приходят сразу,
+            а не после сортировки всего диапазона на сервере.
+
+    Yields:
+        dict: Данные заказа.
+    """
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("cur_time >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("cur_time < %s")
+        params.append(end)
+    if courier_id is not None:
+        conditions.append("courier_id = %s")
+        params.append(courier_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    order_by = "ORDER BY cur_time" if ordered else ""
+    yield from _stream_rows(f"SELECT * FROM orders {where} {order_by}", params, batch_size)
+
+
+# Потоковое чтение курьеров
+def iter_couriers(batch_size=None):
+    """
+    Потоково читает курьеров через серверный курсор.
+
+    Args:
+        batch_size (int, optional): Сколько строк получать с сервера за раз.
+            По умолчанию из DB_STREAM_BATCH_SIZE или 2000.
+
+    Yields:
+        dict: Данные курьера.
+    """
+    yield from _stream_rows("SELECT * FROM couriers ORDER BY courier_id", (), batch_size)
+
+
 def clear_tables():
     """
     Очищает таблицы 'couriers' и 'orders', удаляя все данные и сбрасывая идентификаторы.
     Это действие сбрасывает состояние таблиц на чистое.
-
-    Prints:
-        str: Сообщение об очистке таблиц.
     """
-    with get_connection() as conn:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
-            cur.execute("TRUNCATE TABLE orders, couriers RESTART IDENTITY CASCADE;")  # Очистить таблицу orders
+            # Очистить таблицы заказов и курьеров
+            cur.execute("TRUNCATE TABLE courier_rollups, courier_latest, orders, couriers RESTART IDENTITY CASCADE;")
             conn.commit()
-            print(f"Таблицы 'couriers' и 'orders' очищены в {get_local_time()}")
+    courier_cache.invalidate()
+    rollup_accumulator.clear()
+    logger.info("Таблицы 'couriers' и 'orders' очищены.")
@@ -0,0 +1,214 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime
+
+from src.db import pooled_connection
+
+# Заказы вместе с именами курьеров; {where} — условие по диапазону cur_time
+EXPORT_QUERY = """
+    SELECT o.order_id, o.courier_id, c.warehouse, c.courier_name, o.time_taken, o.status, o.cur_time
+    FROM orders o
+    JOIN couriers c USING (courier_id)
+    {where}
+    ORDER BY o.cur_time
+"""
+
+EXPORT_FORMATS = ("csv", "parquet", "xlsx")
+
+EXPORT_COLUMNS = ["order_id", "courier_id", "warehouse", "courier_name", "time_taken", "status", "cur_time"]
+
+# Типы столбцов при чтении выгрузки: без них pandas угадывает тип каждого куска отдельно,
+# и склад или имя из одних цифр становятся числами (cur_time разбирается через parse_dates)
+EXPORT_DTYPES = {
+    "order_id": "int64",
+    "courier_id": "int64",
+    "warehouse": str,
+    "courier_name": str,
+    "time_taken": "float64",
+    "status": str,
+}
+
+# Максимальное количество строк на листе Excel (без строки заголовка)
+XLSX_MAX_ROWS = 1_048_575
+
+
+def _build_query(cur, start=None, end=None):
+    """
+    Формирует запрос выгрузки с подставленными границами диапазона:
+    `COPY` не принимает параметры, поэтому значения экранируются через `mogrify`.
+    """
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("o.cur_time >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("o.cur_time < %s")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return cur.mogrify(EXPORT_QUERY.format(where=where), params).decode()
+
+
+def copy_orders_csv(fileobj, start=None, end=None):
+    """
+    Выгружает заказы с именами курьеров в CSV через `COPY ... TO STDOUT`.
+    Данные идут потоком с сервера прямо в файл, не накапливаясь в памяти.
+
+    Args:
+        fileobj (file): Файл, открытый на запись в двоичном режиме.
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+    """
+    with pooled_connection() as conn:
+        with conn.cursor() as cur:
+            query = _build_query(cur, start, end)
+            cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", fileobj)
+
+
+def iter_order_chunks(start=None, end=None, chunksize=50_000):
+    """
+    Выгружает заказы через `COPY` во временный файл на диске и читает его
+    кусками `pandas.DataFrame` фиксированного размера с типами столбцов `EXPORT_DTYPES`.
+
+    Args:
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+        chunksize (int): Количество строк в одном куске.
+
+    Yields:
+        pandas.DataFrame: Очередной кусок заказов.
+    """
+    import pandas as pd
+
+    with tempfile.TemporaryFile() as tmp:
+        copy_orders_csv(tmp, start, end)
+        tmp.seek(0)
+        # Пустыми считаются только значения time_taken и status: имя курьера "NA" остаётся строкой
+        chunks = pd.read_csv(
+            tmp,
+            chunksize=chunksize,
+            dtype=EXPORT_DTYPES,
+            parse_dates=["cur_time"],
+            keep_default_na=False,
+            na_values={"time_taken": [""], "status": [""]},
+        )
+        for chunk in chunks:
+            yield chunk
+
+
+def export_csv(path, start=None, end=None):
+    """
+    Выгружает заказы в CSV-файл.
+
+    Args:
+        path (str): Путь к файлу.
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+    """
+    with open(path, "wb") as file:
+        copy_orders_csv(file, start, end)
+
+
+def export_parquet(path, start=None, end=None, chunksize=50_000):
+    """
+    Выгружает заказы в Parquet-файл: каждый кусок записывается отдельной группой строк.
+
+    Args:
+        path (str): Путь к файлу.
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+        chunksize (int): Количество строк в одной группе.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("order_id", pa.int64()),
+        ("courier_id", pa.int64()),
+        ("warehouse", pa.string()),
+        ("courier_name", pa.string()),
+        ("time_taken", pa.float64()),
+        ("status", pa.string()),
+        ("cur_time", pa.timestamp("us")),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_order_chunks(start, end, chunksize):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def export_xlsx(path, start=None, end=None, chunksize=50_000):
+    """
+    Выгружает заказы в XLSX-файл в потоковом режиме openpyxl (write_only).
+    Если строк больше, чем помещается на лист, создаётся следующий лист.
+
+    Args:
+        path (str): Путь к файлу.
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+        chunksize (int): Количество строк, читаемых за раз.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows_on_sheet = 0
+    for chunk in iter_order_chunks(start, end, chunksize):
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False):
+            if sheet is None or rows_on_sheet >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet(f"orders_{len(workbook.worksheets) + 1}")
+                sheet.append(list(chunk.columns))
+                rows_on_sheet = 0
+            sheet.append(list(row))
+            rows_on_sheet += 1
+
+    if sheet is None:
+        workbook.create_sheet("orders_1").append(EXPORT_COLUMNS)
+    workbook.save(path)
+
+
+def export_orders(path, export_format=None, start=None, end=None):
+    """
+    Выгружает заказы с именами курьеров в файл нужного формата.
+
+    Args:
+        path (str): Путь к файлу.
+        export_format (str, optional): "csv", "parquet" или "xlsx". По умолчанию по расширению файла.
+        start (datetime, optional): Начало диапазона cur_time (включительно).
+        end (datetime, optional): Конец диапазона cur_time (не включительно).
+
+    Raises:
+        ValueError: Если формат не поддерживается.
+    """
+    export_format = export_format or os.path.splitext(path)[1].lstrip(".").lower()
+    if export_format == "csv":
+        export_csv(path, start, end)
+    elif export_format == "parquet":
+        export_parquet(path, start, end)
+    elif export_format == "xlsx":
+        export_xlsx(path, start, end)
+    else:
+        raise ValueError(f"Неподдерживаемый формат выгрузки: {export_format}")
+    print(f"Заказы выгружены в {path}.")
+
+
+def main(argv=None):
+    """
+    Командная строка выгрузки:
+
+        python -m src.export orders.parquet --start 2024-11-01 --end 2024-12-01
+    """
+    parser = argparse.ArgumentParser(description="Выгрузка заказов с именами курьеров.")
+    parser.add_argument("output", help="Файл выгрузки (.csv, .parquet или .xlsx)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, help="Формат; по умолчанию по расширению файла")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Начало диапазона cur_time (ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat,
+                        help="Конец диапазона cur_time (ISO 8601, не включительно)")
+    args = parser.parse_args(argv)
+
+    export_orders(args.output, args.format, args.start, args.end)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,26 @@
-import time
+import logging
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from src.session import AUTH_COOKIE_NAMES
 
-def login(driver, username, password):
+logger = logging.getLogger(__name__)
+
+
+def has_auth_cookie(driver):
+    """
+    Проверяет, появился ли в браузере cookie авторизации (auth_token или spid).
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для взаимодействия с браузером.
+
+    Returns:
+        bool: `True`, если cookie авторизации есть.
+    """
+    return any(driver.get_cookie(name) for name in AUTH_COOKIE_NAMES)
+
+
+def login(driver, username, password, timeout=10):
     """
     Осуществляет авторизацию на веб-странице, заполняя поля для ввода логина и пароля,
     и нажимает кнопку логина.
@@ -12,15 +29,13 @@ def login(driver, username, password):
         driver (selenium.webdriver.Chrome): Объект WebDriver для взаимодействия с браузером.
         username (str): Имя пользователя для входа.
         password (str): Пароль для входа.
+        timeout (int): Время ожидания элементов формы и cookie авторизации, сек.
 
     Waits:
-        WebDriverWait: Ожидание появления полей ввода логина и пароля, а также кнопки для отправки формы.
-        time.sleep: Пауза после выполнения логина для ожидания появления токена в куках.
-
-    Prints:
-        str: Сообщение о успешной авторизации.
+        WebDriverWait: Ожидание появления полей ввода логина и пароля, кнопки для отправки формы
+        и cookie авторизации после входа.
     """
-    wait = WebDriverWait(driver, 10)
+    wait = WebDriverWait(driver, timeout)
 
     # Ожидание полей для логина
     login_field = wait.until(EC.presence_of_element_located((By.NAME, "login")))
@@ -35,5 +50,5 @@ def login(driver, username, password):
     login_button.click()
 
     # Ждем, пока токен не появится в куках
-    time.sleep(2)
-    print("Авторизация выполнена.")
+    wait.until(has_auth_cookie)
+    logger.info("Авторизация выполнена.")
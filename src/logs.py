@@ -0,0 +1,82 @@
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Уровни по умолчанию для шумных библиотек: отладочные сообщения WebDriver и urllib3
+# (каждый запрос к браузеру) отбрасываются ещё до форматирования
+DEFAULT_LEVELS = {
+    "selenium": "WARNING",
+    "urllib3": "WARNING",
+    "WDM": "WARNING",
+}
+
+
+def parse_levels(value):
+    """
+    Разбирает уровни логирования по модулям из строки вида "src.pipeline=DEBUG,selenium=ERROR".
+
+    Args:
+        value (str): Пары логгер=уровень через запятую.
+
+    Returns:
+        dict: {имя логгера: уровень}.
+
+    Raises:
+        ValueError: Если пара записана без "=".
+    """
+    levels = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if "=" not in item:
+            raise ValueError(f"Некорректный уровень логирования: {item!r}, ожидается логгер=УРОВЕНЬ")
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(level=None, levels=None, log_file=None):
+    """
+    Настраивает неблокирующее логирование: обработчики корневого логгера только кладут
+    записи в очередь, а вывод в консоль и запись в файл выполняет фоновый поток `QueueListener`.
+
+    Параметры по умолчанию берутся из переменных окружения:
+    LOG_LEVEL (уровень корневого логгера, INFO), LOG_LEVELS (уровни по модулям,
+    например "src.pipeline=DEBUG,selenium=ERROR") и LOG_FILE (файл лога, app.log; пусто — без файла).
+
+    Args:
+        level (str, optional): Уровень корневого логгера.
+        levels (dict, optional): Уровни отдельных логгеров; дополняют `DEFAULT_LEVELS`.
+        log_file (str, optional): Файл лога.
+
+    Returns:
+        QueueListener: Запущенный поток вывода; при завершении вызовите `stop()`,
+        чтобы записать оставшиеся сообщения.
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    levels = {**DEFAULT_LEVELS, **(levels if levels is not None else parse_levels(os.getenv("LOG_LEVELS")))}
+    log_file = log_file if log_file is not None else os.getenv("LOG_FILE", "app.log")
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level.upper())
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
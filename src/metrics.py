@@ -0,0 +1,241 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм длительности по умолчанию, сек.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Все метрики процесса в порядке объявления; выводятся `render()`
+REGISTRY = []
+
+
+def _escape(value):
+    """Экранирует значение метки для текстового формата Prometheus."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Основа метрики с необязательными метками: значения для каждого набора меток
+    хранятся в отдельном дочернем объекте, который возвращает `labels()`.
+
+    Args:
+        name (str): Имя метрики.
+        documentation (str): Описание для строки `# HELP`.
+        labelnames (tuple): Имена меток.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            # Метрика без меток выводится сразу, в том числе с нулевым значением
+            self.labels()
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        """Возвращает метрику для набора значений меток (в порядке `labelnames`)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {values}")
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _child(self):
+        """Дочерний объект метрики без меток."""
+        if self.labelnames:
+            raise ValueError(f"Метрика {self.name} требует метки {self.labelnames}")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, child):
+        """Строки (суффикс имени, дополнительные метки, значение) одного дочернего объекта."""
+        raise NotImplementedError
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            labels = list(zip(self.labelnames, values))
+            for suffix, extra, value in self._samples(child):
+                lines.append(f"{self.name}{suffix}{_format_labels(labels + extra)} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Увеличивает счётчик на `amount`."""
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик событий."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """Увеличивает счётчик без меток на `amount`."""
+        self._child().inc(amount)
+
+    @property
+    def value(self):
+        return self._child().value
+
+    def _samples(self, child):
+        return [("", [], child.value)]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Учитывает одно значение."""
+        with self._lock:
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[index] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Учитывает длительность блока `with`, в том числе завершившегося исключением."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма значений (обычно длительностей) с фиксированными корзинами.
+
+    Args:
+        buckets (tuple): Верхние границы корзин по возрастанию; корзина +Inf добавляется автоматически.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        """Учитывает одно значение гистограммы без меток."""
+        self._child().observe(value)
+
+    def time(self):
+        """Учитывает длительность блока `with` в гистограмме без меток."""
+        return self._child().time()
+
+    def _samples(self, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            samples.append(("_bucket", [("le", _format_value(float(bound)))], cumulative))
+        samples.append(("_sum", [], total))
+        samples.append(("_count", [], count))
+        return samples
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение, которое вычисляется функцией в момент выдачи метрик.
+
+    Args:
+        function (callable): Возвращает словарь {кортеж значений меток: значение}.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _new_child(self):
+        return None
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.function() if self.function else {}
+        except Exception:
+            values = {}
+        for label_values, value in sorted(values.items()):
+            labels = list(zip(self.labelnames, label_values))
+            lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def render():
+    """
+    Возвращает все метрики процесса в текстовом формате Prometheus (версия 0.0.4).
+
+    Returns:
+        str: Текст для ответа на GET /metrics.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Длительность этапов конвейера: scrape, api_fetch, login, cookie_refresh, db_write, queue_wait
+STAGE_SECONDS = Histogram("pars_stage_duration_seconds", "Длительность этапов конвейера сбора данных.", ["stage"])
+DOM_WAIT_SECONDS = Histogram("pars_dom_wait_seconds", "Ожидание появления карточек заказов на странице.")
+PARSE_SECONDS = Histogram("pars_parse_duration_seconds", "Разбор карточек заказов одного опроса.", ["source"])
+DB_TRANSACTION_SECONDS = Histogram("pars_db_transaction_seconds", "Транзакция записи пакета наблюдений в базу.")
+
+STALE_ELEMENTS = Counter("pars_stale_elements_total", "Устаревшие элементы карточек (StaleElementReferenceException).")
+DROPPED_CARDS = Counter("pars_dropped_cards_total", "Карточки, из которых не удалось извлечь данные.", ["reason"])
+CARD_STATUSES = Counter("pars_card_statuses_total", "Разобранные карточки заказов по статусу курьера.", ["status"])
+ORDERS_WRITTEN = Counter("pars_orders_written_total", "Записанные заказы: новые и обновлённые.", ["kind"])
+OBSERVATIONS = Counter("pars_observations_total", "Сохранённые наблюдения курьеров.")
+DB_STATEMENTS = Counter("pars_db_statements_total", "SQL-запросы, отправленные в базу.")
+WORKER_RESTARTS = Counter("pars_worker_restarts_total", "Перезапуски конвейеров складов после сбоя.", ["warehouse"])
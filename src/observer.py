@@ -0,0 +1,95 @@
+from src.parser import ORDER_CARD_CLASS, STATUS_CLASS
+
+# Скрипт устанавливает MutationObserver, который складывает изменившиеся карточки заказов в буфер страницы
+INSTALL_OBSERVER_JS = """
+var cardClass = arguments[0];
+if (window.__parsObserver) {
+    return false;
+}
+window.__parsChanged = new Set();
+
+function findCard(node) {
+    while (node && node !== document.body) {
+        if (node.nodeType === 1 && node.classList.contains(cardClass)) {
+            return node;
+        }
+        node = node.parentNode;
+    }
+    return null;
+}
+
+window.__parsObserver = new MutationObserver(function (mutations) {
+    for (var i = 0; i < mutations.length; i++) {
+        var card = findCard(mutations[i].target);
+        if (card) {
+            window.__parsChanged.add(card);
+            continue;
+        }
+        var added = mutations[i].addedNodes;
+        for (var j = 0; j < added.length; j++) {
+            var node = added[j];
+            if (node.nodeType !== 1) {
+                continue;
+            }
+            if (node.classList.contains(cardClass)) {
+                window.__parsChanged.add(node);
+            } else {
+                var cards = node.getElementsByClassName(cardClass);
+                for (var k = 0; k < cards.length; k++) {
+                    window.__parsChanged.add(cards[k]);
+                }
+            }
+        }
+    }
+});
+window.__parsObserver.observe(document.body, {childList: true, subtree: true, characterData: true});
+return true;
+"""
+
+# Скрипт забирает тексты изменившихся карточек и очищает буфер; null — наблюдатель не установлен
+DRAIN_CHANGES_JS = """
+var statusClass = arguments[0];
+if (!window.__parsObserver) {
+    return null;
+}
+var result = [];
+window.__parsChanged.forEach(function (card) {
+    if (!document.body.contains(card)) {
+        return;
+    }
+    var status = card.getElementsByClassName(statusClass)[0];
+    if (status) {
+        result.push(status.innerText);
+    }
+});
+window.__parsChanged.clear();
+return result;
+"""
+
+
+def install_observer(driver):
+    """
+    Устанавливает на странице дашборда MutationObserver, который отслеживает изменения карточек заказов.
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для работы с браузером.
+
+    Returns:
+        bool: `True`, если наблюдатель установлен, `False`, если он уже был установлен.
+    """
+    return driver.execute_script(INSTALL_OBSERVER_JS, ORDER_CARD_CLASS)
+
+
+def drain_changes(driver):
+    """
+    Забирает из буфера страницы тексты карточек, изменившихся с прошлого вызова.
+    Каждая карточка попадает в результат один раз, с текстом на момент вызова.
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для работы с браузером.
+
+    Returns:
+        list | None: Тексты блоков статуса изменившихся карточек или `None`,
+        если наблюдатель не установлен (например, страница была перезагружена).
+    """
+    return driver.execute_script(DRAIN_CHANGES_JS, STATUS_CLASS)
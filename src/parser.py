@@ -1,62 +1,262 @@
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import StaleElementReferenceException, NoSuchElementException
+import logging
 import re
-from src.db import save_courier_data
+from typing import NamedTuple, Optional
+from src.metrics import CARD_STATUSES, DROPPED_CARDS, PARSE_SECONDS, STALE_ELEMENTS
+from src.storage import get_storage
 
-def extract_order_data(order):
+logger = logging.getLogger(__name__)
+
+# Классы элементов на странице дашборда
+ORDER_CARD_CLASS = "sc-hHvkSs"  # Карточка заказа
+STATUS_CLASS = "sc-bCnriq"  # Блок со статусом и именем курьера
+
+TIME_PATTERN = re.compile(r"Пора выходить (\d+) мин")
+
+# Таблица статусов курьера: (статус, регулярное выражение). Группа в выражении — время в минутах,
+# оно записывается в time_taken. Статусы проверяются одним объединённым выражением `STATUS_PATTERN`;
+# при совпадении нескольких выбирается то, что встречается в тексте раньше
+STATUS_TABLE = (
+    ("waiting", TIME_PATTERN.pattern),
+    ("on_the_way", r"В пути"),
+    ("delivering", r"Доставляет"),
+    ("returning", r"Возвращается"),
+    ("assembling", r"Собирает заказ"),
+    ("ready", r"Заказ собран"),
+    ("free", r"Свободен|На складе"),
+)
+# Статус карточки, текст которой не совпал ни с одной строкой `STATUS_TABLE`
+STATUS_UNKNOWN = "unknown"
+
+STATUS_PATTERN = re.compile("|".join(f"(?P<{status}>{pattern})" for status, pattern in STATUS_TABLE))
+# Номер группы с минутами для статусов, в выражении которых она есть
+MINUTES_GROUPS = {
+    status: STATUS_PATTERN.groupindex[status] + 1
+    for status, pattern in STATUS_TABLE
+    if re.compile(pattern).groups
+}
+# Строк статуса немного (статус и минуты), поэтому результат разбора строки запоминается;
+# кэш очищается, если различных строк становится больше `STATUS_CACHE_SIZE`
+STATUS_CACHE_SIZE = 4096
+_status_cache = {}
+
+# Скрипт собирает тексты всех карточек заказов за один вызов WebDriver
+EXTRACT_CARDS_JS = """
+var cardClass = arguments[0];
+var statusClass = arguments[1];
+var cards = document.getElementsByClassName(cardClass);
+var result = [];
+for (var i = 0; i < cards.length; i++) {
+    var status = cards[i].getElementsByClassName(statusClass)[0];
+    if (status) {
+        result.push(status.innerText);
+    }
+}
+return result;
+"""
+
+
+class OrderSnapshot(NamedTuple):
     """
-    Извлекает данные о заказе (статус, имя курьера, время) из элемента веб-страницы и сохраняет эти данные в базу.
+    Состояние курьера по одной карточке заказа.
 
-    Функция находит элемент с заказом, извлекает статус, имя курьера и время, если оно указано.
-    Если время требует выхода ("Пора выходить"), то извлекается значение времени.
-    Все данные сохраняются в базу данных через функцию `save_courier_data`.
+    Первые два поля совпадают с парой (courier_name, time_taken), поэтому снимки
+    передаются в `save_courier_batch` без преобразования.
+
+    Attributes:
+        courier_name (str): Имя курьера.
+        time_taken (int | None): Время из статуса "Пора выходить N мин" или `None`.
+        status (str): Статус из `STATUS_TABLE` или `STATUS_UNKNOWN`.
+    """
+    courier_name: str
+    time_taken: Optional[int]
+    status: str = STATUS_UNKNOWN
+
+
+def classify_status(text):
+    """
+    Определяет статус курьера по тексту одним поиском объединённого выражения `STATUS_PATTERN`.
 
     Args:
-        order (selenium.webdriver.remote.webelement.WebElement): Элемент на веб-странице, представляющий заказ, из которого нужно извлечь данные.
+        text (str): Текст статуса (или всего блока статуса карточки).
 
     Returns:
-        None: Функция не возвращает значение, но сохраняет информацию о заказе в базе данных.
+        tuple: Статус и время в минутах (или `None`, если в статусе его нет).
+    """
+    match = STATUS_PATTERN.search(text) if text else None
+    if match is None:
+        return STATUS_UNKNOWN, None
+    status = match.lastgroup
+    group = MINUTES_GROUPS.get(status)
+    return status, (int(match.group(group)) if group else None)
 
-    Exceptions:
-        StaleElementReferenceException: Если элемент устарел (например, страница перезагрузилась), будет возвращено `None`.
-        NoSuchElementException: Если не удается найти нужный элемент, возвращается `None`.
-        Exception: При любых других ошибках возвращается `None`.
 
-    Prints:
-        str: Информация о заказе (имя курьера и время) выводится в консоль.
+def _classify_line(status_line):
+    """
+    Разбирает строку статуса карточки с запоминанием результата.
+
+    Returns:
+        tuple: (time_taken, status) — хвост снимка `OrderSnapshot`.
+    """
+    parsed = _status_cache.get(status_line)
+    if parsed is None:
+        if len(_status_cache) >= STATUS_CACHE_SIZE:
+            _status_cache.clear()
+        status, time_taken = classify_status(status_line)
+        parsed = _status_cache[status_line] = (time_taken, status)
+    return parsed
+
 
+def parse_card_text(text):
     """
-    try:
-        # Проверка наличия элемента с нужным классом (для статуса)
-        status_element = order.find_element(By.CLASS_NAME, "sc-bCnriq")
-        status = status_element.text
+    Извлекает имя курьера, время и статус из текста блока статуса карточки заказа.
+
+    Первая строка текста — статус, вторая — имя курьера. Статус определяется по таблице
+    `STATUS_TABLE`; время извлекается из статуса "Пора выходить N мин", иначе равно `None`.
+    Результат разбора строки статуса запоминается.
+
+    Args:
+        text (str): Текст блока статуса (`sc-bCnriq`).
+
+    Returns:
+        OrderSnapshot | None: Снимок или `None`, если в тексте нет имени.
+    """
+    lines = text.split("\n", 2) if text else ()
+    name = lines[1].strip() if len(lines) >= 2 else ""
+    if not name:
+        DROPPED_CARDS.labels("no_name").inc()
+        return None
+    time_taken, status = _classify_line(lines[0])
+    CARD_STATUSES.labels(status).inc()
+    return OrderSnapshot(name, time_taken, status)
+
+
+def parse_card_texts(texts):
+    """
+    Разбирает тексты всех карточек заказов одного опроса в снимки `OrderSnapshot`.
+
+    Строка статуса разбирается объединённым выражением один раз и затем берётся из кэша,
+    снимки создаются без проверки аргументов конструктора `NamedTuple`, а счётчики метрик
+    увеличиваются один раз на пакет, а не на каждую карточку.
+
+    Args:
+        texts (list): Тексты блоков статуса.
+
+    Returns:
+        list: Снимки (courier_name, time_taken, status) для передачи в `save_courier_batch`.
+    """
+    cached = _status_cache.get
+    make = tuple.__new__
+    snapshots = []
+    statuses = {}
+    dropped = 0
+    with PARSE_SECONDS.labels("texts").time():
+        for text in texts:
+            lines = text.split("\n", 2) if text else ()
+            name = lines[1].strip() if len(lines) >= 2 else ""
+            if not name:
+                dropped += 1
+                continue
+            parsed = cached(lines[0]) or _classify_line(lines[0])
+            status = parsed[1]
+            statuses[status] = statuses.get(status, 0) + 1
+            snapshots.append(make(OrderSnapshot, (name, *parsed)))
+
+    if dropped:
+        DROPPED_CARDS.labels("no_name").inc(dropped)
+    for status, count in statuses.items():
+        CARD_STATUSES.labels(status).inc(count)
+    return snapshots
 
-        # Извлекаем имя
-        name_element = order.find_element(By.CLASS_NAME, "sc-bCnriq")
-        name = name_element.text.split('\n')[1]  # Имя обычно идет после времени
 
-        time_taken = None
-        if "Пора выходить" in status:
-            # Ищем время в строке после слов "Пора выходить"
-            time_match = re.search(r"Пора выходить (\d+) мин", status)
-            if time_match:
-                time_taken = int(time_match.group(1))  # Извлекаем и конвертируем в целое число
+def fetch_order_texts(driver):
+    """
+    Собирает тексты блоков статуса всех карточек заказов одним вызовом `execute_script`,
+    вместо отдельного запроса к WebDriver на каждый элемент.
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для работы с браузером.
 
+    Returns:
+        list: Тексты блоков статуса всех карточек на странице.
+    """
+    return driver.execute_script(EXTRACT_CARDS_JS, ORDER_CARD_CLASS, STATUS_CLASS) or []
 
-        if name:
-            save_courier_data(name, time_taken)
 
-        # Печатаем данные
-        print(f"Имя: {name}")
-        print(f"Статус: {time_taken}")
-        print("_"*40)
+def parse_order(order):
+    """
+    Извлекает имя курьера и время из элемента заказа, не сохраняя их в базу.
 
+    Args:
+        order (selenium.webdriver.remote.webelement.WebElement): Элемент на веб-странице, представляющий заказ.
+
+    Returns:
+        OrderSnapshot | None: Снимок или `None`, если элемент устарел, не найден или не содержит имени.
+    """
+    try:
+        # Проверка наличия элемента с нужным классом (для статуса)
+        status_element = order.find_element(By.CLASS_NAME, STATUS_CLASS)
+        text = status_element.text
 
     except StaleElementReferenceException:
+        STALE_ELEMENTS.inc()
         return None  # Элемент устарел, необходимо повторно его найти
 
     except NoSuchElementException:
+        DROPPED_CARDS.labels("no_status").inc()
         return None  # Элемент не найден
 
-    except Exception as e:
+    except Exception:
+        DROPPED_CARDS.labels("error").inc()
         return None  # При любой ошибке возвращаем None
+
+    return parse_card_text(text)
+
+
+def extract_order_data(order):
+    """
+    Извлекает данные о заказе (статус, имя курьера, время) из элемента веб-страницы и сохраняет эти данные в базу.
+
+    Функция находит элемент с заказом, извлекает статус, имя курьера и время, если оно указано.
+    Если время требует выхода ("Пора выходить"), то извлекается значение времени.
+    Снимок `OrderSnapshot` со статусом сохраняется через хранилище процесса (`get_storage().save_observations`).
+
+    Args:
+        order (selenium.webdriver.remote.webelement.WebElement): Элемент на веб-странице, представляющий заказ,
+            из которого нужно извлечь данные.
+
+    Returns:
+        None: Функция не возвращает значение, но сохраняет информацию о заказе в базе данных.
+
+    Exceptions:
+        StaleElementReferenceException: Если элемент устарел (например, страница перезагрузилась),
+            будет возвращено `None`.
+        NoSuchElementException: Если не удается найти нужный элемент, возвращается `None`.
+        Exception: При любых других ошибках возвращается `None`.
+    """
+    parsed = parse_order(order)
+    if parsed is None:
+        return None
+
+    try:
+        get_storage().save_observations([parsed])
+    except Exception as e:
+        logger.error("Ошибка при сохранении заказа курьера %s: %s", parsed.courier_name, e)
+        return None
+
+    logger.debug("Курьер %s: время %s, статус %s", *parsed)
+
+
+def extract_orders(orders):
+    """
+    Извлекает имя курьера и время из всех элементов заказов одного цикла опроса.
+
+    Args:
+        orders (list): Элементы заказов (`sc-hHvkSs`) на веб-странице.
+
+    Returns:
+        list: Снимки `OrderSnapshot` для передачи в `save_courier_batch`.
+    """
+    with PARSE_SECONDS.labels("elements").time():
+        return [parsed for parsed in map(parse_order, orders) if parsed is not None]
@@ -0,0 +1,385 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium.webdriver.common.by import By
+
+from src.api import fetch_warehouse_summary, map_summary
+from src.config import DEFAULT_WAREHOUSE
+from src.metrics import DOM_WAIT_SECONDS, STAGE_SECONDS
+from src.observer import drain_changes, install_observer
+from src.parser import ORDER_CARD_CLASS, extract_orders, fetch_order_texts, parse_card_texts
+from src.snapshot import board
+from src.storage import get_storage
+from src.utils import wait_for_elements
+
+logger = logging.getLogger(__name__)
+
+
+# Сбор данных о заказах со страницы
+def scrape_observations(driver, mode="script", recorder=None, warehouse=None, resync=False):
+    """
+    Собирает пары (имя курьера, время) со страницы дашборда.
+
+    В режиме "observer" возвращаются только изменившиеся карточки. Если наблюдатель
+    не установлен (первый вызов или страница перезагружена), он устанавливается
+    и выполняется полный проход по всем карточкам. Полный проход выполняется и при `resync`:
+    буфер наблюдателя очищается, а состояние берётся со всей страницы, поэтому изменения,
+    пропущенные наблюдателем (например, удалённые и заново отрисованные карточки), не накапливаются.
+
+    Args:
+        driver (selenium.webdriver.Chrome): Объект WebDriver для работы с браузером.
+        mode (str): Режим извлечения: "script", "elements" или "observer".
+        recorder (Recorder, optional): Запись сырых текстов карточек для воспроизведения.
+        warehouse (str, optional): Склад, под которым тексты карточек попадают в запись.
+        resync (bool): В режиме "observer" — прочитать все карточки вместо буфера изменений.
+
+    Returns:
+        list: Пары (name, time_taken).
+    """
+    if mode == "observer":
+        texts = drain_changes(driver)
+        changes_only = texts is not None and not resync
+        if not changes_only:
+            if texts is None:
+                with DOM_WAIT_SECONDS.time():
+                    wait_for_elements(driver, By.CLASS_NAME, ORDER_CARD_CLASS)
+                install_observer(driver)
+            texts = fetch_order_texts(driver)
+        if recorder is not None:
+            recorder.record_cards(texts, changes_only=changes_only, warehouse=warehouse)
+        return parse_card_texts(texts)
+
+    # Ожидание появления новых заказов на веб-странице
+    with DOM_WAIT_SECONDS.time():
+        orders = wait_for_elements(driver, By.CLASS_NAME, ORDER_CARD_CLASS)
+    # При записи тексты карточек читаются одним вызовом и в режиме "elements", чтобы их можно было сохранить
+    if mode == "elements" and recorder is None:
+        return extract_orders(orders)
+    texts = fetch_order_texts(driver)
+    if recorder is not None:
+        recorder.record_cards(texts, warehouse=warehouse)
+    return parse_card_texts(texts)
+
+
+class StageStats:
+    """
+    Потокобезопасная статистика длительности этапов конвейера: количество вызовов,
+    суммарное и максимальное время для каждого этапа. Длительности также попадают
+    в гистограмму `STAGE_SECONDS` для выдачи на GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stage, seconds):
+        """Учитывает одно выполнение этапа `stage` длительностью `seconds`."""
+        STAGE_SECONDS.labels(stage).observe(seconds)
+        with self._lock:
+            count, total, maximum = self._stages.get(stage, (0, 0.0, 0.0))
+            self._stages[stage] = (count + 1, total + seconds, max(maximum, seconds))
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {этап: {"count", "total", "avg", "max"}}.
+        """
+        with self._lock:
+            return {
+                stage: {"count": count, "total": total, "avg": total / count if count else 0.0, "max": maximum}
+                for stage, (count, total, maximum) in self._stages.items()
+            }
+
+
+async def write_batches(queue, stats, executor, spool=None):
+    """
+    Этап записи в базу: забирает из очереди все накопившиеся пакеты (warehouse, observations)
+    и сохраняет их по складам. Один такой этап может обслуживать конвейеры нескольких складов.
+
+    Если задана локальная очередь `spool`, пакеты дописываются туда по порядку без объединения
+    (в базу их применяет `SpoolFlusher`). Иначе наблюдения каждого склада объединяются по курьеру
+    (остаётся последнее) и сохраняются одной транзакцией, после чего обновляется снимок доски.
+
+    Args:
+        queue (asyncio.Queue): Очередь пакетов (warehouse, observations).
+        stats (StageStats): Статистика этапов.
+        executor (concurrent.futures.Executor): Пул потоков для вызовов psycopg2 и записи на диск.
+        spool (Spool, optional): Локальная очередь, через которую наблюдения попадают в базу.
+    """
+    loop = asyncio.get_running_loop()
+
+    async def timed(stage, func, *args):
+        started = time.monotonic()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            stats.observe(stage, time.monotonic() - started)
+
+    while True:
+        items = [await queue.get()]
+        while not queue.empty():
+            items.append(queue.get_nowait())
+
+        by_warehouse = {}
+        for warehouse, observations in items:
+            by_warehouse.setdefault(warehouse, []).append(observations)
+
+        for warehouse, batches in by_warehouse.items():
+            if spool is not None:
+                # Пакеты дописываются по порядку без объединения, чтобы сохранить последовательность значений
+                try:
+                    await timed("spool_append", functools.partial(spool.append, batches, warehouse=warehouse))
+                except Exception as e:
+                    logger.error("Ошибка при записи в локальную очередь (склад %s): %s", warehouse, e)
+                continue
+
+            latest = {}
+            for observations in batches:
+                for observation in observations:
+                    latest[observation[0]] = observation
+            try:
+                observations = list(latest.values())
+                result = await timed("db_write", get_storage().save_observations, observations, warehouse)
+                board.update(observations, result["changes"], warehouse)
+            except Exception as e:
+                logger.error("Ошибка при сохранении данных (склад %s): %s", warehouse, e)
+
+        for _ in items:
+            queue.task_done()
+
+
+class Pipeline:
+    """
+    Конвейер сбора данных из независимых этапов, связанных ограниченной очередью:
+
+    - scraper — читает страницу дашборда (только в режиме "dom");
+    - api_poller — запрашивает сводку по складу и при необходимости повторяет вход;
+    - db_writer — `write_batches`: сохраняет накопившиеся наблюдения в базу или локальную очередь;
+      если очередь `queue` передана извне, запись выполняет её владелец (супервизор складов);
+    - housekeeping — обновление куков и вывод статистики.
+
+    Блокирующие вызовы Selenium выполняются в пуле потоков браузера, вызовы psycopg2
+    и requests — в пуле ввода-вывода; пулы можно разделить между конвейерами нескольких
+    складов. WebDriver не потокобезопасен, поэтому вызовы браузера одного конвейера
+    выполняются по одному. Если запись в базу отстаёт, очередь заполняется и производители
+    ждут (backpressure).
+
+    Если чтение страницы или запрос к API завершаются ошибкой `max_failures` раз подряд,
+    `run()` завершается исключением, чтобы супервизор перезапустил конвейер с новым браузером.
+
+    Args:
+        browser (BrowserSession): Браузер с ленивым запуском.
+        session (requests.Session): Сессия для запросов к API.
+        headers (dict): Заголовки для авторизации в API.
+        cookies (dict): Куки для авторизации в API.
+        ingest_mode (str): Источник данных: "dom" или "api".
+        extract_mode (str): Режим извлечения данных со страницы.
+        recorder (Recorder, optional): Запись сырых данных опросов (тексты карточек и сводки API).
+        spool (Spool, optional): Локальная очередь, через которую наблюдения попадают в базу.
+        warehouse (str): Склад, к которому относятся наблюдения.
+        api_url (str, optional): Адрес сводки по складу. По умолчанию из COOKER.
+        queue (asyncio.Queue, optional): Общая очередь записи; по умолчанию конвейер создаёт свою.
+        browser_executor (Executor, optional): Общий пул потоков браузера.
+        io_executor (Executor, optional): Общий пул потоков ввода-вывода.
+        max_failures (int): Количество ошибок подряд, после которого конвейер завершается; 0 — без ограничения.
+        release_browser (bool): Закрывать браузер после входа (в режиме "api" он нужен только для авторизации).
+        browser_slots (asyncio.Semaphore, optional): Общие слоты браузеров; при `release_browser`
+            повторный вход выполняется только со свободным слотом.
+    """
+
+    def __init__(self, browser, session, headers, cookies, ingest_mode="dom", extract_mode="script", recorder=None,
+                 spool=None, warehouse=DEFAULT_WAREHOUSE, api_url=None, queue=None, browser_executor=None,
+                 io_executor=None, max_failures=0, release_browser=False, browser_slots=None):
+        self.browser = browser
+        self.session = session
+        self.headers = headers
+        self.cookies = cookies
+        self.ingest_mode = ingest_mode
+        self.extract_mode = extract_mode
+        self.recorder = recorder
+        self.spool = spool
+        self.warehouse = warehouse
+        self.api_url = api_url
+        self.max_failures = max_failures
+        self.release_browser = release_browser
+        self.browser_slots = browser_slots
+
+        self.poll_interval = float(os.getenv("POLL_INTERVAL", "15"))
+        self.observer_interval = float(os.getenv("OBSERVER_INTERVAL", "0.5"))
+        self.observer_resync_interval = float(os.getenv("OBSERVER_RESYNC_INTERVAL", "60"))
+        self.cookie_refresh_interval = float(os.getenv("COOKIE_REFRESH_INTERVAL", "60"))
+        self.stats_interval = float(os.getenv("STATS_INTERVAL", "60"))
+        self.queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+
+        self.stats = StageStats()
+        self._queue = queue
+        self._owns_queue = queue is None
+        self._owned_executors = []
+        if browser_executor is None:
+            browser_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="browser")
+            self._owned_executors.append(browser_executor)
+        if io_executor is None:
+            io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="io")
+            self._owned_executors.append(io_executor)
+        self._browser_executor = browser_executor
+        self._io_executor = io_executor
+        self._browser_lock = None
+        self._failures = 0
+        self._last_resync = time.monotonic()
+
+    async def _timed(self, stage, executor, func, *args):
+        """Выполняет блокирующую функцию в пуле потоков и учитывает её длительность."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self.stats.observe(stage, time.monotonic() - started)
+
+    async def _browser_call(self, stage, func, *args):
+        """Выполняет вызов браузера в пуле потоков браузера, не более одного одновременно на конвейер."""
+        async with self._browser_lock:
+            return await self._timed(stage, self._browser_executor, func, *args)
+
+    def _failed(self, message, error, source=True):
+        """
+        Учитывает ошибку этапа; после `max_failures` ошибок подряд завершает конвейер.
+        Считаются только ошибки этапа-источника наблюдений (`source`).
+        """
+        logger.error("%s (склад %s): %s", message, self.warehouse, error)
+        if not source:
+            return
+        self._failures += 1
+        if self.max_failures and self._failures >= self.max_failures:
+            raise RuntimeError(f"Склад {self.warehouse}: {self._failures} ошибок подряд, конвейер будет перезапущен")
+
+    async def _enqueue(self, observations):
+        """Кладёт наблюдения склада в очередь; ждёт, если очередь заполнена."""
+        if not observations:
+            return
+        started = time.monotonic()
+        await self._queue.put((self.warehouse, observations))
+        self.stats.observe("queue_wait", time.monotonic() - started)
+
+    def _scrape(self):
+        """
+        Читает страницу в потоке браузера (там же при необходимости запускается браузер).
+        В режиме "observer" раз в `observer_resync_interval` секунд читаются все карточки.
+        """
+        now = time.monotonic()
+        resync = (self.extract_mode == "observer" and self.observer_resync_interval > 0
+                  and now - self._last_resync >= self.observer_resync_interval)
+        observations = scrape_observations(self.browser.driver, self.extract_mode, self.recorder, self.warehouse,
+                                           resync)
+        if resync:
+            self._last_resync = now
+        return observations
+
+    def _login(self):
+        """Выполняет вход в потоке браузера; при `release_browser` затем закрывает браузер."""
+        try:
+            return self.browser.authenticate()
+        finally:
+            if self.release_browser:
+                self.browser.close()
+
+    async def scraper(self):
+        """Этап чтения страницы дашборда."""
+        interval = self.observer_interval if self.extract_mode == "observer" else self.poll_interval
+        while True:
+            try:
+                observations = await self._browser_call("scrape", self._scrape)
+                self._failures = 0
+                await self._enqueue(observations)
+            except Exception as e:
+                self._failed("Ошибка при чтении страницы", e)
+            await asyncio.sleep(interval)
+
+    async def api_poller(self):
+        """Этап запроса сводки по складу; при ответе 401/403 выполняет повторный вход."""
+        while True:
+            try:
+                status_code, summary = await self._timed(
+                    "api_fetch", self._io_executor, functools.partial(
+                        fetch_warehouse_summary, self.session, self.headers, self.cookies, url=self.api_url)
+                )
+            except Exception as e:
+                self._failed("Ошибка при запросе к API", e, self.ingest_mode == "api")
+                status_code, summary = None, None
+
+            if status_code in (401, 403):
+                logger.warning("Токен API недействителен (склад %s), выполняем вход...", self.warehouse)
+                try:
+                    async with self.browser_slots or contextlib.nullcontext():
+                        self.headers, self.cookies = await self._browser_call("login", self._login)
+                except Exception as e:
+                    self._failed("Ошибка при входе", e, self.ingest_mode == "api")
+            elif summary is not None:
+                if self.ingest_mode == "api":
+                    self._failures = 0
+                if self.recorder is not None:
+                    self.recorder.record_summary(summary, self.warehouse)
+                if self.ingest_mode == "api":
+                    await self._enqueue(map_summary(summary))
+
+            await asyncio.sleep(self.poll_interval)
+
+    async def db_writer(self):
+        """Этап записи в базу собственной очереди конвейера."""
+        await write_batches(self._queue, self.stats, self._io_executor, self.spool)
+
+    async def housekeeping(self):
+        """Обновление куков и периодический вывод статистики этапов."""
+        last_cookie_update = time.monotonic()
+        last_stats = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+
+            if self.browser.started and time.monotonic() - last_cookie_update >= self.cookie_refresh_interval:
+                try:
+                    self.headers, self.cookies = await self._browser_call(
+                        "cookie_refresh", self.browser.headers_and_cookies
+                    )
+                    last_cookie_update = time.monotonic()
+                except Exception as e:
+                    logger.error("Ошибка при обновлении куков (склад %s): %s", self.warehouse, e)
+
+            if time.monotonic() - last_stats >= self.stats_interval:
+                logger.info("Статистика этапов склада %s: %s", self.warehouse, self.stats.snapshot())
+                logger.info("Размер очереди: %s, хранилище: %s", self._queue.qsize(), get_storage().stats())
+                last_stats = time.monotonic()
+
+    async def run(self):
+        """
+        Запускает все этапы конвейера и работает до отмены.
+
+        Raises:
+            RuntimeError: Если этап завершился ошибкой `max_failures` раз подряд.
+        """
+        self._browser_lock = asyncio.Lock()
+        self._failures = 0
+        stages = [self.api_poller(), self.housekeeping()]
+        if self._owns_queue:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            stages.append(self.db_writer())
+        if self.ingest_mode == "dom":
+            stages.append(self.scraper())
+        tasks = [asyncio.ensure_future(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # При ошибке одного этапа остальные останавливаются, чтобы не продолжали работать с браузером
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """Останавливает собственные пулы потоков конвейера (общие пулы останавливает их владелец)."""
+        for executor in self._owned_executors:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Исключение, возникающее, если свободное соединение не удалось получить за отведённое время."""
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений с PostgreSQL.
+
+    Пул держит не менее `minconn` открытых соединений и не более `maxconn` одновременно.
+    Если все соединения заняты, запрашивающий поток ждёт освобождения соединения.
+    Простаивающие соединения перед выдачей проверяются запросом `SELECT 1`.
+
+    Args:
+        connect (callable): Функция, создающая новое соединение (например, `get_connection`).
+        minconn (int): Минимальное количество открытых соединений.
+        maxconn (int): Максимальное количество соединений.
+        health_check_interval (float): Через сколько секунд простоя соединение проверяется перед выдачей.
+        wait_timeout (float): Сколько секунд ждать свободное соединение, прежде чем выбросить `PoolTimeout`.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=5, health_check_interval=30.0, wait_timeout=30.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Некорректный размер пула: minconn={minconn}, maxconn={maxconn}")
+
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # Пары (соединение, время возврата в пул)
+        self._total = 0
+        self._in_use = 0
+        self._closed = False
+
+        self._waits = 0
+        self._wait_time = 0.0
+        self._connects = 0
+        self._connect_time = 0.0
+        self._health_check_failures = 0
+
+        for _ in range(minconn):
+            with self._cond:
+                self._total += 1
+            self._idle.append((self._new_connection(), time.monotonic()))
+
+    def _new_connection(self):
+        """Создаёт физическое соединение и учитывает время подключения в статистике."""
+        started = time.monotonic()
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._connects += 1
+            self._connect_time += elapsed
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        """Проверяет соединение, если оно простаивало дольше `health_check_interval`."""
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        """Закрывает соединение и освобождает место в пуле."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """
+        Выдаёт соединение из пула, при необходимости создавая новое или ожидая освобождения.
+
+        Args:
+            timeout (float, optional): Время ожидания в секундах. По умолчанию `wait_timeout`.
+
+        Returns:
+            psycopg2.connection: Соединение с базой данных.
+
+        Raises:
+            PoolTimeout: Если свободное соединение не появилось за отведённое время.
+        """
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            create = False
+            with self._cond:
+                waited = False
+                wait_started = time.monotonic()
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Пул соединений закрыт.")
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if self._total < self.maxconn:
+                        self._total += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._wait_time += time.monotonic() - wait_started
+                        raise PoolTimeout(f"Нет свободных соединений в пуле за {timeout} с.")
+                    if not waited:
+                        self._waits += 1
+                        waited = True
+                    self._cond.wait(remaining)
+                if waited:
+                    self._wait_time += time.monotonic() - wait_started
+
+            if create:
+                conn = self._new_connection()
+            elif not self._is_healthy(conn, idle_since):
+                with self._cond:
+                    self._health_check_failures += 1
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._in_use += 1
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Возвращает соединение в пул. Незавершённая транзакция откатывается.
+
+        Args:
+            conn (psycopg2.connection): Соединение, ранее полученное через `getconn`.
+            discard (bool): Закрыть соединение вместо возврата в пул.
+        """
+        with self._cond:
+            self._in_use -= 1
+
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Контекстный менеджер: выдаёт соединение и возвращает его в пул по завершении блока.
+        Сломанные соединения (ошибка на уровне соединения) в пул не возвращаются.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            # BaseException: соединение возвращается и при закрытии генератора (GeneratorExit)
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self):
+        """Закрывает все простаивающие соединения; занятые будут закрыты при возврате в пул."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        """
+        Возвращает статистику пула.
+
+        Returns:
+            dict: Количество занятых и свободных соединений, число ожиданий и время подключения.
+        """
+        with self._cond:
+            return {
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "total": self._total,
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "waits": self._waits,
+                "wait_time": self._wait_time,
+                "connects": self._connects,
+                "connect_time": self._connect_time,
+                "avg_connect_time": self._connect_time / self._connects if self._connects else 0.0,
+                "health_check_failures": self._health_check_failures,
+            }
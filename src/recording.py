@@ -0,0 +1,105 @@
+import gzip
+import json
+import threading
+import time
+
+# Виды записей: тексты карточек заказов со страницы и ответ сводки по складу из API
+KIND_CARDS = "cards"
+KIND_SUMMARY = "summary"
+
+
+def _open(path, mode):
+    """Открывает файл записи как текстовый; файлы с расширением .gz сжимаются gzip."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class Recorder:
+    """
+    Запись сырых данных каждого опроса для последующего воспроизведения без браузера и сети.
+
+    Файл только дополняется: каждая строка — JSON с временем получения (`t`, Unix-время),
+    видом записи (`kind`), складом (`w`, если указан) и данными (`data`). В один файл можно писать
+    опросы нескольких складов. При повторном запуске записи добавляются в конец того же файла.
+
+    Args:
+        path (str): Путь к файлу записи (.jsonl или .jsonl.gz).
+        flush_every (int): Через сколько записей сбрасывать буфер на диск.
+    """
+
+    def __init__(self, path, flush_every=20):
+        self.path = path
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._file = _open(path, "a")
+        self._pending = 0
+        self.records = 0
+
+    def _write(self, kind, data, **extra):
+        line = json.dumps({"t": time.time(), "kind": kind, **extra, "data": data}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.records += 1
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def record_cards(self, texts, changes_only=False, warehouse=None):
+        """
+        Записывает тексты блоков статуса карточек заказов одного опроса страницы.
+
+        Args:
+            texts (list): Тексты блоков статуса (`sc-bCnriq`) карточек `sc-hHvkSs`.
+            changes_only (bool): Только изменившиеся карточки (режим "observer").
+            warehouse (str, optional): Склад, страница которого прочитана.
+        """
+        extra = {"w": warehouse} if warehouse is not None else {}
+        if changes_only:
+            extra["changes_only"] = True
+        self._write(KIND_CARDS, list(texts), **extra)
+
+    def record_summary(self, payload, warehouse=None):
+        """
+        Записывает ответ `fetch_warehouse_summary`.
+
+        Args:
+            payload (dict | list): JSON сводки по складу.
+            warehouse (str, optional): Склад, к которому относится сводка.
+        """
+        if warehouse is not None:
+            self._write(KIND_SUMMARY, payload, w=warehouse)
+        else:
+            self._write(KIND_SUMMARY, payload)
+
+    def close(self):
+        """Сбрасывает буфер и закрывает файл."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_recording(path):
+    """
+    Читает записи из файла записи по порядку.
+
+    Args:
+        path (str): Путь к файлу записи (.jsonl или .jsonl.gz).
+
+    Yields:
+        dict: Запись с полями t, kind, data (w — склад, changes_only — для частичных опросов).
+        Повреждённый хвост файла (запись прервалась при остановке процесса) пропускается.
+    """
+    with _open(path, "r") as file:
+        try:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        except EOFError:
+            return
@@ -0,0 +1,201 @@
+import argparse
+import json
+import logging
+import tempfile
+import time
+from datetime import datetime
+
+from src.api import map_summary
+from src.config import DEFAULT_WAREHOUSE, local_tz
+from src.parser import parse_card_texts
+from src.recording import KIND_CARDS, KIND_SUMMARY, read_recording
+from src.spool import Spool, SpoolFlusher
+from src.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Источник наблюдений в записи: тексты карточек со страницы или сводка по складу из API
+SOURCES = {"dom": (KIND_CARDS, parse_card_texts), "api": (KIND_SUMMARY, map_summary)}
+
+
+def _wal_position():
+    """Текущая позиция журнала WAL или `None`, если она недоступна (в том числе для SQLite)."""
+    if get_storage().name != "postgres":
+        return None
+    from src.db import pooled_connection
+
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_current_wal_lsn()::text")
+                return cur.fetchone()[0]
+    except Exception as e:
+        logger.warning("Не удалось получить позицию WAL: %s", e)
+        return None
+
+
+def _wal_bytes_since(position):
+    """Объём журнала WAL, записанного с позиции `position`, байт."""
+    if position is None:
+        return None
+    from src.db import pooled_connection
+
+    try:
+        with pooled_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s::pg_lsn)", (position,))
+                return int(cur.fetchone()[0])
+    except Exception as e:
+        logger.warning("Не удалось получить объём WAL: %s", e)
+        return None
+
+
+def replay(path, speed=None, source="dom", warehouse=None, spool_dir=None):
+    """
+    Воспроизводит запись опросов через тот же разбор и запись в базу, что и основной цикл.
+
+    Наблюдения каждой записи дописываются в локальную очередь `Spool` со временем получения
+    из записи и применяются к хранилищу `SpoolFlusher` через `Storage.apply_observation_log`,
+    как в основном цикле: cur_time заказов и агрегаты совпадают с исходным прогоном,
+    а не со временем воспроизведения.
+
+    Записи подаются с исходными интервалами, делёнными на `speed`; без `speed` — без пауз,
+    с максимальной скоростью. Если запись в базу не успевает за расписанием, следующие
+    записи подаются сразу, а отставание учитывается в отчёте.
+
+    Args:
+        path (str): Файл записи (.jsonl или .jsonl.gz).
+        speed (float, optional): Ускорение относительно реального времени (1, 10, 100...).
+        source (str): "dom" — тексты карточек, "api" — сводки по складу.
+        warehouse (str, optional): Воспроизводить только опросы этого склада. Наблюдения сохраняются
+            под складом из записи (поле `w`); записи без склада относятся к `warehouse`
+            или к складу по умолчанию.
+        spool_dir (str, optional): Каталог очереди. По умолчанию — временный каталог,
+            удаляемый после воспроизведения.
+
+    Returns:
+        dict: Отчёт: количество записей и наблюдений, результаты записи, пропускная способность,
+        строки и байты WAL на одно наблюдение (усиление записи), максимальное отставание.
+    """
+    if spool_dir is None:
+        with tempfile.TemporaryDirectory(prefix="replay-spool-") as directory:
+            return replay(path, speed, source, warehouse, directory)
+
+    kind, parse = SOURCES[source]
+    results = []
+    spool = Spool(spool_dir)
+    flusher = SpoolFlusher(spool, on_applied=lambda entries, result: results.append(result))
+    report = {
+        "records": 0, "observations": 0, "inserted": 0, "updated": 0, "unchanged": 0, "latest_writes": 0,
+        "parse_seconds": 0.0, "save_seconds": 0.0, "max_lag": 0.0,
+    }
+    first_t = last_t = None
+    wal_start = _wal_position()
+    started = time.monotonic()
+
+    try:
+        for record in read_recording(path):
+            if record.get("kind") != kind:
+                continue
+            record_warehouse = record.get("w", warehouse or DEFAULT_WAREHOUSE)
+            if warehouse is not None and record_warehouse != warehouse:
+                continue
+            if first_t is None:
+                first_t = record["t"]
+            last_t = record["t"]
+
+            if speed:
+                due = started + (record["t"] - first_t) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    report["max_lag"] = max(report["max_lag"], -delay)
+
+            parse_started = time.monotonic()
+            observations = parse(record["data"])
+            save_started = time.monotonic()
+            report["parse_seconds"] += save_started - parse_started
+            report["records"] += 1
+            if not observations:
+                continue
+
+            # Время получения из записи: cur_time заказов и агрегаты — как при исходном опросе
+            spool.append([observations], datetime.fromtimestamp(record["t"], local_tz), record_warehouse)
+            flusher.flush_once()
+            report["save_seconds"] += time.monotonic() - save_started
+            report["observations"] += len(observations)
+            for result in results:
+                for key in ("inserted", "updated", "unchanged"):
+                    report[key] += result[key]
+                report["latest_writes"] += len(result["changes"])
+            results.clear()
+    finally:
+        spool.close()
+
+    get_storage().flush()
+    elapsed = time.monotonic() - started
+    wal_bytes = _wal_bytes_since(wal_start)
+
+    observations = report["observations"] or 1
+    rows_written = report["inserted"] + report["updated"] + report["latest_writes"]
+    recorded_span = (last_t - first_t) if first_t is not None else 0.0
+    report.update({
+        "source": source,
+        "warehouse": warehouse,
+        "speed": speed or "max",
+        "elapsed": elapsed,
+        "recorded_span": recorded_span,
+        "achieved_speedup": recorded_span / elapsed if elapsed else None,
+        "observations_per_sec": report["observations"] / elapsed if elapsed else None,
+        "rows_written": rows_written,
+        "rows_per_observation": rows_written / observations,
+        "wal_bytes": wal_bytes,
+        "wal_bytes_per_observation": wal_bytes / observations if wal_bytes is not None else None,
+    })
+    return report
+
+
+def _speed(value):
+    """Разбирает ускорение: число или "max" (без пауз)."""
+    return None if value == "max" else float(value)
+
+
+def main(argv=None):
+    """
+    Командная строка воспроизведения записи в хранилище, заданное переменными окружения (STORAGE_BACKEND):
+
+        python -m src.replay recording.jsonl.gz --speed 100
+        python -m src.replay recording.jsonl.gz --speed max --source api --clear
+    """
+    parser = argparse.ArgumentParser(description="Воспроизведение записи опросов дашборда в базу данных.")
+    parser.add_argument("recording", help="Файл записи (RECORD_FILE)")
+    parser.add_argument("--speed", type=_speed, default=None,
+                        help="Ускорение относительно реального времени (1, 10, 100) или max; по умолчанию max")
+    parser.add_argument("--source", choices=SOURCES, default="dom", help="Воспроизводимые данные")
+    parser.add_argument("--warehouse", help="Воспроизводить только этот склад (по умолчанию все склады записи)")
+    parser.add_argument("--spool", help="Каталог локальной очереди (по умолчанию временный)")
+    parser.add_argument("--clear", action="store_true", help="Очистить таблицы перед воспроизведением")
+    parser.add_argument("--output", help="Файл JSON для отчёта")
+    args = parser.parse_args(argv)
+
+    storage = get_storage()
+    storage.init()
+    if args.clear:
+        storage.clear()
+    report = replay(args.recording, args.speed, args.source, args.warehouse, args.spool)
+
+    print(f"Воспроизведено записей: {report['records']}, наблюдений: {report['observations']} "
+          f"за {report['elapsed']:.1f} с ({report['observations_per_sec'] or 0:.1f} наблюдений/с, "
+          f"ускорение x{report['achieved_speedup'] or 0:.1f}).")
+    print(f"Новых заказов: {report['inserted']}, обновлено: {report['updated']}, "
+          f"без изменений: {report['unchanged']}; строк на наблюдение: {report['rows_per_observation']:.3f}, "
+          f"байт WAL на наблюдение: {report['wal_bytes_per_observation']}.")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
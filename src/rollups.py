@@ -0,0 +1,139 @@
+import threading
+import time
+from datetime import datetime
+
+# Длительность интервалов агрегации, сек.
+GRANULARITIES = {"5m": 300, "1h": 3600}
+
+# Гистограмма time_taken: корзины по одной минуте от 0 до 59 и последняя — 60 минут и больше
+HISTOGRAM_SIZE = 61
+
+
+def bucket_start(moment, granularity):
+    """
+    Возвращает начало интервала агрегации, в который попадает момент времени.
+
+    Args:
+        moment (datetime): Момент времени с часовым поясом.
+        granularity (str): Ключ из `GRANULARITIES`.
+
+    Returns:
+        datetime: Начало интервала в том же часовом поясе.
+    """
+    seconds = GRANULARITIES[granularity]
+    timestamp = moment.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % seconds, moment.tzinfo)
+
+
+def histogram_index(value):
+    """Номер корзины гистограммы для значения time_taken."""
+    return min(max(int(value), 0), HISTOGRAM_SIZE - 1)
+
+
+def histogram_quantile(histogram, q):
+    """
+    Оценивает квантиль по гистограмме: середина корзины, в которую попадает квантиль.
+
+    Args:
+        histogram (list): Количество значений в каждой корзине.
+        q (float): Квантиль от 0 до 1.
+
+    Returns:
+        float | None: Оценка квантиля или `None` для пустой гистограммы.
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if count and seen >= rank:
+            return index + 0.5
+    return HISTOGRAM_SIZE - 0.5
+
+
+def merge_histograms(histograms):
+    """Складывает гистограммы поэлементно."""
+    merged = [0] * HISTOGRAM_SIZE
+    for histogram in histograms:
+        for index, count in enumerate(histogram or ()):
+            merged[index] += count
+    return merged
+
+
+class RollupAccumulator:
+    """
+    Накопитель агрегатов time_taken по курьерам в памяти процесса.
+
+    Наблюдения складываются в «грязные» интервалы (количество, сумма, минимум, максимум,
+    гистограмма), которые периодически сливаются в таблицу courier_rollups одним пакетом.
+    Агрегаты из памяти и из базы складываются, поэтому слив можно повторять сколько угодно раз.
+
+    Args:
+        flush_interval (float): Минимальный период слива в базу, сек.
+    """
+
+    def __init__(self, flush_interval=60.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._dirty = {}
+        self._last_flush = time.monotonic()
+
+    def add(self, courier_id, time_taken, moment):
+        """
+        Учитывает одно наблюдение time_taken курьера во всех интервалах агрегации.
+
+        Args:
+            courier_id (int): ID курьера.
+            time_taken (float): Наблюдаемое значение.
+            moment (datetime): Время наблюдения.
+        """
+        with self._lock:
+            for granularity in GRANULARITIES:
+                key = (granularity, courier_id, bucket_start(moment, granularity))
+                bucket = self._dirty.get(key)
+                if bucket is None:
+                    bucket = self._dirty[key] = [0, 0.0, time_taken, time_taken, [0] * HISTOGRAM_SIZE]
+                bucket[0] += 1
+                bucket[1] += time_taken
+                bucket[2] = min(bucket[2], time_taken)
+                bucket[3] = max(bucket[3], time_taken)
+                bucket[4][histogram_index(time_taken)] += 1
+
+    def due(self):
+        """`True`, если есть несохранённые агрегаты и с прошлого слива прошло `flush_interval` секунд."""
+        with self._lock:
+            return bool(self._dirty) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    def take(self):
+        """
+        Забирает все грязные интервалы для записи в базу.
+
+        Returns:
+            list: Кортежи (granularity, courier_id, bucket_start, samples, total, min, max, histogram).
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._last_flush = time.monotonic()
+        return [(*key, *bucket) for key, bucket in dirty.items()]
+
+    def restore(self, rows):
+        """Возвращает в накопитель интервалы, которые не удалось записать в базу."""
+        with self._lock:
+            for granularity, courier_id, start, samples, total, minimum, maximum, histogram in rows:
+                key = (granularity, courier_id, start)
+                bucket = self._dirty.get(key)
+                if bucket is None:
+                    self._dirty[key] = [samples, total, minimum, maximum, histogram]
+                    continue
+                bucket[0] += samples
+                bucket[1] += total
+                bucket[2] = min(bucket[2], minimum)
+                bucket[3] = max(bucket[3], maximum)
+                bucket[4] = merge_histograms([bucket[4], histogram])
+
+    def clear(self):
+        """Отбрасывает несохранённые агрегаты."""
+        with self._lock:
+            self._dirty.clear()
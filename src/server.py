@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src import metrics
+from src.config import get_local_time
+from src.snapshot import board
+from src.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Кэш готовых JSON-ответов с ограниченным временем жизни.
+
+    Ключ — путь с параметрами и версия снимка: при изменении снимка ответы,
+    построенные по старой версии, перестают совпадать и строятся заново.
+
+    Args:
+        ttl (float): Время жизни ответа, сек.
+    """
+
+    def __init__(self, ttl=2.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_or_build(self, key, build):
+        """
+        Возвращает закэшированный ответ или строит его вызовом `build()`.
+
+        Returns:
+            tuple: Тело ответа (bytes) и ETag.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1], entry[2]
+
+        body = json.dumps(build(), ensure_ascii=False, default=str).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self._lock:
+            # Удаляем устаревшие записи, чтобы кэш не рос с числом разных запросов
+            self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + self.ttl, body, etag)
+        return body, etag
+
+
+def _int_param(params, name, default):
+    """Целочисленный параметр запроса или значение по умолчанию."""
+    values = params.get(name)
+    return int(values[0]) if values else default
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Проверяет заголовок If-None-Match: список тегов через запятую сравнивается с ETag
+    посимвольно без учёта префикса слабого тега W/, а "*" совпадает с любым ответом.
+
+    Args:
+        if_none_match (str | None): Значение заголовка If-None-Match.
+        etag (str): ETag ответа в кавычках.
+
+    Returns:
+        bool: `True`, если можно ответить 304 Not Modified.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class DashboardRequestHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP API только для чтения:
+
+    - GET /couriers?warehouse=... — текущее состояние курьеров;
+    - GET /orders/recent?limit=100&warehouse=... — последние записанные заказы;
+    - GET /rollups?granularity=1h&hours=24&warehouse=... — сводка time_taken по курьерам;
+    - GET /rollups/<courier_id>?granularity=5m&hours=24 — агрегаты курьера по интервалам
+      (501, если хранилище не ведёт агрегаты);
+    - GET /metrics — метрики процесса в текстовом формате Prometheus (без кэширования).
+
+    Параметр warehouse необязателен: без него возвращаются данные всех складов.
+    Ответы JSON поддерживают ETag / If-None-Match (304 Not Modified).
+    """
+
+    cache = ResponseCache(float(os.getenv("HTTP_CACHE_TTL", "2")))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts == ["metrics"]:
+            self._send_metrics()
+            return
+
+        warehouse = params.get("warehouse", [None])[0]
+        try:
+            if parts == ["couriers"]:
+                key = (url.path, warehouse, board.version)
+                body, etag = self.cache.get_or_build(key, lambda: board.couriers(warehouse)[1])
+            elif parts == ["orders", "recent"]:
+                limit = min(_int_param(params, "limit", 100), 1000)
+                key = (url.path, limit, warehouse, board.version)
+                body, etag = self.cache.get_or_build(key, lambda: board.recent_orders(limit, warehouse)[1])
+            elif parts and parts[0] == "rollups" and len(parts) <= 2:
+                granularity = params.get("granularity", ["1h" if len(parts) == 1 else "5m"])[0]
+                hours = min(_int_param(params, "hours", 24), 24 * 31)
+                key = (url.path, granularity, hours, warehouse)
+                if len(parts) == 1:
+                    body, etag = self.cache.get_or_build(key, lambda: get_storage().get_rollup_summary(
+                        get_local_time() - timedelta(hours=hours), granularity=granularity, warehouse=warehouse))
+                else:
+                    courier_id = int(parts[1])
+                    body, etag = self.cache.get_or_build(key, lambda: get_storage().get_courier_rollups(
+                        courier_id, get_local_time() - timedelta(hours=hours), granularity=granularity))
+            else:
+                self._send_json(404, b'{"error": "not found"}')
+                return
+        except NotImplementedError as e:
+            self._send_json(501, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+            return
+        except ValueError as e:
+            self._send_json(400, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+            return
+        except Exception as e:
+            self._send_json(500, json.dumps({"error": str(e)}, ensure_ascii=False).encode("utf-8"))
+            return
+
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self._send_cache_headers(etag)
+            self.end_headers()
+            return
+        self._send_json(200, body, etag)
+
+    def _send_metrics(self):
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self._send_cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_cache_headers(self, etag=None):
+        """Заголовки кэширования, одинаковые для ответов 200 и 304."""
+        self.send_header("Cache-Control", f"max-age={int(self.cache.ttl)}")
+        if etag:
+            self.send_header("ETag", etag)
+
+    def log_message(self, format, *args):
+        """Запросы не выводятся в консоль, чтобы не замедлять ответы."""
+
+
+def start_http_server(host=None, port=None):
+    """
+    Запускает HTTP API в фоновом потоке.
+
+    Args:
+        host (str, optional): Адрес. По умолчанию из HTTP_HOST или "127.0.0.1".
+        port (int, optional): Порт. По умолчанию из HTTP_PORT.
+
+    Returns:
+        ThreadingHTTPServer | None: Запущенный сервер (остановка — `shutdown()`)
+        или `None`, если порт не задан.
+    """
+    host = host or os.getenv("HTTP_HOST", "127.0.0.1")
+    port = port if port is not None else os.getenv("HTTP_PORT")
+    if port in (None, ""):
+        return None
+
+    server = ThreadingHTTPServer((host, int(port)), DashboardRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="http-api", daemon=True).start()
+    logger.info("HTTP API запущен на http://%s:%s", host, server.server_address[1])
+    return server
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Куки, в которых дашборд хранит токен авторизации
+AUTH_COOKIE_NAMES = ("auth_token", "spid")
+
+
+def get_auth_token(cookie_dict):
+    """
+    Возвращает токен авторизации из словаря куков.
+
+    Args:
+        cookie_dict (dict): Куки в виде {имя: значение}.
+
+    Returns:
+        str | None: Значение `auth_token` или `spid`, если оно есть.
+    """
+    for name in AUTH_COOKIE_NAMES:
+        if cookie_dict.get(name):
+            return cookie_dict[name]
+    return None
+
+
+def build_headers(cookie_dict, user_agent, referer=None):
+    """
+    Формирует заголовки для запросов к API по кукам авторизации.
+
+    Args:
+        cookie_dict (dict): Куки в виде {имя: значение}.
+        user_agent (str): User-Agent браузера, получившего куки.
+        referer (str, optional): Адрес дашборда. По умолчанию из DASHBOARD_URL.
+
+    Returns:
+        dict: Заголовки для запросов к API.
+
+    Raises:
+        Exception: Если отсутствует cookie авторизации (auth_token или spid), выбрасывается исключение.
+    """
+    authorization_cookie = get_auth_token(cookie_dict)
+    if not authorization_cookie:
+        raise Exception("Authorization cookie is missing! Please check the login process.")
+
+    return {
+        "Authorization": f"Bearer {authorization_cookie}",
+        "Accept": "application/json",
+        "Origin": os.getenv("ORIGIN_URL"),
+        "Referer": referer or os.getenv("DASHBOARD_URL"),
+        "User-Agent": user_agent,
+    }
+
+
+def default_user_agent():
+    """
+    Возвращает User-Agent из переменной USER_AGENT, которая задаётся как аргумент Chrome
+    (`--user-agent=...`), без префикса аргумента.
+
+    Returns:
+        str | None: Строка User-Agent.
+    """
+    user_agent = os.getenv("USER_AGENT")
+    if user_agent and user_agent.startswith("--user-agent="):
+        user_agent = user_agent[len("--user-agent="):]
+    return user_agent
+
+
+# Сохранение куков в файл
+def save_cookies(cookies, user_agent, filename=None):
+    """
+    Сохраняет куки браузера в JSON-файл вместе с User-Agent и временем истечения.
+
+    Время истечения — наименьший срок жизни куков авторизации, а если он не задан,
+    время сохранения плюс COOKIES_TTL секунд (по умолчанию 12 часов).
+    Файл записывается атомарно через временный файл.
+
+    Args:
+        cookies (list): Куки в формате `driver.get_cookies()`.
+        user_agent (str): User-Agent браузера.
+        filename (str, optional): Имя файла. По умолчанию из COOKIES_FILE или "cookies.json".
+    """
+    filename = filename or os.getenv("COOKIES_FILE", "cookies.json")
+    saved_at = time.time()
+    expiries = [
+        cookie["expiry"] for cookie in cookies
+        if cookie.get("name") in AUTH_COOKIE_NAMES and cookie.get("expiry")
+    ]
+    expires_at = min(expiries) if expiries else saved_at + float(os.getenv("COOKIES_TTL", str(12 * 3600)))
+
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "w", encoding="utf-8") as file:
+        json.dump({
+            "saved_at": saved_at,
+            "expires_at": expires_at,
+            "user_agent": user_agent,
+            "cookies": cookies,
+        }, file, ensure_ascii=False)
+    os.replace(tmp_filename, filename)
+
+
+# Загрузка куков из файла
+def load_cookies(filename=None):
+    """
+    Загружает сохранённые куки, если файл существует и срок их действия не истёк.
+
+    Args:
+        filename (str, optional): Имя файла. По умолчанию из COOKIES_FILE или "cookies.json".
+
+    Returns:
+        dict | None: Словарь с ключами `cookies` и `user_agent` или `None`,
+        если файла нет, он повреждён или куки истекли.
+    """
+    filename = filename or os.getenv("COOKIES_FILE", "cookies.json")
+    if not os.path.exists(filename):
+        logger.info("Файл куков не найден, потребуется заново войти в систему.")
+        return None
+
+    try:
+        with open(filename, encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.warning("Ошибка при загрузке куков: %s", e)
+        return None
+
+    if not isinstance(data, dict) or not isinstance(data.get("cookies"), list):
+        logger.warning("Файл куков повреждён или пуст.")
+        return None
+    if data.get("expires_at", 0) <= time.time():
+        logger.info("Сохранённые куки истекли, потребуется заново войти в систему.")
+        return None
+    return data
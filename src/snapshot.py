@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+
+from src.config import DEFAULT_WAREHOUSE, get_local_time
+
+
+class BoardSnapshot:
+    """
+    Снимок текущего состояния доски курьеров в памяти процесса для чтения по HTTP.
+
+    Снимок обновляется конвейером сбора данных после каждой записи в базу, поэтому
+    клиенты HTTP API получают данные без запросов к базе. Курьеры хранятся по ключу
+    (склад, имя). Номер версии увеличивается при каждом изменении и используется для ETag.
+
+    Args:
+        recent_limit (int): Сколько последних записанных заказов хранить.
+    """
+
+    def __init__(self, recent_limit=500):
+        self._lock = threading.Lock()
+        self._couriers = {}
+        self._recent = deque(maxlen=recent_limit)
+        self.version = 0
+        self.updated_at = None
+
+    def load(self, states):
+        """
+        Заполняет снимок из состояния курьеров (например, `courier_cache.items()`).
+
+        Args:
+            states (list): Пары ((warehouse, courier_name), CourierState).
+        """
+        with self._lock:
+            self._couriers = {
+                (warehouse, courier_name): {
+                    "courier_id": state.courier_id,
+                    "warehouse": warehouse,
+                    "courier_name": courier_name,
+                    "time_taken": state.time_taken,
+                    "order_id": state.order_id,
+                    "status": state.status,
+                    "changed_at": state.cur_time,
+                }
+                for (warehouse, courier_name), state in states
+            }
+            self.version += 1
+            self.updated_at = get_local_time()
+
+    def update(self, observations, changes=(), warehouse=DEFAULT_WAREHOUSE):
+        """
+        Учитывает наблюдения одного пакета и записанные заказы.
+
+        Args:
+            observations (iterable): Пары (courier_name, time_taken) или снимки `OrderSnapshot` со статусом.
+            changes (iterable): Записанные заказы из результата `save_courier_batch`.
+            warehouse (str): Склад, к которому относятся наблюдения.
+        """
+        now = get_local_time()
+        with self._lock:
+            changed = False
+            for courier_name, time_taken, *status in observations:
+                courier = self._couriers.setdefault(
+                    (warehouse, courier_name), {"warehouse": warehouse, "courier_name": courier_name}
+                )
+                if courier.get("time_taken") != time_taken or "changed_at" not in courier:
+                    courier["time_taken"] = time_taken
+                    courier["changed_at"] = now
+                    changed = True
+                if status and courier.get("status") != status[0]:
+                    courier["status"] = status[0]
+                    changed = True
+            for change in changes:
+                key = (change.get("warehouse", warehouse), change["courier_name"])
+                courier = self._couriers.setdefault(key, {"warehouse": key[0], "courier_name": key[1]})
+                courier["courier_id"] = change["courier_id"]
+                courier["order_id"] = change["order_id"]
+                self._recent.appendleft(dict(change))
+                changed = True
+            if changed:
+                self.version += 1
+            self.updated_at = now
+
+    def update_from_log(self, entries, changes=()):
+        """
+        Учитывает пакеты журнала локальной очереди, применённые `apply_observation_log`.
+
+        Args:
+            entries (list): Тройки (observed_at, warehouse, observations).
+            changes (iterable): Записанные заказы из результата `apply_observation_log`.
+        """
+        for _, warehouse, observations in entries:
+            self.update(observations, warehouse=warehouse)
+        self.update((), changes)
+
+    def couriers(self, warehouse=None):
+        """
+        Args:
+            warehouse (str, optional): Только курьеры этого склада.
+
+        Returns:
+            tuple: Версия и список курьеров, упорядоченный по складу и имени.
+        """
+        with self._lock:
+            return self.version, [
+                dict(self._couriers[key]) for key in sorted(self._couriers)
+                if warehouse is None or key[0] == warehouse
+            ]
+
+    def recent_orders(self, limit=100, warehouse=None):
+        """
+        Args:
+            limit (int): Максимальное количество заказов.
+            warehouse (str, optional): Только заказы этого склада.
+
+        Returns:
+            tuple: Версия и последние записанные заказы, новые первыми.
+        """
+        with self._lock:
+            orders = (order for order in self._recent if warehouse is None or order.get("warehouse") == warehouse)
+            return self.version, [dict(order) for _, order in zip(range(limit), orders)]
+
+
+# Общий для процесса снимок доски курьеров
+board = BoardSnapshot()
@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from src.config import DEFAULT_WAREHOUSE, get_local_time
+from src.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+ID_FILE = "spool.id"
+
+
+def _segment_name(number):
+    return f"{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}"
+
+
+def _truncate_torn_tail(path, chunk_size=64 * 1024):
+    """
+    Обрезает файл сегмента по последнему переводу строки: незавершённая последняя строка
+    остаётся после сбоя во время записи, и новые записи не должны к ней приклеиться.
+
+    Returns:
+        int: Количество отброшенных байт.
+    """
+    with open(path, "r+b") as file:
+        size = file.seek(0, os.SEEK_END)
+        end = size
+        keep = 0
+        while end > 0:
+            start = max(0, end - chunk_size)
+            file.seek(start)
+            index = file.read(end - start).rfind(b"\n")
+            if index >= 0:
+                keep = start + index + 1
+                break
+            end = start
+        if keep < size:
+            file.truncate(keep)
+            file.flush()
+            os.fsync(file.fileno())
+    return size - keep
+
+
+class Spool:
+    """
+    Локальная очередь наблюдений на диске (write-ahead): каждое наблюдение сначала
+    дописывается сюда и только затем фоновым потоком `SpoolFlusher` применяется к базе.
+    Если база недоступна, наблюдения копятся на диске и не теряются.
+
+    Очередь — каталог с сегментами segment-NNNNNNNNNNNN.jsonl, которые только дополняются.
+    Каждая строка — пакет наблюдений одного цикла со временем получения и складом. Когда сегмент
+    превышает `segment_bytes`, начинается следующий. Незавершённая строка в конце последнего
+    сегмента (сбой во время записи) отбрасывается при открытии очереди. `fsync` выполняется не на каждую запись,
+    а не реже чем раз в `fsync_interval` секунд (групповая фиксация).
+
+    У каталога есть постоянный идентификатор (файл spool.id): под ним в базе хранится
+    позиция, до которой журнал уже применён.
+
+    Args:
+        directory (str): Каталог очереди.
+        segment_bytes (int): Размер сегмента, после которого начинается новый, байт.
+        fsync_interval (float): Максимальный интервал между `fsync`, сек.; 0 — `fsync` на каждую запись.
+    """
+
+    def __init__(self, directory, segment_bytes=4 * 1024 * 1024, fsync_interval=0.2):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        self.spool_id = self._load_id()
+        segments = self.segments()
+        self._segment = segments[-1] if segments else 1
+        path = self.segment_path(self._segment)
+        if os.path.exists(path):
+            dropped = _truncate_torn_tail(path)
+            if dropped:
+                logger.warning("Отброшена незавершённая запись в конце %s: %s байт.", path, dropped)
+        self._file = open(os.path.join(directory, _segment_name(self._segment)), "ab")
+
+    def _load_id(self):
+        """Читает идентификатор очереди или создаёт его для нового каталога."""
+        path = os.path.join(self.directory, ID_FILE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                return file.read().strip()
+        spool_id = uuid.uuid4().hex
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(spool_id)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+        return spool_id
+
+    def segments(self):
+        """Номера сегментов в каталоге по возрастанию."""
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                numbers.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(numbers)
+
+    def segment_path(self, number):
+        return os.path.join(self.directory, _segment_name(number))
+
+    @property
+    def active_segment(self):
+        with self._lock:
+            return self._segment
+
+    def append(self, batches, observed_at=None, warehouse=DEFAULT_WAREHOUSE):
+        """
+        Дописывает пакеты наблюдений в очередь.
+
+        Args:
+            batches (list): Пакеты наблюдений — списки пар (courier_name, time_taken).
+            observed_at (datetime, optional): Время получения. По умолчанию текущее.
+            warehouse (str): Склад, к которому относятся наблюдения.
+        """
+        observed_at = (observed_at or get_local_time()).isoformat()
+        data = b"".join(
+            json.dumps({"t": observed_at, "w": warehouse, "o": observations}, ensure_ascii=False).encode("utf-8")
+            + b"\n"
+            for observations in batches if observations
+        )
+        if not data:
+            return
+        with self._lock:
+            if self._file.tell() >= self.segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._file.flush()
+            self._dirty = True
+            if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                self._fsync()
+            self._appended.notify_all()
+
+    def _rotate(self):
+        """Закрывает заполненный сегмент и начинает следующий (под блокировкой)."""
+        self._fsync()
+        self._file.close()
+        self._segment += 1
+        self._file = open(self.segment_path(self._segment), "ab")
+
+    def _fsync(self):
+        if self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def sync(self):
+        """Сбрасывает на диск записи, ещё не прошедшие `fsync`."""
+        with self._lock:
+            self._fsync()
+
+    def wait(self, timeout):
+        """Ждёт новой записи в очередь не дольше `timeout` секунд."""
+        with self._lock:
+            self._appended.wait(timeout)
+
+    def wake(self):
+        """Будит потоки, ожидающие в `wait()`."""
+        with self._lock:
+            self._appended.notify_all()
+
+    def read(self, segment, offset, max_entries):
+        """
+        Читает пакеты начиная с позиции (segment, offset), переходя к следующим сегментам.
+        Незавершённая последняя строка (запись ещё идёт) не читается. Повреждённые строки
+        пропускаются с сообщением о сегменте и смещении, чтобы не останавливать применение очереди.
+
+        Args:
+            segment (int): Номер сегмента.
+            offset (int): Смещение в сегменте, байт.
+            max_entries (int): Максимальное количество пакетов.
+
+        Returns:
+            tuple: Пакеты (observed_at, warehouse, observations) и позиция (segment, offset) после них.
+            Для записей без склада (до появления складов) используется склад по умолчанию.
+        """
+        entries = []
+        active = self.active_segment
+        while len(entries) < max_entries:
+            path = self.segment_path(segment)
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    file.seek(offset)
+                    while len(entries) < max_entries:
+                        line = file.readline()
+                        if not line.endswith(b"\n"):
+                            break
+                        try:
+                            record = json.loads(line)
+                            entry = (
+                                datetime.fromisoformat(record["t"]),
+                                record.get("w", DEFAULT_WAREHOUSE),
+                                [tuple(pair) for pair in record["o"]],
+                            )
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.error("Пропущена повреждённая запись очереди: сегмент %s, смещение %s, %s байт: %s",
+                                         segment, offset, len(line), e)
+                        else:
+                            entries.append(entry)
+                        offset += len(line)
+            if len(entries) >= max_entries or segment >= active:
+                break
+            segment, offset = segment + 1, 0
+        return entries, (segment, offset)
+
+    def remove_before(self, segment):
+        """Удаляет полностью применённые сегменты с номером меньше `segment`."""
+        for number in self.segments():
+            if number < segment:
+                os.remove(self.segment_path(number))
+
+    def close(self):
+        """Сбрасывает записи на диск и закрывает текущий сегмент."""
+        with self._lock:
+            self._fsync()
+            self._file.close()
+
+
+class SpoolFlusher:
+    """
+    Фоновый поток, применяющий локальную очередь к хранилищу по порядку через `Storage.apply_observation_log`.
+
+    Поток просыпается при новой записи (или раз в `interval` секунд), читает до `max_entries`
+    пакетов с сохранённой в базе позиции и применяет их одной транзакцией вместе с новой позицией.
+    При ошибке базы пакеты остаются в очереди, а повтор выполняется с растущей паузой
+    до `max_backoff` секунд; после восстановления накопившийся журнал применяется крупными пакетами.
+
+    Args:
+        spool (Spool): Локальная очередь.
+        on_applied (callable, optional): Вызывается после применения: `on_applied(entries, result)`,
+            где `entries` — применённые пакеты (observed_at, warehouse, observations).
+        interval (float): Максимальная пауза между проверками очереди, сек.
+        max_entries (int): Максимальное количество пакетов в одной транзакции.
+        max_backoff (float): Максимальная пауза между повторами после ошибки, сек.
+    """
+
+    def __init__(self, spool, on_applied=None, interval=1.0, max_entries=5000, max_backoff=30.0):
+        self.spool = spool
+        self.on_applied = on_applied
+        self.interval = interval
+        self.max_entries = max_entries
+        self.max_backoff = max_backoff
+        self.position = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запускает фоновый поток."""
+        self._thread = threading.Thread(target=self._loop, name="spool-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Останавливает поток, предварительно попытавшись применить остаток очереди."""
+        self._stop.set()
+        self.spool.wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _load_position(self):
+        checkpoint = get_storage().get_spool_checkpoint(self.spool.spool_id)
+        if checkpoint is not None:
+            return checkpoint
+        segments = self.spool.segments()
+        return (segments[0] if segments else 1), 0
+
+    def flush_once(self):
+        """
+        Применяет к базе одну порцию очереди.
+
+        Returns:
+            int: Количество применённых пакетов.
+        """
+        if self.position is None:
+            self.position = self._load_position()
+        # В базу попадают только записи, уже сброшенные на диск
+        self.spool.sync()
+        entries, position = self.spool.read(*self.position, self.max_entries)
+        if not entries:
+            if position != self.position:
+                self.position = position
+            return 0
+
+        result = get_storage().apply_observation_log(entries, self.spool.spool_id, position)
+        self.position = position
+        self.spool.remove_before(position[0])
+        if self.on_applied is not None:
+            self.on_applied(entries, result)
+        return len(entries)
+
+    def _loop(self):
+        backoff = self.interval
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                applied = self.flush_once()
+                backoff = self.interval
+            except Exception as e:
+                logger.error("Ошибка при применении локальной очереди, повтор через %.1f с: %s", backoff, e)
+                if stopping:
+                    return
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            if stopping and not applied:
+                return
+            if not applied:
+                self.spool.wait(self.interval)
@@ -0,0 +1,447 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from src.cache import CourierState, CourierStateCache, latest_observations, plan_orders
+from src.config import DEFAULT_WAREHOUSE, get_local_time, local_tz
+from src.metrics import DB_STATEMENTS, DB_TRANSACTION_SECONDS, OBSERVATIONS, ORDERS_WRITTEN
+from src.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# Версионированные миграции схемы SQLite: (версия, описание, SQL). Применённая версия хранится
+# в PRAGMA user_version. Время хранится текстом ISO 8601 в местном часовом поясе без смещения
+MIGRATIONS = [
+    (1, "Таблицы couriers, orders и courier_latest", """
+        CREATE TABLE IF NOT EXISTS couriers (
+            courier_id INTEGER PRIMARY KEY,
+            warehouse TEXT NOT NULL DEFAULT 'default',
+            courier_name TEXT NOT NULL,
+            last_update TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (warehouse, courier_name)
+        );
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id INTEGER PRIMARY KEY,
+            courier_id INTEGER REFERENCES couriers(courier_id) ON DELETE CASCADE,
+            time_taken REAL,
+            cur_time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS orders_courier_time_idx ON orders (courier_id, cur_time DESC);
+        CREATE INDEX IF NOT EXISTS orders_cur_time_idx ON orders (cur_time);
+        CREATE TABLE IF NOT EXISTS courier_latest (
+            courier_id INTEGER PRIMARY KEY REFERENCES couriers(courier_id) ON DELETE CASCADE,
+            order_id INTEGER NOT NULL,
+            time_taken REAL,
+            cur_time TEXT NOT NULL
+        );
+    """),
+    (2, "Таблицы spool_checkpoints и scheduler_runs", """
+        CREATE TABLE IF NOT EXISTS spool_checkpoints (
+            spool_id TEXT PRIMARY KEY,
+            segment INTEGER NOT NULL,
+            byte_offset INTEGER NOT NULL,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE IF NOT EXISTS scheduler_runs (
+            job_name TEXT PRIMARY KEY,
+            last_run_at TEXT NOT NULL
+        );
+    """),
+    (3, "Столбец status в orders и courier_latest", """
+        ALTER TABLE orders ADD COLUMN status TEXT;
+        ALTER TABLE courier_latest ADD COLUMN status TEXT;
+    """),
+]
+
+# Сколько старых заказов удаляется одной транзакцией при очистке по сроку хранения,
+# чтобы запись наблюдений не ждала долго
+RETENTION_BATCH = 5000
+
+
+def _to_db(moment):
+    """Время для хранения в SQLite: текст ISO 8601 в местном часовом поясе без смещения."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(local_tz).replace(tzinfo=None)
+    return moment.isoformat(" ", timespec="microseconds")
+
+
+def _from_db(value):
+    """Время из SQLite (без часового пояса, как TIMESTAMP в PostgreSQL)."""
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+class SqliteStorage(Storage):
+    """
+    Встроенное хранилище в одном файле SQLite — для небольших складов и окружений без сервера PostgreSQL.
+
+    - Журнал WAL: чтение не блокирует запись, а фиксация транзакции — это дозапись в файл журнала;
+      `synchronous` по умолчанию NORMAL (SQLITE_SYNCHRONOUS): при сбое процесса данные не теряются,
+      при отключении питания могут потеряться последние транзакции.
+    - Все запросы — постоянные строки с параметрами, поэтому подготовленные выражения берутся
+      из кэша соединения и не разбираются повторно; списки имён и ID передаются одним параметром JSON.
+    - Наблюдения одного вызова записываются одной транзакцией `BEGIN IMMEDIATE` пакетами `executemany`;
+      курьеры без изменений отсекаются по кэшу и не требуют транзакции.
+
+    Правило записи то же, что в PostgreSQL: уменьшение time_taken — новый заказ, иначе обновление
+    последнего; изменение только статуса обновляет статус последнего заказа.
+    Агрегаты (courier_rollups) хранилище не ведёт: `get_rollup_summary` и `get_courier_rollups`
+    выбрасывают `NotImplementedError`, и HTTP API отвечает на /rollups кодом 501.
+
+    Args:
+        path (str): Файл базы данных.
+        synchronous (str, optional): Режим PRAGMA synchronous. По умолчанию из SQLITE_SYNCHRONOUS или NORMAL.
+        busy_timeout (float, optional): Ожидание блокировки другим процессом, сек.
+            По умолчанию из SQLITE_BUSY_TIMEOUT или 5.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, synchronous=None, busy_timeout=None):
+        self.path = path
+        synchronous = synchronous or os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+        busy_timeout = busy_timeout if busy_timeout is not None else float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+        self.cache = CourierStateCache()
+        self._lock = threading.RLock()
+        # Транзакции открываются явно (isolation_level=None); соединение используется из разных потоков под блокировкой
+        self._conn = sqlite3.connect(
+            path, timeout=busy_timeout, isolation_level=None, check_same_thread=False, cached_statements=256
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={synchronous}")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+
+    @contextmanager
+    def _transaction(self):
+        """Транзакция записи: `BEGIN IMMEDIATE` сразу берёт блокировку записи в файле базы."""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                yield cur
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            else:
+                cur.execute("COMMIT")
+            finally:
+                cur.close()
+
+    def _fetch(self, query, params=(), as_dict=False):
+        """Выполняет запрос чтения и возвращает все строки (словарями, если `as_dict`)."""
+        with self._lock:
+            cur = self._conn.cursor()
+            if as_dict:
+                cur.row_factory = sqlite3.Row
+            try:
+                DB_STATEMENTS.inc()
+                cur.execute(query, params)
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        return [dict(row) for row in rows] if as_dict else rows
+
+    def init(self):
+        """
+        Применяет ещё не применённые миграции из `MIGRATIONS`, каждую в своей транзакции.
+
+        Если миграция завершилась ошибкой, её транзакция откатывается, а версия схемы остаётся
+        прежней.
+
+        Raises:
+            sqlite3.Error: Если миграцию не удалось применить.
+        """
+        with self._lock:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, description, sql in MIGRATIONS:
+                if number <= version:
+                    continue
+                try:
+                    self._conn.executescript(f"BEGIN IMMEDIATE; {sql}; PRAGMA user_version = {number}; COMMIT;")
+                except sqlite3.Error:
+                    # executescript прерывается на ошибочном операторе, не закрыв транзакцию
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    logger.error("Ошибка миграции SQLite %s: %s", number, description)
+                    raise
+                logger.info("Применена миграция SQLite %s: %s", number, description)
+
+    def load_state(self):
+        rows = self._fetch("""
+            SELECT c.warehouse, c.courier_name, c.courier_id, l.order_id, l.time_taken, l.cur_time, l.status
+            FROM couriers c
+            LEFT JOIN courier_latest l USING (courier_id)
+        """)
+        self.cache.replace({
+            (warehouse, courier_name): CourierState(courier_id, order_id, time_taken, _from_db(cur_time), status)
+            for warehouse, courier_name, courier_id, order_id, time_taken, cur_time, status in rows
+        })
+        logger.info("Состояние %s курьеров загружено в кэш.", len(rows))
+        return len(rows)
+
+    def courier_states(self):
+        return self.cache.items()
+
+    def _resolve_couriers(self, cur, keys):
+        """
+        Находит или создаёт курьеров и читает их последние заказы.
+
+        Args:
+            cur (sqlite3.Cursor): Курсор открытой транзакции.
+            keys (list): Ключи (warehouse, courier_name).
+
+        Returns:
+            tuple: {(warehouse, courier_name): courier_id} и {courier_id: CourierState} последних заказов.
+        """
+        by_warehouse = {}
+        for warehouse, courier_name in keys:
+            by_warehouse.setdefault(warehouse, []).append(courier_name)
+
+        courier_ids = {}
+        for warehouse, names in by_warehouse.items():
+            DB_STATEMENTS.inc(len(names) + 1)
+            cur.executemany(
+                "INSERT INTO couriers (warehouse, courier_name) VALUES (?, ?) "
+                "ON CONFLICT (warehouse, courier_name) DO NOTHING",
+                [(warehouse, courier_name) for courier_name in names],
+            )
+            cur.execute(
+                "SELECT courier_id, courier_name FROM couriers "
+                "WHERE warehouse = ? AND courier_name IN (SELECT value FROM json_each(?))",
+                (warehouse, json.dumps(names, ensure_ascii=False)),
+            )
+            courier_ids.update({(warehouse, courier_name): courier_id for courier_id, courier_name in cur.fetchall()})
+
+        DB_STATEMENTS.inc()
+        cur.execute(
+            "SELECT courier_id, order_id, time_taken, cur_time, status FROM courier_latest "
+            "WHERE courier_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(courier_ids.values())),),
+        )
+        last_orders = {
+            courier_id: CourierState(courier_id, order_id, time_taken, _from_db(cur_time), status)
+            for courier_id, order_id, time_taken, cur_time, status in cur.fetchall()
+        }
+        return courier_ids, last_orders
+
+    @staticmethod
+    def _write_orders(cur, plan):
+        """
+        Записывает новые и обновлённые заказы плана пакетами `executemany`. Новые заказы получают ID
+        по порядку после наибольшего записанного.
+        """
+        if plan.new_orders:
+            # Транзакция держит блокировку записи, поэтому ID можно выделить без гонок
+            DB_STATEMENTS.inc()
+            cur.execute("SELECT COALESCE(MAX(order_id), 0) FROM orders")
+            next_id = cur.fetchone()[0] + 1
+            plan.assign_order_ids(range(next_id, next_id + len(plan.new_orders)))
+            DB_STATEMENTS.inc(len(plan.new_orders))
+            cur.executemany(
+                "INSERT INTO orders (order_id, courier_id, time_taken, cur_time, status) VALUES (?, ?, ?, ?, ?)",
+                [(order_id, courier_id, time_taken, _to_db(cur_time), status)
+                 for order_id, courier_id, time_taken, cur_time, status in plan.new_orders],
+            )
+        if plan.updated_orders:
+            DB_STATEMENTS.inc(len(plan.updated_orders))
+            cur.executemany(
+                "UPDATE orders SET time_taken = ?, cur_time = ?, status = ? WHERE order_id = ?",
+                [(state.time_taken, _to_db(state.cur_time), state.status, order_id)
+                 for order_id, (_, state) in plan.updated_orders.items()],
+            )
+
+    @staticmethod
+    def _write_latest(cur, written):
+        """Записывает последний заказ каждого изменившегося курьера в courier_latest."""
+        written = [
+            (state.courier_id, state.order_id, state.time_taken, _to_db(state.cur_time), state.status)
+            for state in written
+        ]
+        if written:
+            DB_STATEMENTS.inc(len(written))
+            cur.executemany("""
+                INSERT INTO courier_latest (courier_id, order_id, time_taken, cur_time, status)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (courier_id) DO UPDATE
+                SET order_id = excluded.order_id, time_taken = excluded.time_taken,
+                    cur_time = excluded.cur_time, status = excluded.status
+            """, written)
+
+    def _apply(self, batches, spool_id=None, position=None):
+        """
+        Записывает пакеты {(warehouse, courier_name): (time_taken, status)} с временем получения одной транзакцией.
+
+        Returns:
+            dict: inserted, updated, unchanged и changes.
+        """
+        result = {"inserted": 0, "updated": 0, "unchanged": 0, "changes": []}
+        keys = sorted({key for _, latest in batches for key in latest})
+
+        with self._lock:
+            courier_ids = {}
+            last_orders = {}
+            unknown = []
+            for key in keys:
+                state = self.cache.get(key)
+                if state is None:
+                    unknown.append(key)
+                    continue
+                courier_ids[key] = state.courier_id
+                if state.order_id is not None:
+                    last_orders[state.courier_id] = state
+
+            plan = None
+            if not unknown and spool_id is None:
+                # Все курьеры известны кэшу: если изменений нет, транзакция не нужна
+                plan = plan_orders(batches, courier_ids, last_orders)
+                if not plan.has_writes:
+                    result["unchanged"] = plan.unchanged
+                    OBSERVATIONS.inc(sum(len(latest) for _, latest in batches))
+                    return result
+
+            with DB_TRANSACTION_SECONDS.time(), self._transaction() as cur:
+                if unknown:
+                    resolved, resolved_orders = self._resolve_couriers(cur, unknown)
+                    courier_ids.update(resolved)
+                    last_orders.update(resolved_orders)
+                if plan is None:
+                    plan = plan_orders(batches, courier_ids, last_orders)
+                self._write_orders(cur, plan)
+                states = plan.states()
+                written = plan.written(states)
+                self._write_latest(cur, written.values())
+
+                if spool_id is not None and position is not None:
+                    DB_STATEMENTS.inc()
+                    cur.execute("""
+                        INSERT INTO spool_checkpoints (spool_id, segment, byte_offset, updated_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT (spool_id) DO UPDATE
+                        SET segment = excluded.segment, byte_offset = excluded.byte_offset,
+                            updated_at = excluded.updated_at
+                    """, (spool_id, *position))
+
+            # Транзакция зафиксирована — обновляем кэш
+            self.cache.update(states)
+
+        result["inserted"] = len(plan.new_orders)
+        result["updated"] = len(plan.updated_orders)
+        result["unchanged"] = plan.unchanged
+        OBSERVATIONS.inc(sum(len(latest) for _, latest in batches))
+        ORDERS_WRITTEN.labels("new").inc(result["inserted"])
+        ORDERS_WRITTEN.labels("updated").inc(result["updated"])
+        result["changes"] = plan.changes()
+        return result
+
+    def save_observations(self, observations, warehouse=DEFAULT_WAREHOUSE):
+        latest = latest_observations(observations, warehouse)
+        # Новые заказы получают ID в порядке имён, как в `save_courier_batch`
+        result = self._apply([(get_local_time(), {key: latest[key] for key in sorted(latest)})])
+        logger.debug("Сохранено наблюдений: %s, новых заказов: %s, обновлено: %s, без изменений: %s.",
+                     len(latest), result["inserted"], result["updated"], result["unchanged"])
+        return result
+
+    def apply_observation_log(self, entries, spool_id=None, position=None):
+        batches = []
+        for observed_at, warehouse, observations in entries:
+            batches.append((observed_at, latest_observations(observations, warehouse)))
+        return self._apply(batches, spool_id, position)
+
+    def get_spool_checkpoint(self, spool_id):
+        rows = self._fetch("SELECT segment, byte_offset FROM spool_checkpoints WHERE spool_id = ?", (spool_id,))
+        return tuple(rows[0]) if rows else None
+
+    def get_courier(self, courier_name, warehouse=DEFAULT_WAREHOUSE):
+        rows = self._fetch(
+            "SELECT * FROM couriers WHERE warehouse = ? AND courier_name = ?", (warehouse, courier_name), as_dict=True
+        )
+        return rows[0] if rows else None
+
+    def get_couriers(self):
+        return self._fetch("SELECT * FROM couriers", as_dict=True)
+
+    def get_orders(self):
+        return self._fetch("SELECT * FROM orders", as_dict=True)
+
+    def clear(self):
+        """
+        Удаляет всех курьеров и заказы; ID курьеров и заказов начинаются заново.
+        """
+        with self._transaction() as cur:
+            cur.execute("DELETE FROM courier_latest")
+            cur.execute("DELETE FROM orders")
+            cur.execute("DELETE FROM couriers")
+        self.cache.invalidate()
+        logger.info("Таблицы 'couriers' и 'orders' очищены.")
+
+    def apply_retention(self, retention_days=None):
+        """
+        Удаляет заказы старше срока хранения пакетами по `RETENTION_BATCH` строк, каждый
+        в своей транзакции, чтобы запись наблюдений не ждала окончания очистки.
+
+        Args:
+            retention_days (int, optional): Сколько дней хранить заказы.
+                По умолчанию из ORDERS_RETENTION_DAYS или 30.
+
+        Returns:
+            int: Количество удалённых заказов.
+        """
+        if retention_days is None:
+            retention_days = int(os.getenv("ORDERS_RETENTION_DAYS", "30"))
+        oldest_kept = (get_local_time().date() - timedelta(days=retention_days)).isoformat()
+
+        deleted = 0
+        while True:
+            with self._transaction() as cur:
+                DB_STATEMENTS.inc()
+                cur.execute(
+                    "DELETE FROM orders WHERE order_id IN (SELECT order_id FROM orders WHERE cur_time < ? LIMIT ?)",
+                    (oldest_kept, RETENTION_BATCH),
+                )
+                count = cur.rowcount
+            deleted += count
+            if count < RETENTION_BATCH:
+                break
+
+        if deleted:
+            with self._transaction() as cur:
+                DB_STATEMENTS.inc()
+                cur.execute("DELETE FROM courier_latest WHERE cur_time < ?", (oldest_kept,))
+            # Последние заказы части курьеров могли быть удалены
+            self.cache.invalidate()
+            logger.info("Удалено заказов старше %s: %s.", oldest_kept, deleted)
+        return deleted
+
+    def get_job_last_run(self, job_name):
+        rows = self._fetch("SELECT last_run_at FROM scheduler_runs WHERE job_name = ?", (job_name,))
+        return local_tz.localize(_from_db(rows[0][0])) if rows else None
+
+    def claim_job_run(self, job_name, window_start, run_at):
+        with self._transaction() as cur:
+            DB_STATEMENTS.inc()
+            cur.execute("""
+                INSERT INTO scheduler_runs (job_name, last_run_at)
+                VALUES (?, ?)
+                ON CONFLICT (job_name) DO UPDATE
+                SET last_run_at = excluded.last_run_at
+                WHERE scheduler_runs.last_run_at < ?
+            """, (job_name, _to_db(run_at), _to_db(window_start)))
+            return cur.rowcount > 0
+
+    def release_job_run(self, job_name):
+        with self._transaction() as cur:
+            DB_STATEMENTS.inc()
+            cur.execute("UPDATE scheduler_runs SET last_run_at = ? WHERE job_name = ?",
+                        (_to_db(datetime(1970, 1, 1)), job_name))
+
+    def stats(self):
+        wal_path = f"{self.path}-wal"
+        return {"path": self.path, "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0}
+
+    def close(self):
+        """Закрывает соединение; журнал WAL при этом переносится в файл базы."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,293 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from src.config import DEFAULT_WAREHOUSE
+
+# Хранилище наблюдений: "postgres" — сервер PostgreSQL (переменные DBNAME, HOST и т. д.),
+# "sqlite" — встроенная база SQLite в одном файле SQLITE_PATH
+STORAGE_BACKENDS = ("postgres", "sqlite")
+
+
+class Storage(ABC):
+    """
+    Интерфейс хранилища курьеров и заказов, через который работают конвейер сбора данных,
+    локальная очередь, планировщик задач обслуживания и HTTP API.
+
+    Реализации: `PostgresStorage` (src.db) и `SqliteStorage` (src.sqlite_storage).
+    Результаты записи одинаковы для всех хранилищ — словарь с полями inserted, updated,
+    unchanged и changes, как у `save_courier_batch`.
+
+    Реализация обязана определить все абстрактные методы. Агрегаты (`get_rollup_summary`,
+    `get_courier_rollups`) необязательны: по умолчанию они выбрасывают `NotImplementedError`,
+    и HTTP API отвечает на /rollups кодом 501. `SqliteStorage` агрегаты не ведёт.
+    """
+
+    name = None
+
+    @abstractmethod
+    def init(self):
+        """Создаёт или обновляет схему хранилища."""
+
+    @abstractmethod
+    def load_state(self):
+        """
+        Загружает в кэш последние заказы всех курьеров.
+
+        Returns:
+            int: Количество загруженных курьеров.
+        """
+
+    @abstractmethod
+    def courier_states(self):
+        """
+        Returns:
+            list: Пары ((warehouse, courier_name), CourierState) из кэша для снимка доски.
+        """
+
+    @abstractmethod
+    def save_observations(self, observations, warehouse=DEFAULT_WAREHOUSE):
+        """
+        Сохраняет наблюдения одного цикла опроса одной транзакцией.
+
+        Args:
+            observations (iterable): Пары (courier_name, time_taken) или снимки `OrderSnapshot`.
+            warehouse (str): Склад, к которому относятся наблюдения.
+
+        Returns:
+            dict: inserted, updated, unchanged и changes.
+        """
+
+    @abstractmethod
+    def apply_observation_log(self, entries, spool_id=None, position=None):
+        """
+        Применяет журнал локальной очереди одной транзакцией вместе с его позицией.
+
+        Args:
+            entries (list): Тройки (observed_at, warehouse, observations) в порядке получения.
+            spool_id (str, optional): Идентификатор локальной очереди.
+            position (tuple, optional): (segment, byte_offset) после последнего пакета.
+
+        Returns:
+            dict: inserted, updated, unchanged и changes.
+        """
+
+    @abstractmethod
+    def get_spool_checkpoint(self, spool_id):
+        """
+        Returns:
+            tuple | None: Позиция (segment, byte_offset), до которой журнал применён.
+        """
+
+    @abstractmethod
+    def get_courier(self, courier_name, warehouse=DEFAULT_WAREHOUSE):
+        """
+        Returns:
+            dict | None: Данные курьера или `None`, если курьер не найден.
+        """
+
+    @abstractmethod
+    def get_couriers(self):
+        """
+        Returns:
+            list: Словари с данными всех курьеров.
+        """
+
+    @abstractmethod
+    def get_orders(self):
+        """
+        Returns:
+            list: Словари с данными всех заказов.
+        """
+
+    @abstractmethod
+    def clear(self):
+        """Удаляет всех курьеров и заказы."""
+
+    @abstractmethod
+    def apply_retention(self, retention_days=None):
+        """
+        Удаляет заказы старше срока хранения (по умолчанию ORDERS_RETENTION_DAYS или 30 дней).
+
+        Returns:
+            Сведения об удалённых данных; зависят от хранилища.
+        """
+
+    @abstractmethod
+    def get_job_last_run(self, job_name):
+        """
+        Returns:
+            datetime | None: Время последнего запуска задачи планировщика.
+        """
+
+    @abstractmethod
+    def claim_job_run(self, job_name, window_start, run_at):
+        """
+        Атомарно отмечает запуск задачи в текущем окне.
+
+        Returns:
+            bool: `True`, если запуск отмечен и задачу нужно выполнить.
+        """
+
+    @abstractmethod
+    def release_job_run(self, job_name):
+        """Снимает отметку о запуске задачи, чтобы её можно было повторить в том же окне."""
+
+    def get_rollup_summary(self, start, end=None, granularity="1h", warehouse=None):
+        """
+        Сводка time_taken по курьерам за период.
+
+        Raises:
+            NotImplementedError: Если хранилище не ведёт агрегаты.
+        """
+        raise NotImplementedError(f"Хранилище {self.name} не поддерживает агрегаты")
+
+    def get_courier_rollups(self, courier_id, start, end=None, granularity="5m"):
+        """
+        Агрегаты time_taken курьера по интервалам.
+
+        Raises:
+            NotImplementedError: Если хранилище не ведёт агрегаты.
+        """
+        raise NotImplementedError(f"Хранилище {self.name} не поддерживает агрегаты")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Сведения о соединениях хранилища для вывода в лог.
+        """
+        return {}
+
+    def flush(self):
+        """Записывает накопленные в памяти данные (например, агрегаты) перед завершением."""
+
+    def close(self):
+        """Закрывает соединения хранилища."""
+
+
+class PostgresStorage(Storage):
+    """
+    Хранилище в PostgreSQL: функции `src.db` с общим пулом соединений.
+
+    Модуль `src.db` (и драйвер psycopg2) импортируется при создании хранилища, а не при
+    импорте `src.storage`, поэтому для SQLite драйвер PostgreSQL не нужен.
+    """
+
+    name = "postgres"
+
+    def __init__(self):
+        from src import db
+
+        self._db = db
+
+    def init(self):
+        self._db.init_db()
+
+    def load_state(self):
+        return self._db.load_courier_state()
+
+    def courier_states(self):
+        return self._db.courier_cache.items()
+
+    def save_observations(self, observations, warehouse=DEFAULT_WAREHOUSE):
+        return self._db.save_courier_batch(observations, warehouse)
+
+    def apply_observation_log(self, entries, spool_id=None, position=None):
+        return self._db.apply_observation_log(entries, spool_id, position)
+
+    def get_spool_checkpoint(self, spool_id):
+        return self._db.get_spool_checkpoint(spool_id)
+
+    def get_courier(self, courier_name, warehouse=DEFAULT_WAREHOUSE):
+        return self._db.get_courier_data(courier_name, warehouse)
+
+    def get_couriers(self):
+        return self._db.get_all_couriers()
+
+    def get_orders(self):
+        return self._db.get_all_orders()
+
+    def clear(self):
+        self._db.clear_tables()
+
+    def apply_retention(self, retention_days=None):
+        return self._db.rotate_partitions(retention_days)
+
+    def get_job_last_run(self, job_name):
+        return self._db.get_job_last_run(job_name)
+
+    def claim_job_run(self, job_name, window_start, run_at):
+        return self._db.claim_job_run(job_name, window_start, run_at)
+
+    def release_job_run(self, job_name):
+        self._db.release_job_run(job_name)
+
+    def get_rollup_summary(self, start, end=None, granularity="1h", warehouse=None):
+        return self._db.get_rollup_summary(start, end, granularity, warehouse)
+
+    def get_courier_rollups(self, courier_id, start, end=None, granularity="5m"):
+        return self._db.get_courier_rollups(courier_id, start, end, granularity)
+
+    def stats(self):
+        return self._db.get_pool_stats()
+
+    def flush(self):
+        self._db.flush_rollups()
+
+    def close(self):
+        self._db.close_pool()
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(backend=None, path=None):
+    """
+    Создаёт хранилище по конфигурации.
+
+    Args:
+        backend (str, optional): "postgres" или "sqlite". По умолчанию из STORAGE_BACKEND или "postgres".
+        path (str, optional): Файл базы SQLite. По умолчанию из SQLITE_PATH или "pars.db".
+
+    Returns:
+        Storage: Хранилище.
+
+    Raises:
+        ValueError: Если хранилище неизвестно.
+    """
+    backend = backend or os.getenv("STORAGE_BACKEND", "postgres")
+    if backend == "postgres":
+        return PostgresStorage()
+    if backend == "sqlite":
+        from src.sqlite_storage import SqliteStorage
+
+        return SqliteStorage(path or os.getenv("SQLITE_PATH", "pars.db"))
+    raise ValueError(f"Неизвестное хранилище STORAGE_BACKEND={backend!r}, ожидается одно из {STORAGE_BACKENDS}")
+
+
+# Общее хранилище процесса
+def get_storage():
+    """
+    Возвращает хранилище процесса, создавая его при первом обращении (`create_storage`).
+
+    Returns:
+        Storage: Хранилище.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = create_storage()
+        return _storage
+
+
+def set_storage(storage):
+    """
+    Подменяет хранилище процесса (например, в бенчмарках).
+
+    Args:
+        storage (Storage | None): Новое хранилище; `None` — создать заново при следующем обращении.
+    """
+    global _storage
+    with _storage_lock:
+        _storage = storage
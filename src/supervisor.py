@@ -0,0 +1,297 @@
+import asyncio
+import contextlib
+import functools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from src.api import create_session, map_summary, warm_start
+from src.browser import BrowserSession
+from src.config import DEFAULT_WAREHOUSE
+from src.metrics import WORKER_RESTARTS
+from src.pipeline import Pipeline, StageStats, write_batches
+
+logger = logging.getLogger(__name__)
+
+
+class WarehouseConfig(NamedTuple):
+    """
+    Настройки опроса одного склада (дашборда и учётной записи).
+
+    Attributes:
+        name (str): Имя склада; записывается в столбец couriers.warehouse.
+        dashboard_url (str): Адрес дашборда.
+        username (str): Имя пользователя для входа.
+        password (str): Пароль для входа.
+        ingest_mode (str): Источник данных: "dom" или "api".
+        extract_mode (str): Режим извлечения данных со страницы.
+        api_url (str, optional): Адрес сводки по складу; по умолчанию из COOKER.
+        cookies_file (str, optional): Файл сохранённых куков; по умолчанию из COOKIES_FILE.
+    """
+
+    name: str
+    dashboard_url: str
+    username: Optional[str]
+    password: Optional[str]
+    ingest_mode: str = "dom"
+    extract_mode: str = "script"
+    api_url: Optional[str] = None
+    cookies_file: Optional[str] = None
+
+
+def warehouse_from_env():
+    """
+    Настройки единственного склада из переменных окружения (WAREHOUSE, DASHBOARD_URL,
+    DASHBOARD_USER, DASHBOARD_PASSWORD, INGEST_MODE, EXTRACT_MODE).
+
+    Returns:
+        WarehouseConfig: Настройки склада.
+    """
+    return WarehouseConfig(
+        name=DEFAULT_WAREHOUSE,
+        dashboard_url=os.getenv("DASHBOARD_URL"),
+        username=os.getenv("DASHBOARD_USER"),
+        password=os.getenv("DASHBOARD_PASSWORD"),
+        ingest_mode=os.getenv("INGEST_MODE", "dom"),
+        extract_mode=os.getenv("EXTRACT_MODE", "script"),
+    )
+
+
+# Загрузка списка складов
+def load_warehouses(path):
+    """
+    Загружает настройки складов из JSON-файла со списком объектов:
+
+        [{"name": "north", "dashboard_url": "https://...", "username": "...", "password_env": "NORTH_PASSWORD",
+          "ingest_mode": "api", "api_url": "https://..."}]
+
+    Пароль задаётся полем `password` или именем переменной окружения в `password_env`.
+    Режимы по умолчанию берутся из INGEST_MODE и EXTRACT_MODE, файл куков — cookies_<name>.json.
+
+    Args:
+        path (str): Путь к файлу (WAREHOUSES_FILE).
+
+    Returns:
+        list: Настройки складов `WarehouseConfig`.
+
+    Raises:
+        ValueError: Если у склада нет имени или адреса дашборда либо имена повторяются.
+    """
+    with open(path, encoding="utf-8") as file:
+        items = json.load(file)
+    if not isinstance(items, list):
+        raise ValueError(f"{path}: ожидается список складов")
+
+    warehouses = []
+    for item in items:
+        name = item.get("name")
+        if not name or not item.get("dashboard_url"):
+            raise ValueError(f"{path}: у склада должны быть заданы name и dashboard_url: {item}")
+        if any(warehouse.name == name for warehouse in warehouses):
+            raise ValueError(f"{path}: склад {name} указан несколько раз")
+        password = item.get("password")
+        if password is None and item.get("password_env"):
+            password = os.getenv(item["password_env"])
+        warehouses.append(WarehouseConfig(
+            name=name,
+            dashboard_url=item["dashboard_url"],
+            username=item.get("username"),
+            password=password,
+            ingest_mode=item.get("ingest_mode", os.getenv("INGEST_MODE", "dom")),
+            extract_mode=item.get("extract_mode", os.getenv("EXTRACT_MODE", "script")),
+            api_url=item.get("api_url"),
+            cookies_file=item.get("cookies_file", f"cookies_{name}.json"),
+        ))
+    return warehouses
+
+
+class Supervisor:
+    """
+    Опрашивает несколько складов в одном процессе: для каждого склада работает свой конвейер
+    `Pipeline` (браузер, сессия API, куки), а запись в базу, пул соединений и пулы потоков общие.
+
+    - Все конвейеры кладут наблюдения в одну ограниченную очередь, которую разбирает один
+      этап записи `write_batches` (пакеты группируются по складу).
+    - Одновременно запущено не больше `browser_workers` экземпляров Chrome: браузер запускается
+      только со слотом из общего семафора. В режиме "dom" склад держит слот всё время работы
+      конвейера, в режиме "api" — только на время входа (после него браузер закрывается).
+      Поэтому складов в режиме "dom" должно быть меньше `browser_workers`, если есть склады
+      в режиме "api" (им нужен слот для входа), и не больше — если их нет.
+      Вызовы Selenium выполняются в общем пуле из `browser_workers` потоков.
+    - Конвейер, завершившийся ошибкой (например, после `max_failures` сбоев подряд), перезапускается
+      с новым браузером через паузу, которая растёт от `restart_delay` до `max_restart_delay` секунд.
+
+    Сырые данные опросов всех складов пишутся в общий `recorder` с указанием склада.
+
+    Параметры по умолчанию берутся из переменных окружения BROWSER_WORKERS (по умолчанию —
+    число складов в режиме "dom" плюс до 4 слотов для входа складов в режиме "api"),
+    IO_WORKERS, MAX_FAILURES, RESTART_DELAY и MAX_RESTART_DELAY.
+
+    Args:
+        warehouses (list): Настройки складов `WarehouseConfig`.
+        spool (Spool, optional): Локальная очередь, через которую наблюдения попадают в базу.
+        recorder (Recorder, optional): Запись сырых данных опросов.
+        browser_workers (int, optional): Наибольшее число одновременно запущенных браузеров.
+        max_failures (int, optional): Количество ошибок подряд, после которого конвейер перезапускается.
+
+    Raises:
+        ValueError: Если браузеров `browser_workers` не хватает складам в режиме "dom".
+    """
+
+    def __init__(self, warehouses, spool=None, recorder=None, browser_workers=None, max_failures=None):
+        self.warehouses = list(warehouses)
+        self.spool = spool
+        self.recorder = recorder
+
+        dom_count = sum(warehouse.ingest_mode == "dom" for warehouse in self.warehouses)
+        api_count = len(self.warehouses) - dom_count
+        default_workers = max(1, dom_count + min(4, api_count))
+        browser_workers = browser_workers or int(os.getenv("BROWSER_WORKERS", str(default_workers)))
+        # Складам в режиме "api" нужен хотя бы один слот, не занятый постоянно складами "dom"
+        if dom_count + (1 if api_count else 0) > browser_workers:
+            raise ValueError(
+                f"BROWSER_WORKERS={browser_workers} недостаточно: складов в режиме dom {dom_count}, "
+                f"каждому нужен свой браузер на всё время работы"
+                + (", и ещё один браузер нужен для входа складов в режиме api" if api_count else "")
+            )
+        self.browser_workers = browser_workers
+        io_workers = int(os.getenv("IO_WORKERS", str(max(4, len(self.warehouses)))))
+        self.max_failures = max_failures if max_failures is not None else int(os.getenv("MAX_FAILURES", "5"))
+        self.restart_delay = float(os.getenv("RESTART_DELAY", "5"))
+        self.max_restart_delay = float(os.getenv("MAX_RESTART_DELAY", "300"))
+        self.queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+
+        self.stats = StageStats()
+        self.queue = None
+        self.browser_slots = None
+        self.browser_executor = ThreadPoolExecutor(max_workers=max(1, browser_workers), thread_name_prefix="browser")
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+        self._browsers = {}
+        self._sessions = {}
+
+    @staticmethod
+    def _login(browser, saved, release):
+        """Вход через браузер в потоке браузера; в режиме "api" браузер затем закрывается."""
+        try:
+            return browser.authenticate(saved)
+        finally:
+            if release:
+                browser.close()
+
+    async def _start(self, warehouse, browser, session):
+        """
+        Авторизует склад (по сохранённой сессии или через браузер) и создаёт его конвейер.
+
+        Returns:
+            Pipeline: Конвейер склада, подключённый к общей очереди и пулам потоков.
+        """
+        loop = asyncio.get_running_loop()
+        warm = await loop.run_in_executor(self.io_executor, functools.partial(
+            warm_start, session, warehouse.cookies_file, warehouse.api_url, warehouse.dashboard_url))
+        saved = None
+        if warm is not None:
+            saved, headers, cookies, summary = warm
+            logger.info("Склад %s: сохранённая сессия действительна.", warehouse.name)
+            if self.recorder is not None:
+                self.recorder.record_summary(summary, warehouse.name)
+            observations = map_summary(summary) if warehouse.ingest_mode == "api" else None
+            if observations:
+                await self.queue.put((warehouse.name, observations))
+
+        release = warehouse.ingest_mode == "api"
+        if warehouse.ingest_mode == "dom" or warm is None:
+            # В режиме "dom" слот браузера уже занят в `supervise`, в режиме "api" он берётся на время входа
+            async with self.browser_slots if release else contextlib.nullcontext():
+                headers, cookies = await loop.run_in_executor(
+                    self.browser_executor, self._login, browser, saved, release)
+
+        return Pipeline(
+            browser, session, headers, cookies,
+            ingest_mode=warehouse.ingest_mode, extract_mode=warehouse.extract_mode, recorder=self.recorder,
+            spool=self.spool, warehouse=warehouse.name, api_url=warehouse.api_url, queue=self.queue,
+            browser_executor=self.browser_executor, io_executor=self.io_executor,
+            max_failures=self.max_failures, release_browser=release,
+            browser_slots=self.browser_slots if release else None,
+        )
+
+    async def _close_worker(self, name):
+        """Закрывает браузер и сессию API перезапускаемого склада."""
+        browser = self._browsers.pop(name, None)
+        session = self._sessions.pop(name, None)
+        if browser is not None:
+            try:
+                await asyncio.get_running_loop().run_in_executor(self.browser_executor, browser.close)
+            except Exception as e:
+                logger.error("Склад %s: ошибка при закрытии браузера: %s", name, e)
+        if session is not None:
+            session.close()
+
+    def _browser_lease(self, warehouse):
+        """
+        Слот браузера на всё время работы конвейера склада в режиме "dom", где браузер читает страницу.
+        В режиме "api" слот берётся только на время входа (в `_start` и в конвейере).
+        """
+        if warehouse.ingest_mode != "dom":
+            return contextlib.nullcontext()
+        if self.browser_slots.locked():
+            logger.info("Склад %s: ожидание свободного браузера (BROWSER_WORKERS=%s).",
+                        warehouse.name, self.browser_workers)
+        return self.browser_slots
+
+    async def supervise(self, warehouse):
+        """Работает с конвейером склада до отмены, перезапуская его после сбоев."""
+        delay = self.restart_delay
+        while True:
+            async with self._browser_lease(warehouse):
+                browser = BrowserSession(
+                    warehouse.dashboard_url, warehouse.username, warehouse.password, warehouse.cookies_file
+                )
+                session = create_session()
+                self._browsers[warehouse.name] = browser
+                self._sessions[warehouse.name] = session
+                started = time.monotonic()
+                try:
+                    pipeline = await self._start(warehouse, browser, session)
+                    await pipeline.run()
+                except Exception as e:
+                    logger.error("Склад %s: конвейер остановлен из-за ошибки: %s", warehouse.name, e)
+
+                # Браузер закрывается до освобождения слота
+                await self._close_worker(warehouse.name)
+            # Если конвейер проработал дольше максимальной паузы, сбой не считается повторным
+            if time.monotonic() - started >= self.max_restart_delay:
+                delay = self.restart_delay
+            logger.warning("Склад %s: перезапуск через %.1f с.", warehouse.name, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+            WORKER_RESTARTS.labels(warehouse.name).inc()
+
+    async def run(self):
+        """Запускает общий этап записи и конвейеры всех складов; работает до отмены."""
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.browser_slots = asyncio.Semaphore(self.browser_workers)
+        tasks = [asyncio.ensure_future(write_batches(self.queue, self.stats, self.io_executor, self.spool))]
+        tasks += [asyncio.ensure_future(self.supervise(warehouse)) for warehouse in self.warehouses]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        """Сохраняет куки и закрывает браузеры и сессии всех складов, останавливает пулы потоков."""
+        for name, browser in list(self._browsers.items()):
+            try:
+                browser.close()
+            except Exception as e:
+                logger.error("Склад %s: ошибка при закрытии браузера: %s", name, e)
+        for session in self._sessions.values():
+            session.close()
+        self._browsers.clear()
+        self._sessions.clear()
+        self.browser_executor.shutdown(wait=False, cancel_futures=True)
+        self.io_executor.shutdown(wait=False, cancel_futures=True)
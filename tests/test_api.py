@@ -0,0 +1,67 @@
+import logging
+
+from src.api import map_summary
+from src.metrics import DROPPED_CARDS
+from src.parser import STATUS_UNKNOWN
+
+
+def test_map_summary_list_keys_and_nested_courier():
+    payload = {"data": {"couriers": [
+        {"courier": {"fullName": " Иванов "}, "statusText": "Пора выходить 4 мин"},
+        {"name": "Петров", "status": "В пути"},
+        {"status": "В пути"},  # нет имени
+        "не словарь",
+    ]}}
+    assert map_summary(payload) == [("Иванов", 4, "waiting"), ("Петров", None, "on_the_way")]
+
+
+def test_map_summary_minutes_field_takes_precedence():
+    payload = [{"name": "А", "status": "Пора выходить 4 мин", "minutes": "9"}]
+    assert map_summary(payload) == [("А", 9, "waiting")]
+
+
+def test_map_summary_coerces_minutes():
+    payload = [
+        {"name": "А", "minutes": 5.0},
+        {"name": "Б", "time_taken": "2.5"},
+        {"name": "В", "timeToLeave": 3},
+    ]
+    observations = map_summary(payload)
+    assert observations == [("А", 5, STATUS_UNKNOWN), ("Б", 2.5, STATUS_UNKNOWN), ("В", 3, STATUS_UNKNOWN)]
+    assert isinstance(observations[0].time_taken, int)
+
+
+def test_map_summary_drops_bad_minutes():
+    dropped = DROPPED_CARDS.labels("bad_minutes")
+    before = dropped.value
+    payload = [
+        {"name": "А", "minutes": "скоро"},
+        {"name": "Б", "minutes": True},
+        {"name": "В", "minutes": float("nan")},
+        {"name": "Г", "minutes": "inf"},
+        {"name": "Д", "minutes": 1},
+    ]
+    assert map_summary(payload) == [("Д", 1, STATUS_UNKNOWN)]
+    assert dropped.value - before == 4
+
+
+def test_map_summary_empty_payload():
+    unknown = DROPPED_CARDS.labels("unknown_schema")
+    before = unknown.value
+    assert map_summary(None) == []
+    assert map_summary([]) == []
+    assert map_summary({"couriers": []}) == []
+    assert unknown.value == before
+
+
+def test_map_summary_unknown_schema(caplog):
+    unknown = DROPPED_CARDS.labels("unknown_schema")
+    no_name = DROPPED_CARDS.labels("no_name")
+    before, before_no_name = unknown.value, no_name.value
+    with caplog.at_level(logging.WARNING, logger="src.api"):
+        assert map_summary({"other": [{"name": "А"}]}) == []
+        assert map_summary({"couriers": [{"login": "a"}, {"login": "b"}]}) == []
+    assert unknown.value - before == 2
+    assert no_name.value - before_no_name == 2
+    assert [record.levelno for record in caplog.records] == [logging.WARNING, logging.WARNING]
+    assert "Неизвестная схема ответа API" in caplog.records[0].getMessage()
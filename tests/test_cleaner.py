@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from src.cleaner import Job
+
+
+def _job():
+    return Job("test", (3, 30), (6, 0), lambda: None)
+
+
+def test_window():
+    start, end = _job().window(datetime(2024, 5, 1, 15, 12, 7, 123))
+    assert start == datetime(2024, 5, 1, 3, 30)
+    assert end == datetime(2024, 5, 1, 6, 0)
+
+
+def test_next_run_before_window():
+    assert _job().next_run(datetime(2024, 5, 1, 1, 0)) == datetime(2024, 5, 1, 3, 30)
+
+
+def test_next_run_inside_window():
+    now = datetime(2024, 5, 1, 4, 0)
+    assert _job().next_run(now) == now
+
+
+def test_next_run_inside_window_after_run():
+    job = _job()
+    job.last_run = datetime(2024, 5, 1, 3, 45)
+    assert job.next_run(datetime(2024, 5, 1, 4, 0)) == datetime(2024, 5, 2, 3, 30)
+
+
+def test_next_run_inside_window_after_yesterday_run():
+    job = _job()
+    job.last_run = datetime(2024, 5, 1, 3, 45) - timedelta(days=1)
+    now = datetime(2024, 5, 1, 4, 0)
+    assert job.next_run(now) == now
+
+
+def test_next_run_after_window():
+    assert _job().next_run(datetime(2024, 5, 1, 6, 1)) == datetime(2024, 5, 2, 3, 30)
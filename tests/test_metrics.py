@@ -0,0 +1,68 @@
+import pytest
+
+from src import metrics
+from src.metrics import REGISTRY, Counter, Gauge, Histogram
+
+
+@pytest.fixture
+def registered():
+    """Убирает созданные в тесте метрики из общего реестра процесса."""
+    created = []
+    yield created
+    for metric in created:
+        REGISTRY.remove(metric)
+
+
+def test_counter_render(registered):
+    counter = Counter("test_events_total", "События.", ["kind"])
+    registered.append(counter)
+    counter.labels("b").inc()
+    counter.labels("a").inc(2)
+    counter.labels('с "кавычкой"\n').inc()
+    assert counter.render() == [
+        "# HELP test_events_total События.",
+        "# TYPE test_events_total counter",
+        'test_events_total{kind="a"} 2',
+        'test_events_total{kind="b"} 1',
+        'test_events_total{kind="с \\"кавычкой\\"\\n"} 1',
+    ]
+
+
+def test_counter_without_labels_is_rendered_at_zero(registered):
+    counter = Counter("test_plain_total", "Без меток.")
+    registered.append(counter)
+    assert counter.render()[-1] == "test_plain_total 0"
+    with pytest.raises(ValueError):
+        counter.labels("лишняя")
+
+
+def test_histogram_render(registered):
+    histogram = Histogram("test_seconds", "Длительность.", buckets=(0.1, 1.0))
+    registered.append(histogram)
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{le="0.1"} 1',
+        'test_seconds_bucket{le="1.0"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 5.55",
+        "test_seconds_count 3",
+    ]
+
+
+def test_gauge_render(registered):
+    gauge = Gauge("test_connections", "Соединения.", ["state"], function=lambda: {("used",): 2, ("idle",): 1})
+    failing = Gauge("test_failing", "Ошибка функции.", function=lambda: 1 / 0)
+    registered.extend([gauge, failing])
+    assert gauge.render()[2:] == ['test_connections{state="idle"} 1', 'test_connections{state="used"} 2']
+    assert failing.render()[2:] == []
+
+
+def test_render_includes_registry(registered):
+    counter = Counter("test_registry_total", "В реестре.")
+    registered.append(counter)
+    counter.inc(3)
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert "# TYPE test_registry_total counter\ntest_registry_total 3\n" in text
+    assert "# TYPE pars_db_statements_total counter" in text
@@ -0,0 +1,72 @@
+from src.parser import STATUS_UNKNOWN, OrderSnapshot, classify_status, extract_order_data, parse_card_texts
+from src.sqlite_storage import SqliteStorage
+from src.storage import set_storage
+
+
+class FakeCard:
+    """Карточка заказа, у которой есть только блок статуса с текстом."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def find_element(self, by, value):
+        return self
+
+
+def test_classify_status_waiting_with_minutes():
+    assert classify_status("Пора выходить 12 мин") == ("waiting", 12)
+
+
+def test_classify_status_without_minutes():
+    assert classify_status("В пути") == ("on_the_way", None)
+    assert classify_status("На складе") == ("free", None)
+
+
+def test_classify_status_first_match_wins():
+    assert classify_status("Возвращается, Свободен") == ("returning", None)
+
+
+def test_classify_status_unknown():
+    assert classify_status("Что-то новое") == (STATUS_UNKNOWN, None)
+    assert classify_status("") == (STATUS_UNKNOWN, None)
+    assert classify_status(None) == (STATUS_UNKNOWN, None)
+
+
+def test_parse_card_texts():
+    texts = [
+        "Пора выходить 5 мин\n Иванов \nлишняя строка",
+        "В пути\nПетров",
+        "Доставляет",  # нет имени
+        "",
+        "Непонятный статус\nСидоров",
+    ]
+    snapshots = parse_card_texts(texts)
+    assert snapshots == [
+        ("Иванов", 5, "waiting"),
+        ("Петров", None, "on_the_way"),
+        ("Сидоров", None, STATUS_UNKNOWN),
+    ]
+    assert all(isinstance(snapshot, OrderSnapshot) for snapshot in snapshots)
+    assert snapshots[0].courier_name == "Иванов"
+
+
+def test_parse_card_texts_repeated_status_line_uses_cache():
+    first = parse_card_texts(["Пора выходить 7 мин\nА"])
+    second = parse_card_texts(["Пора выходить 7 мин\nБ"])
+    assert first == [("А", 7, "waiting")]
+    assert second == [("Б", 7, "waiting")]
+
+
+def test_extract_order_data_saves_status(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "test.db"))
+    storage.init()
+    storage.load_state()
+    set_storage(storage)
+    try:
+        extract_order_data(FakeCard("В пути\nИванов"))
+        extract_order_data(FakeCard("Без имени"))
+        orders = storage.get_orders()
+    finally:
+        set_storage(None)
+        storage.close()
+    assert [(order["time_taken"], order["status"]) for order in orders] == [(0, "on_the_way")]
@@ -0,0 +1,40 @@
+from src.observer import DRAIN_CHANGES_JS
+from src.parser import EXTRACT_CARDS_JS
+from src.pipeline import scrape_observations
+
+
+class FakeDriver:
+    """Страница с установленным наблюдателем: буфер изменений и все карточки."""
+
+    def __init__(self, changed, cards):
+        self.changed = changed
+        self.cards = cards
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        if script == DRAIN_CHANGES_JS:
+            self.scripts.append("drain")
+            changed, self.changed = self.changed, []
+            return changed
+        if script == EXTRACT_CARDS_JS:
+            self.scripts.append("cards")
+            return self.cards
+        raise AssertionError("неожиданный скрипт")
+
+
+CARDS = ["Пора выходить 5 мин\nИванов", "В пути\nПетров"]
+
+
+def test_observer_returns_changed_cards():
+    driver = FakeDriver(["Пора выходить 4 мин\nИванов"], CARDS)
+    assert scrape_observations(driver, mode="observer") == [("Иванов", 4, "waiting")]
+    assert driver.scripts == ["drain"]
+
+
+def test_observer_resync_reads_all_cards():
+    driver = FakeDriver(["Пора выходить 4 мин\nИванов"], CARDS)
+    observations = scrape_observations(driver, mode="observer", resync=True)
+    assert observations == [("Иванов", 5, "waiting"), ("Петров", None, "on_the_way")]
+    # Буфер изменений очищается, чтобы после сверки не вернуть устаревшие тексты
+    assert driver.scripts == ["drain", "cards"]
+    assert scrape_observations(driver, mode="observer") == []
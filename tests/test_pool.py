@@ -0,0 +1,86 @@
+import pytest
+from psycopg2 import extensions
+
+from src.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Соединение без сервера: статус транзакции, откаты и закрытие."""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections():
+    return []
+
+
+@pytest.fixture
+def pool(connections):
+    def connect():
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    pool = ConnectionPool(connect, minconn=1, maxconn=2, wait_timeout=0.05)
+    yield pool
+    pool.closeall()
+
+
+def test_checkout_and_release_reuse_connection(pool, connections):
+    conn = pool.getconn()
+    assert pool.stats()["in_use"] == 1
+    pool.putconn(conn)
+    assert (pool.stats()["in_use"], pool.stats()["idle"]) == (0, 1)
+    assert pool.getconn() is conn
+    assert len(connections) == 1
+
+
+def test_release_rolls_back_open_transaction(pool):
+    conn = pool.getconn()
+    conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.getconn() is conn
+
+
+def test_checkout_waits_and_times_out(pool):
+    first, second = pool.getconn(), pool.getconn()
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["waits"] == 1
+    pool.putconn(first)
+    assert pool.getconn() is first
+    pool.putconn(second)
+
+
+def test_connection_returned_on_exception(pool):
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.status = extensions.TRANSACTION_STATUS_INERROR
+            raise ValueError("ошибка запроса")
+    assert (pool.stats()["in_use"], pool.stats()["idle"]) == (0, 1)
+    assert conn.rollbacks == 1
+    assert not conn.closed
+
+
+def test_broken_connection_discarded_on_exception(pool, connections):
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.closed = 2
+            raise RuntimeError("соединение потеряно")
+    assert (pool.stats()["in_use"], pool.stats()["idle"], pool.stats()["total"]) == (0, 0, 0)
+    assert pool.getconn() is not conn
+    assert len(connections) == 2
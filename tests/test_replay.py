@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from src.config import local_tz
+from src.replay import replay
+from src.sqlite_storage import SqliteStorage
+from src.storage import set_storage
+
+T0 = 1714554000.0
+
+
+def _write_recording(path, records):
+    with open(path, "w", encoding="utf-8") as file:
+        for t, texts in records:
+            file.write(json.dumps({"t": t, "kind": "cards", "w": "north", "data": texts}, ensure_ascii=False) + "\n")
+
+
+def _local(t):
+    return datetime.fromtimestamp(t, local_tz).replace(tzinfo=None).isoformat(" ", timespec="microseconds")
+
+
+def test_replay_writes_with_recorded_time(tmp_path):
+    recording = str(tmp_path / "recording.jsonl")
+    _write_recording(recording, [
+        (T0, ["Пора выходить 5 мин\nИванов"]),
+        (T0 + 60, ["Пора выходить 5 мин\nИванов"]),
+        (T0 + 120, ["Пора выходить 7 мин\nИванов"]),
+        (T0 + 180, ["Пора выходить 2 мин\nИванов"]),
+        (T0 + 240, ["Пора выходить 2 мин\nИванов"]),
+    ])
+    storage = SqliteStorage(str(tmp_path / "test.db"))
+    storage.init()
+    storage.load_state()
+    set_storage(storage)
+    try:
+        report = replay(recording, spool_dir=str(tmp_path / "spool"))
+        orders = storage.get_orders()
+    finally:
+        set_storage(None)
+        storage.close()
+
+    assert (report["records"], report["observations"]) == (5, 5)
+    assert (report["inserted"], report["updated"], report["unchanged"]) == (2, 2, 1)
+    # cur_time заказов — время опроса из записи (местное, без смещения), а не время воспроизведения
+    assert sorted((order["time_taken"], order["cur_time"]) for order in orders) == [
+        (2, _local(T0 + 180)),
+        (7, _local(T0 + 120)),
+    ]
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytz
+
+from src.rollups import HISTOGRAM_SIZE, RollupAccumulator, bucket_start, histogram_quantile, merge_histograms
+
+TZ = pytz.timezone("Europe/Moscow")
+
+
+def _histogram(values):
+    histogram = [0] * HISTOGRAM_SIZE
+    for index, count in values.items():
+        histogram[index] = count
+    return histogram
+
+
+def test_histogram_quantile():
+    histogram = _histogram({2: 1, 5: 2, 10: 1})
+    assert histogram_quantile(histogram, 0.0) == 2.5
+    assert histogram_quantile(histogram, 0.25) == 2.5
+    assert histogram_quantile(histogram, 0.5) == 5.5
+    assert histogram_quantile(histogram, 1.0) == 10.5
+
+
+def test_histogram_quantile_empty():
+    assert histogram_quantile([0] * HISTOGRAM_SIZE, 0.5) is None
+
+
+def test_merge_histograms():
+    merged = merge_histograms([_histogram({1: 2}), None, _histogram({1: 1, 60: 3})])
+    assert merged == _histogram({1: 3, 60: 3})
+
+
+def test_bucket_start():
+    moment = TZ.localize(datetime(2024, 5, 1, 12, 7, 42))
+    assert bucket_start(moment, "5m") == TZ.localize(datetime(2024, 5, 1, 12, 5))
+    assert bucket_start(moment, "1h") == TZ.localize(datetime(2024, 5, 1, 12, 0))
+
+
+def test_accumulator_add_and_take():
+    accumulator = RollupAccumulator(flush_interval=0)
+    moment = TZ.localize(datetime(2024, 5, 1, 12, 7))
+    for value in (3, 7, 75):
+        accumulator.add(1, value, moment)
+    assert accumulator.due()
+
+    rows = {(row[0], row[1]): row for row in accumulator.take()}
+    assert set(rows) == {("5m", 1), ("1h", 1)}
+    _, _, start, samples, total, minimum, maximum, histogram = rows[("5m", 1)]
+    assert start == TZ.localize(datetime(2024, 5, 1, 12, 5))
+    assert (samples, total, minimum, maximum) == (3, 85.0, 3, 75)
+    assert histogram == _histogram({3: 1, 7: 1, 60: 1})
+
+    # После слива накопитель пуст
+    assert accumulator.take() == []
+    assert not accumulator.due()
+
+
+def test_accumulator_restore_merges_with_new_samples():
+    accumulator = RollupAccumulator()
+    moment = TZ.localize(datetime(2024, 5, 1, 12, 7))
+    accumulator.add(1, 4, moment)
+    failed = accumulator.take()
+
+    accumulator.add(1, 10, moment)
+    accumulator.restore(failed)
+    rows = {row[0]: row for row in accumulator.take()}
+    assert rows["5m"][3:7] == (2, 14.0, 4, 10)
+    assert rows["5m"][7] == _histogram({4: 1, 10: 1})
+
+
+def test_accumulator_due_waits_for_interval():
+    accumulator = RollupAccumulator(flush_interval=3600)
+    accumulator.add(1, 1, TZ.localize(datetime(2024, 5, 1, 12, 7)))
+    assert not accumulator.due()
+    accumulator.clear()
+    assert accumulator.take() == []
@@ -0,0 +1,66 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.server import etag_matches, start_http_server
+from src.snapshot import board
+
+
+@pytest.fixture
+def base_url():
+    server = start_http_server("127.0.0.1", 0)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, if_none_match=None):
+    request = urllib.request.Request(url)
+    if if_none_match is not None:
+        request.add_header("If-None-Match", if_none_match)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    # Подстрока или тег без кавычек не совпадают
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches('"ab', etag)
+    assert not etag_matches("abc", etag)
+
+
+def test_couriers_200_and_304(base_url):
+    board.update([("Сервер", 3, "waiting")], warehouse="test_server")
+    status, headers, body = _get(f"{base_url}/couriers?warehouse=test_server")
+    assert status == 200
+    etag = headers["ETag"]
+    assert etag and headers["Cache-Control"].startswith("max-age=")
+    assert [courier["courier_name"] for courier in json.loads(body)] == ["Сервер"]
+
+    for if_none_match in (etag, "W/" + etag, f'"other", {etag}', "*"):
+        status, not_modified, body = _get(f"{base_url}/couriers?warehouse=test_server", if_none_match)
+        assert status == 304
+        assert body == b""
+        assert not_modified["ETag"] == etag
+        assert not_modified["Cache-Control"] == headers["Cache-Control"]
+
+    status, _, _ = _get(f"{base_url}/couriers?warehouse=test_server", etag[:-2] + '"')
+    assert status == 200
+
+
+def test_unknown_path_404(base_url):
+    status, _, body = _get(f"{base_url}/unknown")
+    assert status == 404
+    assert json.loads(body) == {"error": "not found"}
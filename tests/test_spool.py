@@ -0,0 +1,94 @@
+import os
+from datetime import datetime
+
+from src.spool import Spool
+
+
+def _spool(tmp_path, **kwargs):
+    return Spool(str(tmp_path / "spool"), fsync_interval=0, **kwargs)
+
+
+def test_append_and_read(tmp_path):
+    spool = _spool(tmp_path)
+    observed_at = datetime(2024, 5, 1, 12, 0)
+    spool.append([[["Иванов", 5, "waiting"]], [], [["Петров", None]]], observed_at, "north")
+
+    entries, position = spool.read(1, 0, 10)
+    assert entries == [
+        (observed_at, "north", [("Иванов", 5, "waiting")]),
+        (observed_at, "north", [("Петров", None)]),
+    ]
+    assert position == (1, os.path.getsize(spool.segment_path(1)))
+
+    # С конечной позиции новых записей нет
+    assert spool.read(*position, 10) == ([], position)
+    spool.close()
+
+
+def test_read_respects_max_entries(tmp_path):
+    spool = _spool(tmp_path)
+    spool.append([[["А", 1]], [["Б", 2]], [["В", 3]]])
+    entries, position = spool.read(1, 0, 2)
+    assert [entry[2] for entry in entries] == [[("А", 1)], [("Б", 2)]]
+    entries, _ = spool.read(*position, 2)
+    assert [entry[2] for entry in entries] == [[("В", 3)]]
+    spool.close()
+
+
+def test_rotate_and_remove_before(tmp_path):
+    spool = _spool(tmp_path, segment_bytes=1)
+    for number in range(3):
+        spool.append([[[f"курьер {number}", number]]])
+    assert spool.segments() == [1, 2, 3]
+    assert spool.active_segment == 3
+
+    entries, position = spool.read(1, 0, 10)
+    assert [entry[2] for entry in entries] == [[(f"курьер {number}", number)] for number in range(3)]
+    assert position[0] == 3
+
+    spool.remove_before(position[0])
+    assert spool.segments() == [3]
+    spool.close()
+
+
+def test_id_is_kept_between_opens(tmp_path):
+    spool = _spool(tmp_path)
+    spool.close()
+    reopened = _spool(tmp_path)
+    assert reopened.spool_id == spool.spool_id
+    reopened.close()
+
+
+def test_torn_tail_is_dropped_on_open(tmp_path):
+    spool = _spool(tmp_path)
+    spool.append([[["А", 1]]])
+    spool.close()
+    path = spool.segment_path(1)
+    complete = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write('{"t": "2024-05-01T12:00:00", "o": [["Б", '.encode("utf-8"))
+
+    # Незавершённая строка не читается
+    entries, position = spool.read(1, 0, 10)
+    assert len(entries) == 1 and position == (1, complete)
+
+    reopened = _spool(tmp_path)
+    assert os.path.getsize(path) == complete
+    reopened.append([[["В", 3]]])
+    entries, _ = reopened.read(1, 0, 10)
+    assert [entry[2] for entry in entries] == [[("А", 1)], [("В", 3)]]
+    reopened.close()
+
+
+def test_corrupt_record_is_skipped(tmp_path):
+    spool = _spool(tmp_path)
+    spool.append([[["А", 1]]])
+    with open(spool.segment_path(1), "ab") as file:
+        file.write(b"not json\n")
+        file.write(b'{"o": []}\n')
+    spool.append([[["Б", 2]]])
+
+    entries, position = spool.read(1, 0, 10)
+    assert [entry[2] for entry in entries] == [[("А", 1)], [("Б", 2)]]
+    assert position == (1, os.path.getsize(spool.segment_path(1)))
+    spool.close()
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.cache import CourierState, plan_orders
+from src.config import get_local_time
+from src.sqlite_storage import SqliteStorage
+
+T0 = datetime(2024, 5, 1, 12, 0)
+IVANOV = ("default", "Иванов")
+PETROV = ("default", "Петров")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "test.db"))
+    storage.init()
+    storage.load_state()
+    yield storage
+    storage.close()
+
+
+def _at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def test_plan_first_order_starts_at_zero():
+    plan = plan_orders([(_at(0), {IVANOV: (5, "waiting")})], {IVANOV: 1}, {})
+    assert plan.new_orders == [[1, 0, _at(0), "waiting"]]
+    assert plan.updated_orders == {}
+    # Нулевой первый заказ — не измеренное значение, в агрегаты он не попадает
+    assert plan.samples == []
+
+
+def test_plan_rule_against_last_order():
+    last = CourierState(1, 10, 5.0, _at(0), "waiting")
+    courier_ids = {IVANOV: 1}
+
+    plan = plan_orders([(_at(1), {IVANOV: (5, None)})], courier_ids, {1: last})
+    assert (plan.new_orders, plan.updated_orders, plan.unchanged) == ([], {}, 1)
+    assert not plan.has_writes
+    assert plan.samples == []
+
+    plan = plan_orders([(_at(1), {IVANOV: (7, None)})], courier_ids, {1: last})
+    assert plan.updated_orders == {10: (_at(0), CourierState(1, 10, 7, _at(1), "waiting"))}
+
+    # Изменился только статус: время заказа остаётся прежним
+    plan = plan_orders([(_at(1), {IVANOV: (None, "on_the_way")})], courier_ids, {1: last})
+    assert plan.updated_orders == {10: (_at(0), CourierState(1, 10, 5.0, _at(0), "on_the_way"))}
+
+    plan = plan_orders([(_at(1), {IVANOV: (2, None)})], courier_ids, {1: last})
+    assert plan.new_orders == [[1, 2, _at(1), None]]
+    assert plan.updated_orders == {}
+
+
+def test_plan_applies_batches_in_order():
+    last = CourierState(1, 10, 5.0, _at(0), "waiting")
+    batches = [
+        (_at(1), {IVANOV: (6, None), PETROV: (None, "free")}),
+        (_at(2), {IVANOV: (8, "waiting")}),
+        (_at(3), {IVANOV: (1, None)}),
+        (_at(4), {IVANOV: (3, "on_the_way")}),
+    ]
+    plan = plan_orders(batches, {IVANOV: 1, PETROV: 2}, {1: last})
+    # Обновление записанного заказа ищет строку по исходному cur_time
+    assert plan.updated_orders == {10: (_at(0), CourierState(1, 10, 8, _at(2), "waiting"))}
+    assert plan.new_orders == [[2, 0, _at(1), "free"], [1, 3, _at(4), "on_the_way"]]
+    # Агрегаты получают каждую версию заказа, а не каждое наблюдение
+    assert plan.samples == [(1, 6, _at(1)), (1, 8, _at(2)), (1, 1, _at(3)), (1, 3, _at(4))]
+
+    plan.assign_order_ids([11, 12])
+    states = plan.states()
+    assert states == {
+        IVANOV: CourierState(1, 12, 3, _at(4), "on_the_way"),
+        PETROV: CourierState(2, 11, 0, _at(1), "free"),
+    }
+    assert plan.written(states) == states
+    assert [(change["courier_name"], change["order_id"], change["kind"]) for change in plan.changes()] == [
+        ("Петров", 11, "new"), ("Иванов", 10, "updated"), ("Иванов", 12, "new"),
+    ]
+
+
+def _orders(storage):
+    return sorted((order["order_id"], order["courier_id"], order["time_taken"], order["status"])
+                  for order in storage.get_orders())
+
+
+def test_save_observations_rule(storage):
+    # Первый заказ курьера добавляется с time_taken 0
+    result = storage.save_observations([("Иванов", 5, "waiting"), ("Петров", None, "on_the_way")])
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (2, 0, 0)
+    ivanov = storage.get_courier("Иванов")["courier_id"]
+    petrov = storage.get_courier("Петров")["courier_id"]
+
+    # Рост time_taken обновляет последний заказ; пара без статуса не меняет записанный
+    result = storage.save_observations([("Иванов", 5, "waiting"), ("Петров", None)])
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (0, 1, 1)
+
+    result = storage.save_observations([("Иванов", 5, "waiting"), ("Петров", None)])
+    assert (result["inserted"], result["updated"], result["unchanged"]) == (0, 0, 2)
+    assert result["changes"] == []
+
+    # Изменение только статуса обновляет статус последнего заказа
+    result = storage.save_observations([("Петров", None, "returning")])
+    assert result["updated"] == 1
+
+    # Уменьшение time_taken — новый заказ
+    result = storage.save_observations([("Иванов", 2)])
+    assert result["inserted"] == 1
+    assert [change["kind"] for change in result["changes"]] == ["new"]
+
+    assert _orders(storage) == [
+        (1, ivanov, 5.0, "waiting"),
+        (2, petrov, 0.0, "returning"),
+        (3, ivanov, 2.0, None),
+    ]
+
+
+def test_save_observations_keeps_last_observation_of_batch(storage):
+    storage.save_observations([("Иванов", None)])
+    storage.save_observations([("Иванов", 9), ("Иванов", 7)])
+    assert [order[2] for order in _orders(storage)] == [7.0]
+
+
+def test_save_observations_separates_warehouses(storage):
+    storage.save_observations([("Иванов", 5)], "north")
+    storage.save_observations([("Иванов", 3)], "south")
+    assert storage.get_courier("Иванов", "north")["courier_id"] != storage.get_courier("Иванов", "south")["courier_id"]
+    assert storage.get_courier("Иванов") is None
+    assert len(storage.get_orders()) == 2
+
+
+def test_state_survives_reopen(tmp_path):
+    path = str(tmp_path / "test.db")
+    storage = SqliteStorage(path)
+    storage.init()
+    storage.load_state()
+    storage.save_observations([("Иванов", None, "waiting")])
+    storage.save_observations([("Иванов", 5, "waiting")])
+    storage.close()
+
+    reopened = SqliteStorage(path)
+    reopened.init()
+    assert reopened.load_state() == 1
+    result = reopened.save_observations([("Иванов", 5, "waiting")])
+    assert result["unchanged"] == 1
+    reopened.close()
+
+
+def test_apply_retention(storage):
+    old = get_local_time() - timedelta(days=40)
+    storage.apply_observation_log([
+        (old, "default", [("Иванов", None), ("Петров", None)]),
+        (old + timedelta(minutes=1), "default", [("Иванов", 4), ("Петров", 4)]),
+        (old + timedelta(minutes=2), "default", [("Иванов", 1)]),
+    ])
+    storage.save_observations([("Петров", 2)])
+    assert len(storage.get_orders()) == 4
+
+    assert storage.apply_retention(30) == 3
+    assert [order[2] for order in _orders(storage)] == [2.0]
+    assert storage.apply_retention(30) == 0
+
+    # Последний заказ курьера удалён — следующее наблюдение начинает новый заказ
+    result = storage.save_observations([("Иванов", 4)])
+    assert result["inserted"] == 1
+    assert len(storage.get_orders()) == 2